@@ -0,0 +1,48 @@
+import os
+
+from database import SessionLocal
+import models
+from utils.images import image_metadata
+from utils.storage import IMAGES_FOLDER
+
+BATCH_SIZE = 50
+
+
+def backfill_images(force: bool = False):
+    """Вычисляет размеры, доминирующий цвет и заглушку для уже загруженных изображений"""
+    db = SessionLocal()
+    try:
+        query = db.query(models.Image)
+        if not force:
+            query = query.filter(models.Image.placeholder.is_(None))
+
+        updated = skipped = 0
+        for image in query.all():
+            file_path = os.path.join(IMAGES_FOLDER, image.filename)
+            try:
+                with open(file_path, "rb") as f:
+                    metadata = image_metadata(f.read())
+            except FileNotFoundError:
+                metadata = {}
+
+            if not metadata:
+                print(f"Пропущено изображение {image.id}: файл {file_path} не найден или не читается")
+                skipped += 1
+                continue
+
+            for key, value in metadata.items():
+                setattr(image, key, value)
+            updated += 1
+            if updated % BATCH_SIZE == 0:
+                db.commit()
+
+        db.commit()
+        print(f"Обновлено изображений: {updated}, пропущено: {skipped}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    backfill_images(force="--force" in sys.argv)
@@ -0,0 +1,66 @@
+"""
+Стоимость проверки токена администратора на один запрос.
+
+"До": каждый запрос к админке выполняет запросы к admin_sessions и admins.
+"После": повторные запросы берут администратора из кэша сессий,
+а подписанный токен (ADMIN_TOKEN_MODE=jwt) проверяется без базы.
+
+Запуск из каталога backend: python -m benchmarks.bench_admin_auth
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Отдельная временная база, чтобы не трогать рабочую
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("ADMIN_JWT_SECRET", "bench-secret")
+
+import crud
+import crud_async
+from database import Base, SessionLocal, engine
+from utils.auth import AdminPrincipal, create_access_token, decode_access_token
+from utils.session_cache import session_cache
+
+ROUNDS = 2000
+
+
+async def measure(func) -> float:
+    await func()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        await func()
+    return (time.perf_counter() - start) / ROUNDS * 1_000_000
+
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    admin = crud.create_admin(db, "bench", "bench")
+    session_token, session = crud.create_admin_session(db, admin.id)
+    token = create_access_token(AdminPrincipal.from_admin(admin), session.expires_at)
+    db.close()
+
+    async def database():
+        session_cache.clear()
+        assert await crud_async.get_admin_principal(session_token)
+
+    async def cached():
+        assert await crud_async.get_admin_principal(session_token)
+
+    async def signed():
+        assert decode_access_token(token)
+
+    database_us = await measure(database)
+    cached_us = await measure(cached)
+    signed_us = await measure(signed)
+    print(f"Проверка токена администратора, среднее за {ROUNDS} повторов")
+    print(f"  запрос к базе:       {database_us:.1f} мкс")
+    print(f"  кэш сессий:          {cached_us:.1f} мкс")
+    print(f"  подписанный токен:   {signed_us:.1f} мкс")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Влияние одного медленного запроса к базе на остальные запросы.
+
+Пока выполняется медленный запрос (sleep на стороне SQLite), параллельно
+отправляются быстрые запросы и измеряется их задержка.
+
+"До": async def обработчики работают с синхронной Session прямо в event
+loop - быстрые запросы ждут окончания медленного.
+"После": async def обработчики используют AsyncSession (aiosqlite),
+медленный запрос не мешает остальным.
+
+Запуск из каталога backend: python -m benchmarks.bench_async_db
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Отдельная временная база, чтобы не трогать рабочую
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import async_engine, engine, get_async_db, get_db
+
+SLOW_QUERY_MS = 500
+FAST_REQUESTS = 10
+SLOW_QUERY = text(f"SELECT sleep({SLOW_QUERY_MS})")
+FAST_QUERY = text("SELECT count(*) FROM land_plots")
+
+
+def _sleep(ms):
+    time.sleep(ms / 1000)
+    return ms
+
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def register_sleep(dbapi_connection, connection_record):
+    dbapi_connection.create_function("sleep", 1, _sleep)
+
+
+# Соединение, открытое при создании таблиц, было создано без функции sleep
+engine.dispose()
+
+
+app = FastAPI()
+
+
+@app.get("/before/slow")
+async def before_slow(db: Session = Depends(get_db)):
+    return db.execute(SLOW_QUERY).scalar()
+
+
+@app.get("/before/fast")
+async def before_fast(db: Session = Depends(get_db)):
+    return db.execute(FAST_QUERY).scalar()
+
+
+@app.get("/after/slow")
+async def after_slow(db: AsyncSession = Depends(get_async_db)):
+    return await db.scalar(SLOW_QUERY)
+
+
+@app.get("/after/fast")
+async def after_fast(db: AsyncSession = Depends(get_async_db)):
+    return await db.scalar(FAST_QUERY)
+
+
+async def timed(client: httpx.AsyncClient, url: str, delay: float = 0) -> float:
+    """Задержка ответа на запрос, отправленный через delay секунд после старта"""
+    start = time.perf_counter() + delay
+    await asyncio.sleep(delay)
+    response = await client.get(url)
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+async def measure(prefix: str):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Прогрев пулов соединений
+        await timed(client, f"{prefix}/fast")
+        # Быстрые запросы приходят, пока выполняется медленный
+        results = await asyncio.gather(
+            timed(client, f"{prefix}/slow"),
+            *(timed(client, f"{prefix}/fast", 0.05 + i * 0.01) for i in range(FAST_REQUESTS))
+        )
+    fast = sorted(results[1:])
+    return fast[len(fast) // 2], fast[-1]
+
+
+if __name__ == "__main__":
+    before_median, before_max = asyncio.run(measure("/before"))
+    after_median, after_max = asyncio.run(measure("/after"))
+    print(f"{FAST_REQUESTS} быстрых запросов во время медленного ({SLOW_QUERY_MS} мс)")
+    print(f"  до (Session в async def):  медиана {before_median:.1f} мс, максимум {before_max:.1f} мс")
+    print(f"  после (AsyncSession):      медиана {after_median:.1f} мс, максимум {after_max:.1f} мс")
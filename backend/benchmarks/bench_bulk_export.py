@@ -0,0 +1,130 @@
+"""
+Массовая смена статуса заявок и выгрузка заявок в CSV.
+
+Смена статуса. "До": по вызову crud.update_request на заявку (как PUT
+/admin/requests/{id} из админки): загрузка, изменение, commit, refresh.
+"После": crud.bulk_update_requests - один UPDATE по списку id.
+
+Выгрузка. "До": все заявки загружаются ORM-объектами, ответы квиза
+разбираются из JSON, CSV собирается в памяти целиком.
+"После": crud.export_requests и utils.export.iter_csv - строки читаются
+пачками и отдаются частями. Пик памяти - по tracemalloc.
+
+Запуск из каталога backend: python -m benchmarks.bench_bulk_export
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TMP = tempfile.mkdtemp()
+# Настройки читаются при импорте модулей приложения
+os.environ.update(
+    DATABASE_URL="sqlite:///" + os.path.join(TMP, "bench.db"),
+    QUIZ_EPOCH_FILE=os.path.join(TMP, "quiz.epoch"),
+)
+
+import csv
+import io
+from datetime import datetime, timedelta
+
+import crud
+import schemas
+from database import Base, SessionLocal, engine
+from models import QuizAnswer, Request, RequestType
+from schemas import QuizQuestionCreate
+from utils.export import iter_csv
+
+REQUESTS = 100000
+BULK = 500
+OPTIONS = ["до 1 млн", "1 - 3 млн", "более 3 млн"]
+
+
+def seed(db, question_ids):
+    start = datetime(2024, 1, 1)
+    rows, answers = [], []
+    for i in range(REQUESTS):
+        quiz = i % 2 == 0
+        request_answers = {str(question_id): random.choice(OPTIONS) for question_id in question_ids} if quiz else None
+        rows.append({
+            "id": i + 1, "type": RequestType.QUIZ if quiz else RequestType.CALLBACK, "name": f"Клиент {i}",
+            "phone": f"+79{i:09d}", "email": f"user{i}@example.com", "message": "Перезвоните, пожалуйста",
+            "answers": request_answers, "status": "new", "created_at": start + timedelta(minutes=i),
+        })
+        if quiz:
+            answers.extend({"request_id": i + 1, "question_id": int(question_id), "option": option,
+                            "created_at": start} for question_id, option in request_answers.items())
+    db.bulk_insert_mappings(Request, rows)
+    db.bulk_insert_mappings(QuizAnswer, answers)
+    db.commit()
+
+
+def export_before(db) -> int:
+    """Прежний подход: все заявки в памяти, CSV одной строкой"""
+    questions = crud.get_quiz_questions(db)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    writer.writerow(["ID", "Создана", "Тип", "Статус", "Имя", "Телефон", "Email", "Сообщение", "Промокод",
+                     "Промокод погашен", "Заметки"] + [question.question for question in questions])
+    for request in db.query(Request).order_by(Request.created_at.desc()).all():
+        answers = dict(crud.parse_quiz_answers(db, request.answers)) if request.answers else {}
+        writer.writerow([request.id, request.created_at, request.type.value, request.status, request.name,
+                         request.phone, request.email, request.message, request.promo_code,
+                         request.promo_redeemed_at, request.notes]
+                        + [answers.get(question.id) for question in questions])
+    return len(buffer.getvalue().encode())
+
+
+def export_after(db) -> int:
+    header, rows = crud.export_requests(db)
+    return sum(len(chunk) for chunk in iter_csv(header, rows))
+
+
+def measure_export(func):
+    """Время и пик памяти - отдельными прогонами: tracemalloc замедляет выполнение"""
+    db = SessionLocal()
+    start = time.perf_counter()
+    size = func(db)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func(db)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.close()
+    return elapsed, peak / 1024 / 1024, size / 1024 / 1024
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    question_ids = [
+        crud.create_quiz_question(db, QuizQuestionCreate(question=f"Вопрос {i}", options=OPTIONS, order=i)).id
+        for i in range(4)
+    ]
+    seed(db, question_ids)
+
+    ids = random.sample(range(1, REQUESTS + 1), BULK * 2)
+    start = time.perf_counter()
+    for request_id in ids[:BULK]:
+        crud.update_request(db, request_id, schemas.RequestUpdate(status="processing"))
+    before_s = time.perf_counter() - start
+    start = time.perf_counter()
+    updated = crud.bulk_update_requests(db, {"status": "processing"}, ids=ids[BULK:])
+    after_s = time.perf_counter() - start
+    assert updated == BULK
+    db.close()
+
+    print(f"Смена статуса {BULK} заявок")
+    print(f"  до (по одной):      {before_s * 1000:8.0f} мс")
+    print(f"  после (один UPDATE): {after_s * 1000:7.0f} мс")
+    print(f"Выгрузка {REQUESTS} заявок в CSV: время, пик памяти, размер")
+    for title, func in (("до (все в памяти)", export_before), ("после (потоком)", export_after)):
+        elapsed, peak, size = measure_export(func)
+        print(f"  {title:20} {elapsed:6.1f} с  {peak:7.1f} МБ  {size:6.1f} МБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Время формирования ответа GET /plots/ для страницы из 100 участков.
+
+"До": ORM-объекты crud.get_land_plots проходят валидацию response_model
+(List[schemas.LandPlot]), jsonable_encoder и стандартный json, как это
+делает FastAPI. "После": serializers.serialize_land_plots собирает ответ
+из строк запроса, холодный кэш - все фрагменты строятся заново,
+теплый - участки не менялись и берутся из кэша по (id, version).
+
+Запуск из каталога backend: python -m benchmarks.bench_catalog_response
+"""
+import json
+import os
+import sys
+import time
+from typing import List
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import crud
+import models
+import schemas
+import serializers
+from database import Base
+
+PLOTS = 100
+IMAGES_PER_PLOT = 5
+ROUNDS = 50
+
+adapter = TypeAdapter(List[schemas.LandPlot])
+
+
+def make_session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    for i in range(1, PLOTS + 1):
+        plot = models.LandPlot(
+            title=f"Участок {i}",
+            description={
+                "text": "Живописный участок у подножия гор. " * 20,
+                "attachments": [
+                    {"id": f"{i:08d}", "name": "План.pdf", "url": f"/uploads/plan_{i}.pdf", "type": "document"}
+                ],
+            },
+            cadastral_numbers=[f"04:05:0{i:06d}:1{j}" for j in range(3)],
+            area=10.5 + i,
+            price=1000000 + i,
+            price_per_sotka=100000,
+            location="Чемал",
+            region="Республика Алтай",
+            land_category="ИЖС",
+            permitted_use="Для строительства",
+            features=["Вид на горы", "Рядом река", "Лес"],
+            communications=["Электричество", "Дорога"],
+        )
+        plot.images = [
+            models.Image(
+                filename=f"plot{i}_{j}.jpg",
+                path=f"/images/plot{i}_{j}.jpg",
+                order=j,
+                is_main=j == 0,
+                width=1600,
+                height=1200,
+                dominant_color="#4a6b3c",
+                placeholder="data:image/webp;base64," + "A" * 120,
+                size=350000,
+                mime_type="image/jpeg",
+            )
+            for j in range(IMAGES_PER_PLOT)
+        ]
+        db.add(plot)
+    db.commit()
+    return db
+
+
+def before(db):
+    plots = crud.get_land_plots(db, limit=PLOTS)
+    for plot in plots:
+        setattr(plot, "price_per_meter", plot.price_per_sotka)
+    content = json.dumps(jsonable_encoder(adapter.validate_python(plots))).encode()
+    # Каждый запрос получает новую сессию, объекты не переиспользуются
+    db.expire_all()
+    return content
+
+
+def after_cold(db):
+    serializers.fragment_cache.clear()
+    return serializers.serialize_land_plots(db, limit=PLOTS)
+
+
+def after_warm(db):
+    return serializers.serialize_land_plots(db, limit=PLOTS)
+
+
+def measure(func, db) -> float:
+    func(db)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(db)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+if __name__ == "__main__":
+    db = make_session()
+    assert json.loads(before(db)) == json.loads(after_cold(db))
+
+    before_ms = measure(before, db)
+    cold_ms = measure(after_cold, db)
+    warm_ms = measure(after_warm, db)
+    print(f"{PLOTS} участков по {IMAGES_PER_PLOT} изображений, среднее за {ROUNDS} повторов")
+    print(f"  до (ORM + response_model + json):  {before_ms:.2f} мс")
+    print(f"  после, холодный кэш:               {cold_ms:.2f} мс")
+    print(f"  после, теплый кэш:                 {warm_ms:.2f} мс")
+    print(f"  ускорение: x{before_ms / cold_ms:.2f} / x{before_ms / warm_ms:.2f}")
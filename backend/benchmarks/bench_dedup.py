@@ -0,0 +1,88 @@
+"""
+Повторные отправки заявок: двойной клик и повтор запроса клиентом.
+
+Каждый из USERS пользователей отправляет квиз SUBMITS раз подряд с одним
+Idempotency-Key (повтор того же запроса), номер телефона в повторах
+записан по-разному.
+"До": каждая отправка - новая заявка, промокод и уведомление
+(проверка повторов отключена: LEAD_DEDUP_WINDOW=0, без ключа).
+"После": Idempotency-Key и проверка повторов по телефону.
+
+Запуск из каталога backend: python -m benchmarks.bench_dedup
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Настройки читаются при импорте модулей приложения
+os.environ.update(
+    DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"),
+    TELEGRAM_BOT_TOKEN="123:bench",
+    TELEGRAM_ADMIN_CHAT_ID="1",
+    TELEGRAM_BOT_ENABLED="1",
+)
+
+import httpx
+from fastapi import FastAPI
+
+from database import Base, SessionLocal, engine
+from models import NotificationOutbox, Request
+from routers import quiz
+from utils import dedup
+
+USERS = 200
+SUBMITS = 3
+PHONES = ["+7 (999) {:03d}-00-00", "8 999 {:03d} 00 00", "79990{:03d}0000"]
+
+app = FastAPI()
+app.include_router(quiz.router)
+
+
+async def submit_all(with_keys: bool) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for user in range(USERS):
+            for attempt in range(SUBMITS):
+                lead = {"type": "quiz", "name": "Иван", "phone": PHONES[attempt].format(user),
+                        "email": "ivan@example.com", "answers": {"Бюджет": "до 1 млн"}}
+                headers = {"Idempotency-Key": f"user-{user}"} if with_keys else {}
+                response = await client.post("/quiz/request", json=lead, headers=headers)
+                response.raise_for_status()
+        return (time.perf_counter() - start) / (USERS * SUBMITS) * 1000
+
+
+def counts() -> tuple:
+    db = SessionLocal()
+    try:
+        return db.query(Request).count(), db.query(NotificationOutbox).count()
+    finally:
+        db.close()
+
+
+async def run(dedup_window: int, with_keys: bool) -> dict:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    dedup.LEAD_DEDUP_WINDOW = dedup_window
+    ms = await submit_all(with_keys)
+    requests, notifications = counts()
+    return {"ms": ms, "requests": requests, "notifications": notifications}
+
+
+async def main():
+    window = dedup.LEAD_DEDUP_WINDOW
+    before = await run(0, with_keys=False)
+    after = await run(window, with_keys=True)
+    print(f"{USERS} пользователей, по {SUBMITS} отправки квиза")
+    for title, stats in (("до (без проверки)", before), ("после (ключ и dedup)", after)):
+        print(
+            f"  {title:22} заявок {stats['requests']:4}, уведомлений {stats['notifications']:4}, "
+            f"{stats['ms']:.2f} мс на отправку"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""
+Всплеск заявок при ограничении Telegram на число сообщений в чат.
+
+Локальный Bot API (benchmarks.fake_telegram) пропускает не больше
+FLOOD_LIMIT сообщений за FLOOD_WINDOW секунд, сверх этого отвечает 429.
+Заявки поступают с частотой рекламной кампании, диспетчер outbox работает
+параллельно.
+"До": каждая заявка - отдельное сообщение (OUTBOX_DIGEST_RATE=0).
+"После": при всплеске заявки объединяются в сводки раз в
+OUTBOX_DIGEST_INTERVAL секунд.
+
+Запуск из каталога backend: python -m benchmarks.bench_digest
+"""
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+PORT = free_port()
+# Настройки читаются при импорте модулей приложения; интервалы уменьшены,
+# чтобы бенчмарк шел секунды, а не минуты
+os.environ.update(
+    DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"),
+    TELEGRAM_BOT_TOKEN="123:bench",
+    TELEGRAM_ADMIN_CHAT_ID="1",
+    TELEGRAM_BOT_ENABLED="1",
+    TELEGRAM_API_URL=f"http://127.0.0.1:{PORT}",
+    TELEGRAM_CHAT_INTERVAL="0.02",
+    OUTBOX_POLL_INTERVAL="0.05",
+    OUTBOX_DIGEST_RATE="10",
+    OUTBOX_DIGEST_WINDOW="1",
+    OUTBOX_DIGEST_INTERVAL="1",
+)
+
+import crud
+import outbox
+from benchmarks.fake_telegram import FakeTelegram
+from database import Base, SessionLocal, engine
+from models import NotificationOutbox
+from outbox import OutboxDispatcher
+from schemas import RequestCreate
+from telegram_bot.service import close_bot
+
+LEADS = 100
+LEADS_PER_SECOND = 50
+FLOOD_LIMIT = 20
+FLOOD_WINDOW = 2
+
+LEAD = RequestCreate(type="callback", name="Иван", phone="+79990000000", email="ivan@example.com", message="Перезвоните")
+
+
+def add_lead():
+    db = SessionLocal()
+    try:
+        crud.create_request(db, LEAD, notify=True)
+    finally:
+        db.close()
+
+
+def delivery_stats() -> tuple:
+    """Число ожидающих уведомлений и наибольшая задержка доставки"""
+    db = SessionLocal()
+    try:
+        pending = db.query(NotificationOutbox).filter(NotificationOutbox.status == "pending").count()
+        delays = [
+            (n.sent_at - n.created_at).total_seconds()
+            for n in db.query(NotificationOutbox).filter(NotificationOutbox.status == "sent")
+        ]
+        return pending, max(delays, default=0)
+    finally:
+        db.close()
+
+
+async def burst(digest_rate: int) -> dict:
+    outbox.OUTBOX_DIGEST_RATE = digest_rate
+    telegram = FakeTelegram(flood_limit=FLOOD_LIMIT, flood_window=FLOOD_WINDOW)
+    await telegram.start(PORT)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    dispatcher = asyncio.create_task(OutboxDispatcher().run())
+    start = time.perf_counter()
+    for _ in range(LEADS):
+        await asyncio.to_thread(add_lead)
+        await asyncio.sleep(1 / LEADS_PER_SECOND)
+    while delivery_stats()[0]:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    dispatcher.cancel()
+    await close_bot()
+    await telegram.stop()
+    return {
+        "messages": len(telegram.messages),
+        "throttled": telegram.throttled,
+        "elapsed": elapsed,
+        "max_delay": delivery_stats()[1],
+    }
+
+
+async def main():
+    before = await burst(0)
+    after = await burst(int(os.environ["OUTBOX_DIGEST_RATE"]))
+
+    print(
+        f"{LEADS} заявок за {LEADS / LEADS_PER_SECOND:.0f} с, лимит Telegram "
+        f"{FLOOD_LIMIT} сообщений за {FLOOD_WINDOW} с"
+    )
+    for title, stats in (("до (по одной заявке)", before), ("после (сводки)", after)):
+        print(
+            f"  {title:22} сообщений {stats['messages']:4}, ответов 429 {stats['throttled']:3}, "
+            f"все доставлены за {stats['elapsed']:.1f} с, наибольшая задержка {stats['max_delay']:.1f} с"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
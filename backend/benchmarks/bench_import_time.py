@@ -0,0 +1,67 @@
+"""
+Время холодного импорта приложения (python -X importtime).
+
+"До": при импорте main загружались aiogram и Telegram-бот, а таблицы
+создавались через Base.metadata.create_all.
+"После": бот загружается лениво (telegram_bot.service), схемой управляет
+Alembic (init_db.py). Каждый вариант запускается в отдельном процессе.
+
+Запуск из каталога backend: python -m benchmarks.bench_import_time
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUNDS = 5
+TOP_MODULES = 8
+
+BEFORE = "import main, telegram_bot.bot, database; database.Base.metadata.create_all(bind=database.engine)"
+AFTER = "import main"
+
+
+def import_profile(code: str):
+    """
+    Общее время импорта (мс) и накопленное время модулей, которые
+    импортирует непосредственно импортированный код (первый уровень вложенности)
+    """
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"),
+        TELEGRAM_BOT_TOKEN="123:bench",
+        TELEGRAM_ADMIN_CHAT_ID="1",
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    total, children = 0.0, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Вложенность модуля обозначается отступом по два пробела
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            total += int(cumulative) / 1000
+        elif depth == 1:
+            children[name.strip()] = int(cumulative) / 1000
+    return total, children
+
+
+def measure(code: str):
+    profiles = [import_profile(code) for _ in range(ROUNDS)]
+    totals = sorted(total for total, _ in profiles)
+    return totals[len(totals) // 2], profiles[-1][1]
+
+
+if __name__ == "__main__":
+    before, _ = measure(BEFORE)
+    after, profile = measure(AFTER)
+    print(f"Импорт приложения, медиана из {ROUNDS} запусков")
+    print(f"  до (aiogram и create_all при импорте):  {before:.0f} мс")
+    print(f"  после (ленивый бот, схема в Alembic):   {after:.0f} мс")
+    print("Самые долгие импорты main после:")
+    for name, ms in sorted(profile.items(), key=lambda item: -item[1])[:TOP_MODULES]:
+        print(f"  {name:<30} {ms:.0f} мс")
@@ -0,0 +1,172 @@
+"""
+Как админка узнает о новых заявках.
+
+"До": каждая открытая вкладка раз в POLL секунд запрашивает список заявок
+(crud.get_requests, как GET /admin/requests/) и счетчики заявок (как
+GET /admin/stats). Число запросов к базе растет с числом вкладок, новая
+заявка видна в среднем через POLL / 2 секунд.
+"После": вкладки подписаны на events.hub (GET /admin/events). Воркер
+читает lead_events одним запросом раз в EVENTS_POLL_INTERVAL секунд при
+любом числе подписчиков; заявки этого воркера раздаются сразу после commit.
+
+Запуск из каталога backend: python -m benchmarks.bench_lead_events
+"""
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TMP = tempfile.mkdtemp()
+# Настройки читаются при импорте модулей приложения
+os.environ.update(
+    DATABASE_URL="sqlite:///" + os.path.join(TMP, "bench.db"),
+    QUIZ_EPOCH_FILE=os.path.join(TMP, "quiz.epoch"),
+    EVENTS_BACKEND="database",
+    EVENTS_POLL_INTERVAL="1",
+)
+
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, insert
+
+import crud
+import events
+import schemas
+from database import Base, SessionLocal, engine
+from models import LeadEvent, Request, RequestType
+
+REQUESTS = 50000
+TABS = 20
+POLL = 5
+PAGE = 50
+LEADS = 20
+# Длительность прогона "после", секунд; результат пересчитывается на минуту
+DURATION = 5
+
+statements = 0
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_statement(*args):
+    global statements
+    statements += 1
+
+
+def seed(db):
+    start = datetime(2024, 1, 1)
+    db.bulk_insert_mappings(Request, [
+        {"type": RequestType.CALLBACK, "name": f"Клиент {i}", "phone": f"+79{i:09d}",
+         "email": f"user{i}@example.com", "status": "new", "created_at": start + timedelta(minutes=i)}
+        for i in range(REQUESTS)
+    ])
+    db.commit()
+
+
+def poll_tab(db):
+    """Один опрос вкладки: список заявок и счетчики для статистики"""
+    crud.get_requests(db, limit=PAGE)
+    db.query(func.count(Request.id)).scalar()
+    db.query(func.count(Request.id)).filter(Request.status == "new").scalar()
+    db.query(func.count(Request.id)).filter(Request.status == "completed").scalar()
+    db.query(func.count(Request.id)).filter(Request.type == RequestType.QUIZ).scalar()
+
+
+def measure_before():
+    global statements
+    db = SessionLocal()
+    statements = 0
+    start = time.perf_counter()
+    for _ in range(TABS):
+        poll_tab(db)
+    elapsed = time.perf_counter() - start
+    db.close()
+    per_minute = 60 / POLL
+    return statements * per_minute, elapsed * per_minute
+
+
+def create_lead(i: int) -> float:
+    """Заявка через crud; подписчики могут получить ее раньше, чем вернется commit"""
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        crud.create_request(db, schemas.RequestCreate(
+            type=RequestType.CALLBACK, name=f"Новый {i}", phone=f"+78{i:09d}", email="lead@example.com"
+        ))
+        return start
+    finally:
+        db.close()
+
+
+def insert_from_other_worker(i: int) -> float:
+    """Событие, записанное другим воркером: этот процесс о нем не знает"""
+    with engine.begin() as connection:
+        connection.execute(insert(LeadEvent).values(kind="request.created", payload={"id": -i}))
+    return time.perf_counter()
+
+
+async def measure_after():
+    global statements
+    received = {}
+
+    async def tab():
+        async for lead_event in events.hub.subscribe():
+            if lead_event is not None:
+                received.setdefault(lead_event.id, []).append(time.perf_counter())
+
+    runner = asyncio.create_task(events.hub.run())
+    await asyncio.sleep(0.5)
+    tabs = [asyncio.create_task(tab()) for _ in range(TABS)]
+    await asyncio.sleep(0.1)
+
+    # Фоновое чтение ленты без новых событий
+    statements = 0
+    start = time.perf_counter()
+    await asyncio.sleep(DURATION)
+    idle_per_minute = statements / (time.perf_counter() - start) * 60
+
+    local, remote = [], []
+    for i in range(LEADS):
+        committed = await asyncio.to_thread(create_lead, i)
+        local.append((events.hub.backend.last_id(), committed))
+        await asyncio.sleep(0.05)
+    for i in range(LEADS):
+        committed = await asyncio.to_thread(insert_from_other_worker, i)
+        remote.append((events.hub.backend.last_id(), committed))
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(events.EVENTS_POLL_INTERVAL * 2)
+
+    for task in tabs + [runner]:
+        task.cancel()
+
+    def latency(published):
+        delays = [max(received[event_id]) - committed for event_id, committed in published]
+        assert all(len(received[event_id]) == TABS for event_id, _ in published)
+        return sum(delays) / len(delays) * 1000, max(delays) * 1000
+
+    return idle_per_minute, latency(local), latency(remote)
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    seed(db)
+    db.close()
+
+    before_statements, before_seconds = measure_before()
+    idle_statements, (local_avg, local_max), (remote_avg, remote_max) = asyncio.run(measure_after())
+
+    print(f"{TABS} вкладок админки, {REQUESTS} заявок в базе")
+    print(f"  до (опрос раз в {POLL} с):")
+    print(f"    запросов к базе в минуту: {before_statements:8.0f}")
+    print(f"    время базы в минуту:      {before_seconds * 1000:8.0f} мс")
+    print(f"    задержка новой заявки:    {POLL / 2 * 1000:8.0f} мс в среднем, до {POLL * 1000} мс")
+    print(f"  после (лента событий, чтение раз в {events.EVENTS_POLL_INTERVAL:g} с):")
+    print(f"    запросов к базе в минуту: {idle_statements:8.0f}")
+    print(f"    задержка, заявка этого воркера:  {local_avg:6.1f} мс в среднем, до {local_max:.1f} мс")
+    print(f"    задержка, заявка другого воркера: {remote_avg:5.0f} мс в среднем, до {remote_max:.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
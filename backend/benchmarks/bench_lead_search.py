@@ -0,0 +1,101 @@
+"""
+Поиск заявок в админке на большой базе.
+
+"До": поиск подстроки через ILIKE по всем полям (полный просмотр таблицы)
+и постраничный вывод через OFFSET - так пришлось бы искать без индекса.
+"После": crud.filter_requests - триграммный индекс FTS5 и нормализованный
+телефон, keyset-пагинация по (created_at, id).
+
+Запуск из каталога backend: python -m benchmarks.bench_lead_search
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Настройки читаются при импорте модулей приложения
+os.environ.update(DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+import crud
+from database import Base, SessionLocal, engine
+from models import Request, RequestType
+from utils.lead_search import encode_cursor
+from utils.phone import normalize_phone
+
+REQUESTS = 300000
+PAGE = 50
+DEEP_PAGE = 2000
+ROUNDS = 5
+
+NAMES = ["Иван", "Мария", "Петр", "Анна", "Сергей", "Ольга", "Алексей", "Елена"]
+MESSAGES = ["Перезвоните", "Интересует участок у реки", "Нужна консультация", "Когда можно посмотреть?", None]
+
+
+def seed(db):
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(REQUESTS):
+        phone = f"+79{random.randrange(10 ** 9):09d}"
+        rows.append({
+            "type": random.choice(list(RequestType)), "name": f"{random.choice(NAMES)} {i}",
+            "phone": phone, "phone_normalized": normalize_phone(phone), "email": f"user{i}@example.com",
+            "message": random.choice(MESSAGES), "status": "new", "created_at": start + timedelta(minutes=i),
+            "notes": "клиент просил скидку" if i % 1000 == 0 else None,
+        })
+    db.bulk_insert_mappings(Request, rows)
+    db.commit()
+    return rows
+
+
+def search_before(db, search: str, skip: int = 0):
+    pattern = f"%{search}%"
+    return db.query(Request).filter(or_(
+        Request.name.ilike(pattern), Request.phone.ilike(pattern), Request.email.ilike(pattern),
+        Request.message.ilike(pattern), Request.notes.ilike(pattern)
+    )).order_by(Request.created_at.desc()).offset(skip).limit(PAGE).all()
+
+
+def measure(func) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    rows = seed(db)
+    phone = rows[REQUESTS // 2]["phone_normalized"][-7:]
+    # Курсор, с которого начинается страница DEEP_PAGE
+    last = rows[REQUESTS - DEEP_PAGE * PAGE]
+    cursor = encode_cursor(last["created_at"], REQUESTS - DEEP_PAGE * PAGE + 1)
+
+    cases = [
+        ("заметка \"скидку\"",
+         lambda: search_before(db, "скидку"), lambda: crud.get_requests(db, limit=PAGE, search="скидку")),
+        (f"фрагмент телефона {phone}",
+         lambda: search_before(db, phone), lambda: crud.get_requests(db, limit=PAGE, search=phone)),
+        ("email user123456@",
+         lambda: search_before(db, "user123456@"), lambda: crud.get_requests(db, limit=PAGE, search="user123456@")),
+        (f"страница {DEEP_PAGE} списка",
+         lambda: db.query(Request).order_by(Request.created_at.desc()).offset(DEEP_PAGE * PAGE).limit(PAGE).all(),
+         lambda: crud.get_requests(db, limit=PAGE, cursor=cursor)),
+    ]
+    print(f"Поиск среди {REQUESTS} заявок, среднее за {ROUNDS} запросов")
+    for title, before, after in cases:
+        assert [r.id for r in before()] == [r.id for r in after()], title
+        print(f"  {title}")
+        print(f"    до:    {measure(before):8.1f} мс")
+        print(f"    после: {measure(after):8.1f} мс")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
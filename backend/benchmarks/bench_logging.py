@@ -0,0 +1,74 @@
+"""
+Стоимость отладочного вывода на пути запроса.
+
+"До": create_land_plot печатает словарь участка дважды, загрузка
+изображения - еще несколько строк; каждая print - запись в stdout
+с построчной буферизацией, как в контейнере.
+"После": те же события через logging - подробные данные на уровне DEBUG
+(при LOG_LEVEL=INFO не форматируются), одна строка INFO уходит в очередь
+QueueHandler и выводится отдельным потоком.
+
+Запуск из каталога backend: python -m benchmarks.bench_logging
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import log
+
+ROUNDS = 20000
+
+PLOT = {
+    "title": "Участок у реки",
+    "description": {"text": "Живописный участок у подножия гор. " * 20, "attachments": []},
+    "cadastral_numbers": ["04:05:0000001:10", "04:05:0000001:11"],
+    "area": 15.5, "price": 1500000, "location": "Чемал", "region": "Республика Алтай",
+    "features": ["Вид на горы", "Рядом река", "Лес"], "communications": ["Электричество", "Дорога"],
+}
+
+logger = logging.getLogger("bench")
+
+
+def before():
+    print(f"Данные для создания участка: {PLOT}")
+    print(f"Данные после обработки: {PLOT}")
+    print("Начало загрузки изображения для участка 1")
+    print("Информация о файле: имя=photo.jpg, тип=image/jpeg, порядок=-1, is_main=False")
+    print("Сохранение файла: photo.1a2b3c4d.jpg")
+
+
+def after():
+    logger.debug("Данные для создания участка: %s", PLOT)
+    logger.debug("Данные после обработки: %s", PLOT)
+    logger.info(
+        "Загрузка изображения для участка %s: имя=%s, тип=%s, порядок=%s, is_main=%s",
+        1, "photo.jpg", "image/jpeg", -1, False
+    )
+    logger.debug("Сохранен файл %s", "photo.1a2b3c4d.jpg")
+
+
+def measure(func) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    return (time.perf_counter() - start) / ROUNDS * 1_000_000
+
+
+if __name__ == "__main__":
+    console = sys.stdout
+    # stdout направляется в файл с построчной буферизацией, как у контейнера
+    sys.stdout = open(os.path.join(tempfile.mkdtemp(), "stdout.log"), "w", buffering=1)
+    try:
+        before_us = measure(before)
+        log.setup_logging()
+        after_us = measure(after)
+        log.stop_logging()
+    finally:
+        sys.stdout.close()
+        sys.stdout = console
+    print(f"Отладочный вывод на один запрос, среднее за {ROUNDS} повторов")
+    print(f"  до (print в stdout):           {before_us:.1f} мкс")
+    print(f"  после (logging через очередь): {after_us:.1f} мкс")
@@ -0,0 +1,71 @@
+"""
+Задержка обычных запросов во время потока попыток входа.
+
+"До": bcrypt выполняется прямо в async def обработчике входа и
+блокирует event loop, остальные запросы ждут.
+"После": проверка пароля выполняется в отдельном ограниченном пуле
+(utils.auth.verify_password_async), лишние попытки сразу отклоняются.
+
+Запуск из каталога backend: python -m benchmarks.bench_login_flood
+"""
+import asyncio
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from utils.auth import PasswordHashBusy, get_password_hash, verify_password, verify_password_async
+
+LOGIN_ATTEMPTS = 30
+CATALOG_REQUESTS = 10
+HASHED_PASSWORD = get_password_hash("secret")
+
+app = FastAPI()
+
+
+@app.post("/before/login")
+async def before_login():
+    return verify_password("wrong", HASHED_PASSWORD)
+
+
+@app.post("/after/login")
+async def after_login():
+    try:
+        return await verify_password_async("wrong", HASHED_PASSWORD)
+    except PasswordHashBusy:
+        raise HTTPException(status_code=503)
+
+
+@app.get("/catalog")
+async def catalog():
+    return []
+
+
+async def timed(client: httpx.AsyncClient, method: str, url: str, delay: float = 0) -> float:
+    """Задержка ответа на запрос, отправленный через delay секунд после старта"""
+    start = time.perf_counter() + delay
+    await asyncio.sleep(delay)
+    await client.request(method, url)
+    return (time.perf_counter() - start) * 1000
+
+
+async def measure(prefix: str):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results = await asyncio.gather(
+            *(timed(client, "POST", f"{prefix}/login") for _ in range(LOGIN_ATTEMPTS)),
+            *(timed(client, "GET", "/catalog", 0.05 + i * 0.02) for i in range(CATALOG_REQUESTS))
+        )
+    catalog = sorted(results[LOGIN_ATTEMPTS:])
+    return catalog[len(catalog) // 2], catalog[-1]
+
+
+if __name__ == "__main__":
+    before_median, before_max = asyncio.run(measure("/before"))
+    after_median, after_max = asyncio.run(measure("/after"))
+    print(f"{CATALOG_REQUESTS} запросов каталога во время {LOGIN_ATTEMPTS} попыток входа")
+    print(f"  до (bcrypt в event loop):  медиана {before_median:.1f} мс, максимум {before_max:.1f} мс")
+    print(f"  после (пул хэширования):   медиана {after_median:.1f} мс, максимум {after_max:.1f} мс")
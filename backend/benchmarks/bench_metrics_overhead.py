@@ -0,0 +1,57 @@
+"""
+Накладные расходы метрик на один запрос.
+
+"Выключены": приложение без MetricsMiddleware и обработчиков SQLAlchemy -
+так main собирается при METRICS_ENABLED=0. "Включены": middleware и
+подсчет запросов к базе. Обработчик выполняет один запрос к SQLite.
+
+Запуск из каталога backend: python -m benchmarks.bench_metrics_overhead
+"""
+import asyncio
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from utils import metrics
+
+ROUNDS = 3000
+
+engine = create_engine("sqlite://")
+
+
+def make_app(with_metrics: bool) -> FastAPI:
+    app = FastAPI()
+    if with_metrics:
+        app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/plots/{plot_id}")
+    async def get_plot(plot_id: int):
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT :id"), {"id": plot_id}).scalar()
+
+    return app
+
+
+async def measure(app: FastAPI) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(100):
+            await client.get(f"/plots/{i}")
+        start = time.perf_counter()
+        for i in range(ROUNDS):
+            await client.get(f"/plots/{i}")
+        return (time.perf_counter() - start) / ROUNDS * 1_000_000
+
+
+if __name__ == "__main__":
+    disabled = asyncio.run(measure(make_app(False)))
+    metrics.install_query_hooks()
+    enabled = asyncio.run(measure(make_app(True)))
+    print(f"Время запроса, среднее за {ROUNDS} повторов")
+    print(f"  метрики выключены:  {disabled:.0f} мкс")
+    print(f"  метрики включены:   {enabled:.0f} мкс (+{enabled - disabled:.0f} мкс)")
@@ -0,0 +1,121 @@
+"""
+Время ответа на заявку при медленном Telegram и доставка через outbox.
+
+"До": обработчик создает заявку и ждет отправки уведомления в Telegram.
+"После": заявка и запись outbox сохраняются одной транзакцией, ответ не
+ждет Telegram; уведомления доставляет OutboxDispatcher. Сервер Bot API
+заменен локальным (benchmarks.fake_telegram) с задержкой ответа, а при
+проверке доставки - еще и со случайными ошибками 500 и 429.
+
+Запуск из каталога backend: python -m benchmarks.bench_outbox
+"""
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+PORT = free_port()
+# Настройки читаются при импорте модулей приложения
+os.environ.update(
+    DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"),
+    TELEGRAM_BOT_TOKEN="123:bench",
+    TELEGRAM_ADMIN_CHAT_ID="1",
+    TELEGRAM_BOT_ENABLED="1",
+    TELEGRAM_API_URL=f"http://127.0.0.1:{PORT}",
+    TELEGRAM_CHAT_INTERVAL="0",
+    OUTBOX_BACKOFF_BASE="0.05",
+    OUTBOX_POLL_INTERVAL="0.05",
+)
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.orm import Session
+
+import crud
+from benchmarks.fake_telegram import FakeTelegram
+from database import Base, SessionLocal, engine, get_db
+from models import NotificationOutbox
+from outbox import OutboxDispatcher
+from routers import requests as requests_router
+from schemas import RequestCreate
+from telegram_bot.notifications import format_request_notification
+from telegram_bot.service import close_bot, send_admin_message
+
+LEADS = 20
+TELEGRAM_DELAY = 0.3
+
+LEAD = {"type": "callback", "name": "Иван", "phone": "+79990000000", "email": "ivan@example.com", "message": "Перезвоните"}
+
+before_app = FastAPI()
+
+
+@before_app.post("/requests/")
+async def create_request_inline(request: RequestCreate, db: Session = Depends(get_db)):
+    new_request = crud.create_request(db, request)
+    await send_admin_message(format_request_notification(crud.request_notification_payload(new_request)))
+    return {"status": "success"}
+
+
+after_app = FastAPI()
+after_app.include_router(requests_router.router)
+
+
+async def submit_leads(app: FastAPI) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for _ in range(LEADS):
+            response = await client.post("/requests/", json=LEAD)
+            response.raise_for_status()
+        return (time.perf_counter() - start) / LEADS * 1000
+
+
+def pending_count() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(NotificationOutbox).filter(NotificationOutbox.status == "pending").count()
+    finally:
+        db.close()
+
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    telegram = FakeTelegram(delay=TELEGRAM_DELAY)
+    await telegram.start(PORT)
+
+    before_ms = await submit_leads(before_app)
+    after_ms = await submit_leads(after_app)
+
+    # Доставка при нестабильном Telegram: 20% ошибок 500 и 5% ответов 429
+    telegram.messages.clear()
+    telegram.delay, telegram.error_rate, telegram.retry_after_rate = 0.01, 0.2, 0.05
+    start = time.perf_counter()
+    dispatcher = asyncio.create_task(OutboxDispatcher().run())
+    while pending_count():
+        await asyncio.sleep(0.05)
+    delivery_s = time.perf_counter() - start
+    dispatcher.cancel()
+    await close_bot()
+    await telegram.stop()
+
+    print(f"Ответ на заявку при задержке Telegram {TELEGRAM_DELAY * 1000:.0f} мс, среднее за {LEADS} заявок")
+    print(f"  до (отправка в обработчике):  {before_ms:.1f} мс")
+    print(f"  после (outbox):               {after_ms:.1f} мс")
+    print(
+        f"Доставка {LEADS} уведомлений из outbox с ошибками Telegram: "
+        f"доставлено {len(telegram.messages)}, обращений к API {telegram.calls - LEADS}, {delivery_s:.1f} с"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
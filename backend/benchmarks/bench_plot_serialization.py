@@ -0,0 +1,102 @@
+"""
+Время сериализации страницы каталога из 100 участков до и после
+перехода на JSONText (однократное декодирование orjson).
+
+"До": значения хранятся дважды закодированными, колонка JSON декодирует
+их стандартным json, затем цикл в crud повторно вызывает json.loads.
+"После": значения хранятся как обычный JSON и декодируются один раз.
+
+Запуск из каталога backend: python -m benchmarks.bench_plot_serialization
+"""
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import JSON, Column, Integer, MetaData, Table, create_engine, select
+
+import models
+from database import Base
+
+PLOTS = 100
+ROUNDS = 50
+
+legacy_metadata = MetaData()
+legacy_plots = Table(
+    "land_plots", legacy_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("description", JSON),
+    Column("cadastral_numbers", JSON),
+    Column("features", JSON),
+    Column("communications", JSON),
+    extend_existing=True,
+)
+
+
+def plot_values(i: int) -> dict:
+    return {
+        "description": {
+            "text": "Живописный участок у подножия гор. " * 20,
+            "attachments": [
+                {"id": f"{i:08d}", "name": "План.pdf", "url": f"/uploads/plan_{i}.pdf", "type": "document"}
+            ],
+        },
+        "cadastral_numbers": [f"04:05:0{i:06d}:1{j}" for j in range(3)],
+        "features": ["Вид на горы", "Рядом река", "Лес"],
+        "communications": ["Электричество", "Дорога"],
+    }
+
+
+def make_engine(double_encoded: bool):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        for i in range(1, PLOTS + 1):
+            values = plot_values(i)
+            if double_encoded:
+                # Так данные записывал crud: json.dumps поверх колонки JSON
+                values = {key: json.dumps(value) for key, value in values.items()}
+                connection.execute(legacy_plots.insert().values(id=i, **values))
+            else:
+                connection.execute(models.LandPlot.__table__.insert().values(id=i, **values))
+    return engine
+
+
+def before(engine):
+    with engine.connect() as connection:
+        rows = [dict(row._mapping) for row in connection.execute(select(legacy_plots))]
+    for row in rows:
+        for key in ("description", "cadastral_numbers", "features", "communications"):
+            if isinstance(row[key], str):
+                row[key] = json.loads(row[key])
+    return json.dumps(rows)
+
+
+def after(engine):
+    table = models.LandPlot.__table__
+    columns = [table.c.id, table.c.description, table.c.cadastral_numbers, table.c.features, table.c.communications]
+    with engine.connect() as connection:
+        rows = [dict(row._mapping) for row in connection.execute(select(*columns))]
+    return json.dumps(rows)
+
+
+def measure(func, engine) -> float:
+    func(engine)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(engine)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+if __name__ == "__main__":
+    legacy_engine = make_engine(double_encoded=True)
+    engine = make_engine(double_encoded=False)
+    assert json.loads(before(legacy_engine)) == json.loads(after(engine))
+
+    before_ms = measure(before, legacy_engine)
+    after_ms = measure(after, engine)
+    print(f"{PLOTS} участков, среднее за {ROUNDS} повторов")
+    print(f"  до (двойное кодирование + json.loads в цикле): {before_ms:.2f} мс")
+    print(f"  после (JSONText, orjson):                       {after_ms:.2f} мс")
+    print(f"  ускорение: x{before_ms / after_ms:.2f}")
@@ -0,0 +1,64 @@
+"""
+Поиск заявки по промокоду (GET /admin/requests/promo/{code}, /check_promo).
+
+"До": у requests.promo_code нет индекса - каждый поиск просматривает всю
+таблицу заявок.
+"После": уникальный индекс ix_requests_promo_code, поиск за O(log n).
+
+Запуск из каталога backend: python -m benchmarks.bench_promo_lookup
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from datetime import datetime
+
+from sqlalchemy import text
+
+import crud
+from database import Base, SessionLocal, engine
+from models import Request
+from utils.promo import generate_promo_code
+
+REQUESTS = 100_000
+LOOKUPS = 2000
+
+
+def measure(codes) -> float:
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        for code in codes:
+            crud.get_request_by_promo(db, code)
+        return (time.perf_counter() - start) / len(codes) * 1_000_000
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    codes = list({generate_promo_code() for _ in range(REQUESTS)})
+    with engine.begin() as connection:
+        connection.execute(Request.__table__.insert(), [
+            {"type": "QUIZ", "name": "Иван", "phone": "+79990000000", "email": "ivan@example.com",
+             "promo_code": code, "status": "new", "created_at": now, "updated_at": now}
+            for code in codes
+        ])
+    sample = random.sample(codes, LOOKUPS // 2) + [generate_promo_code() for _ in range(LOOKUPS // 2)]
+
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_requests_promo_code"))
+    before_us = measure(sample)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE UNIQUE INDEX ix_requests_promo_code ON requests (promo_code)"))
+    after_us = measure(sample)
+
+    print(f"Поиск по промокоду среди {len(codes)} заявок, среднее за {LOOKUPS} поисков")
+    print(f"  до (без индекса):  {before_us:8.1f} мкс")
+    print(f"  после (индекс):    {after_us:8.1f} мкс")
@@ -0,0 +1,87 @@
+"""
+Открытие квиза: GET /quiz/questions.
+
+"До": на каждый запрос - выборка и сортировка вопросов, разбор options и
+проверка ответа через response_model (прежний обработчик).
+"После": готовый документ из кэша процесса; повторный посетитель с
+If-None-Match получает 304 без тела.
+
+Запуск из каталога backend: python -m benchmarks.bench_quiz
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TMP = tempfile.mkdtemp()
+# Настройки читаются при импорте модулей приложения
+os.environ.update(
+    DATABASE_URL="sqlite:///" + os.path.join(TMP, "bench.db"),
+    QUIZ_EPOCH_FILE=os.path.join(TMP, "quiz.epoch"),
+)
+
+from typing import List
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud
+import crud_async
+from database import Base, SessionLocal, engine, get_async_db
+from routers import quiz
+from schemas import QuizQuestion, QuizQuestionCreate
+
+QUESTIONS = 12
+ROUNDS = 1000
+
+before_app = FastAPI()
+
+
+@before_app.get("/quiz/questions", response_model=List[QuizQuestion])
+async def get_quiz_questions(db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.get_quiz_questions(db)
+
+
+after_app = FastAPI()
+after_app.include_router(quiz.router)
+
+
+async def measure(app: FastAPI, revalidate: bool = False) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {}
+        if revalidate:
+            headers["If-None-Match"] = (await client.get("/quiz/questions")).headers["etag"]
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            response = await client.get("/quiz/questions", headers=headers)
+            assert response.status_code == (304 if revalidate else 200)
+        return (time.perf_counter() - start) / ROUNDS * 1_000_000
+
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    for i in range(QUESTIONS):
+        crud.create_quiz_question(db, QuizQuestionCreate(
+            question=f"Вопрос {i}: какой бюджет на покупку участка?",
+            options=["до 500 тыс.", "500 тыс. - 1 млн", "1 - 3 млн", "более 3 млн"],
+            order=QUESTIONS - i,
+        ))
+    db.close()
+
+    before_us = await measure(before_app)
+    after_us = await measure(after_app)
+    not_modified_us = await measure(after_app, revalidate=True)
+
+    print(f"GET /quiz/questions, {QUESTIONS} вопросов, среднее за {ROUNDS} запросов")
+    print(f"  до (запрос к базе):   {before_us:7.0f} мкс")
+    print(f"  после (кэш):          {after_us:7.0f} мкс")
+    print(f"  после (304 по ETag):  {not_modified_us:7.0f} мкс")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
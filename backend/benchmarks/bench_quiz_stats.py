@@ -0,0 +1,106 @@
+"""
+Статистика ответов квиза: GET /admin/stats/quiz.
+
+"До": выборка всех заявок-квизов и разбор JSON-поля answers в Python при
+каждом запросе - время растет с числом заявок.
+"После": crud_async.get_quiz_stats читает счетчики quiz_option_stats,
+которые обновляются при отправке квиза, - время не зависит от числа заявок.
+
+Запуск из каталога backend: python -m benchmarks.bench_quiz_stats
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TMP = tempfile.mkdtemp()
+# Настройки читаются при импорте модулей приложения
+os.environ.update(
+    DATABASE_URL="sqlite:///" + os.path.join(TMP, "bench.db"),
+    QUIZ_EPOCH_FILE=os.path.join(TMP, "quiz.epoch"),
+)
+
+from collections import Counter
+
+import crud
+import crud_async
+from database import AsyncSessionLocal, Base, SessionLocal, engine
+from models import QuizOptionStat, Request, RequestType
+from schemas import QuizQuestionCreate
+
+QUESTIONS = 6
+OPTIONS = ["до 500 тыс.", "500 тыс. - 1 млн", "1 - 3 млн", "более 3 млн"]
+SIZES = [1000, 10000, 50000]
+ROUNDS = 5
+
+
+def stats_before(db) -> dict:
+    """Прежний способ: разбор ответов всех заявок"""
+    counts = Counter()
+    submissions = 0
+    for (answers,) in db.query(Request.answers).filter(Request.type == RequestType.QUIZ):
+        submissions += 1
+        counts.update(crud.parse_quiz_answers(db, answers))
+    return {"submissions": submissions, "counts": counts}
+
+
+def add_requests(db, question_ids, count: int):
+    """Заявки-квизы и их вклад в счетчики, как после create_request"""
+    rows = []
+    counts = Counter()
+    for _ in range(count):
+        answers = {str(question_id): random.choice(OPTIONS)
+                   for question_id in question_ids if random.random() < 0.8}
+        rows.append({"type": RequestType.QUIZ, "name": "Иван", "phone": "+79990000000",
+                     "email": "ivan@example.com", "answers": answers, "status": "new"})
+        counts[(0, "")] += 1
+        counts.update(answers.items())
+    db.bulk_insert_mappings(Request, rows)
+    for (question_id, option), value in counts.items():
+        stat = db.get(QuizOptionStat, (int(question_id), option))
+        if stat is None:
+            db.add(QuizOptionStat(question_id=int(question_id), option=option, count=value))
+        else:
+            stat.count += value
+    db.commit()
+
+
+def measure_before(db) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        stats_before(db)
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+async def measure_after() -> float:
+    async with AsyncSessionLocal() as db:
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            await crud_async.get_quiz_stats(db)
+        return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    question_ids = [
+        crud.create_quiz_question(db, QuizQuestionCreate(question=f"Вопрос {i}", options=OPTIONS, order=i)).id
+        for i in range(QUESTIONS)
+    ]
+    print(f"Статистика квиза ({QUESTIONS} вопросов), среднее за {ROUNDS} запросов")
+    print(f"  {'заявок':>8}  {'до (разбор JSON)':>18}  {'после (счетчики)':>18}")
+    total = 0
+    for size in SIZES:
+        add_requests(db, question_ids, size - total)
+        total = size
+        before_ms = measure_before(db)
+        after_ms = await measure_after()
+        print(f"  {size:>8}  {before_ms:>15.1f} мс  {after_ms:>15.2f} мс")
+    db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""
+Пропускная способность эндпоинтов каталога в зависимости от числа воркеров.
+
+Приложение запускается через uvicorn с WEB_CONCURRENCY = 1, 2, ... (до
+числа ядер) на временной базе со 100 участками. Нагрузку дают несколько
+клиентских процессов, каждый держит CONCURRENCY одновременных запросов
+GET /plots/ и GET /plots/{id}. Фоновые задачи и бот отключены.
+
+Запуск из каталога backend: python -m benchmarks.bench_workers
+"""
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLOTS = 100
+DURATION = 5
+CONCURRENCY = 16
+CPU_COUNT = os.cpu_count() or 1
+WORKER_COUNTS = sorted({1, 2, CPU_COUNT} | {n for n in (4, 8) if n <= CPU_COUNT})
+
+
+def seed(env: dict):
+    """Создает схему и участки во временной базе отдельным процессом"""
+    code = (
+        "import models, init_db\n"
+        "from database import SessionLocal\n"
+        "init_db.init_db()\n"
+        "db = SessionLocal()\n"
+        f"for i in range(1, {PLOTS} + 1):\n"
+        "    db.add(models.LandPlot(title=f'Участок {i}', area=10 + i, price=1000000 + i,\n"
+        "        location='Чемал', region='Республика Алтай', land_category='ИЖС',\n"
+        "        description={'text': 'Участок у подножия гор. ' * 20, 'attachments': []},\n"
+        "        features=['Вид на горы'], communications=['Электричество']))\n"
+        "db.commit()\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def load(base_url: str, deadline: float) -> int:
+    done = 0
+
+    async def client(i: int):
+        nonlocal done
+        async with httpx.AsyncClient(base_url=base_url) as http:
+            while time.time() < deadline:
+                path = "/plots/" if i % 2 else f"/plots/{done % PLOTS + 1}"
+                response = await http.get(path)
+                response.raise_for_status()
+                done += 1
+
+    await asyncio.gather(*(client(i) for i in range(CONCURRENCY)))
+    return done
+
+
+def load_process(base_url: str, deadline: float) -> int:
+    return asyncio.run(load(base_url, deadline))
+
+
+def wait_ready(base_url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(base_url + "/")
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError("Сервер не запустился")
+
+
+def measure(workers: int, env: dict) -> float:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=dict(env, WEB_CONCURRENCY=str(workers))
+    )
+    try:
+        wait_ready(base_url)
+        # Прогрев: каждый воркер заполняет свой кэш фрагментов
+        asyncio.run(load(base_url, time.time() + 1))
+        deadline = time.time() + DURATION
+        with multiprocessing.Pool(CPU_COUNT) as pool:
+            total = sum(pool.starmap(load_process, [(base_url, deadline)] * CPU_COUNT))
+        return total / DURATION
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    state_dir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite:///" + os.path.join(state_dir, "bench.db"),
+        LEADER_LOCK_FILE=os.path.join(state_dir, "leader.lock"),
+        ADMIN_SESSION_EPOCH_FILE=os.path.join(state_dir, "admin_sessions.epoch"),
+        RATE_LIMIT_DB=os.path.join(state_dir, "rate_limits.db"),
+        BACKGROUND_JOBS="off",
+        TELEGRAM_BOT_ENABLED="0",
+    )
+    seed(env)
+    print(f"Каталог: {CONCURRENCY * CPU_COUNT} одновременных запросов, {DURATION} с на замер, ядер: {CPU_COUNT}")
+    single = None
+    for workers in WORKER_COUNTS:
+        rps = measure(workers, env)
+        single = single or rps
+        print(f"  воркеров {workers}: {rps:.0f} запросов/с ({rps / single:.2f}x)")
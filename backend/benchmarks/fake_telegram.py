@@ -0,0 +1,81 @@
+"""
+Локальный сервер, отвечающий как Telegram Bot API на sendMessage.
+
+Используется бенчмарками вместе с TELEGRAM_API_URL: задержка ответа,
+доля ошибок 500 и доля ответов 429 (retry_after) задаются параметрами.
+flood_limit имитирует ограничение Telegram на чат: не больше flood_limit
+сообщений за flood_window секунд, сверх этого - 429 до конца окна.
+"""
+import asyncio
+import math
+import random
+import time
+from typing import List, Optional
+
+from aiohttp import web
+
+
+class FakeTelegram:
+    def __init__(
+        self,
+        delay: float = 0,
+        error_rate: float = 0,
+        retry_after_rate: float = 0,
+        flood_limit: int = 0,
+        flood_window: float = 60
+    ):
+        self.delay = delay
+        self.error_rate = error_rate
+        self.retry_after_rate = retry_after_rate
+        self.flood_limit = flood_limit
+        self.flood_window = flood_window
+        self.messages: List[str] = []
+        self.calls = 0
+        self.throttled = 0
+        self._window_start = 0.0
+        self._window_count = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    def _retry_after(self, seconds: int) -> web.Response:
+        self.throttled += 1
+        return web.json_response(
+            {"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {seconds}",
+             "parameters": {"retry_after": seconds}}, status=429
+        )
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        data = await request.post()
+        if self.flood_limit:
+            now = time.monotonic()
+            if now - self._window_start >= self.flood_window:
+                self._window_start, self._window_count = now, 0
+            if self._window_count >= self.flood_limit:
+                return self._retry_after(max(1, math.ceil(self._window_start + self.flood_window - now)))
+            self._window_count += 1
+        roll = random.random()
+        if roll < self.error_rate:
+            return web.json_response(
+                {"ok": False, "error_code": 500, "description": "Internal Server Error"}, status=500
+            )
+        if roll < self.error_rate + self.retry_after_rate:
+            return self._retry_after(1)
+        self.messages.append(data["text"])
+        return web.json_response({"ok": True, "result": {
+            "message_id": len(self.messages),
+            "date": int(time.time()),
+            "chat": {"id": int(data["chat_id"]), "type": "private"},
+            "text": data["text"],
+        }})
+
+    async def start(self, port: int):
+        app = web.Application()
+        app.router.add_post("/bot{token}/sendMessage", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
@@ -0,0 +1,174 @@
+"""
+Нагрузочная проверка команды /check_promo Telegram-бота.
+
+Команды подаются в диспетчер aiogram пачками по CONCURRENCY, ответы бот
+отправляет в локальный Bot API (benchmarks.fake_telegram). Во время
+прогона измеряются занятые соединения пулов базы, открытые файлы базы и
+задержка event loop (тот же loop обслуживает HTTP).
+"До": обработчик в прежнем виде - next(get_db()) и синхронный запрос,
+сессия не закрывается явно и держит соединение. Когда соединения пула
+(5 + 10) заканчиваются, поток event loop ждет свободного соединения и
+прогон останавливается; ожидание сокращено до POOL_TIMEOUT секунд.
+"После": диспетчер бота с telegram_bot.handlers - асинхронный слой и
+кэш промокодов.
+
+Запуск из каталога backend: python -m benchmarks.soak_check_promo
+"""
+import asyncio
+import gc
+import os
+import socket
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+PORT = free_port()
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench.db")
+# Настройки читаются при импорте модулей приложения
+os.environ.update(
+    DATABASE_URL="sqlite:///" + DB_PATH,
+    TELEGRAM_BOT_TOKEN="123:bench",
+    TELEGRAM_ADMIN_CHAT_ID="1",
+    TELEGRAM_API_URL=f"http://127.0.0.1:{PORT}",
+)
+
+from aiogram import Dispatcher
+from aiogram.filters import Command
+from aiogram.types import Message, Update
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+import crud
+import schemas
+from benchmarks.fake_telegram import FakeTelegram
+from database import Base, SessionLocal, async_engine, engine, get_db
+from telegram_bot.bot import bot, dp
+
+COMMANDS = 3000
+CONCURRENCY = 10
+CODES = 200
+TELEGRAM_DELAY = 0.005
+POOL_TIMEOUT = 2
+
+old_dp = Dispatcher()
+
+
+@old_dp.message(Command("check_promo"))
+async def old_check_promo(message: Message):
+    promo_code = message.text.split()[1]
+    db = next(get_db())
+    request = crud.get_request_by_promo(db, promo_code)
+    if not request:
+        await message.answer("❌ Промокод не найден!")
+        return
+    await message.answer("✅ Промокод действителен и может быть использован!")
+
+
+def db_files() -> int:
+    """Открытые процессом дескрипторы файла базы"""
+    count = 0
+    for fd in os.listdir("/proc/self/fd"):
+        try:
+            count += os.readlink(f"/proc/self/fd/{fd}") == DB_PATH
+        except OSError:
+            pass
+    return count
+
+
+def connections() -> int:
+    """Соединения, выданные пулами (у aiosqlite NullPool - их видно по файлам базы)"""
+    pools = (SessionLocal.kw["bind"].pool, async_engine.pool)
+    return sum(getattr(pool, "checkedout", lambda: 0)() for pool in pools)
+
+
+def update(update_id: int) -> Update:
+    # Половина кодов выдана заявкам, половина - нет
+    code = f"PROMO{update_id % (CODES * 2)}"
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Admin"},
+            "text": f"/check_promo {code}",
+        },
+    }, context={"bot": bot})
+
+
+async def soak(dp: Dispatcher) -> dict:
+    stats = {"peak_connections": 0, "peak_files": 0, "files_before": db_files()}
+    lags = []
+
+    async def monitor():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - start - 0.01)
+            stats["peak_connections"] = max(stats["peak_connections"], connections())
+            stats["peak_files"] = max(stats["peak_files"], db_files())
+
+    monitor_task = asyncio.create_task(monitor())
+    start = time.perf_counter()
+    stats["handled"] = 0
+    try:
+        for offset in range(0, COMMANDS, CONCURRENCY):
+            await asyncio.gather(*(dp.feed_update(bot, update(i)) for i in range(offset, offset + CONCURRENCY)))
+            stats["handled"] += CONCURRENCY
+    except PoolTimeoutError:
+        # Все соединения пула заняты незакрытыми сессиями
+        pass
+    stats["rate"] = stats["handled"] / (time.perf_counter() - start)
+    stats["peak_connections"] = max(stats["peak_connections"], connections())
+    monitor_task.cancel()
+    stats["connections_after"] = connections()
+    stats["lag_p99"] = sorted(lags)[int(len(lags) * 0.99)] if lags else 0
+    stats["files_after"] = db_files()
+    return stats
+
+
+async def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    for i in range(CODES):
+        request = crud.create_request(db, schemas.RequestCreate(type="quiz", name="Иван", phone="+79990000000", email="ivan@example.com"))
+        request.promo_code = f"PROMO{i}"
+    db.commit()
+    db.close()
+
+    telegram = FakeTelegram(delay=TELEGRAM_DELAY)
+    await telegram.start(PORT)
+    before_engine = create_engine(
+        os.environ["DATABASE_URL"], connect_args={"check_same_thread": False}, pool_timeout=POOL_TIMEOUT
+    )
+    SessionLocal.configure(bind=before_engine)
+    before = await soak(old_dp)
+    # Незакрытые сессии освобождаются только сборщиком мусора
+    gc.collect()
+    before_engine.dispose()
+    SessionLocal.configure(bind=engine)
+    after = await soak(dp)
+    await bot.session.close()
+    await telegram.stop()
+    await async_engine.dispose()
+
+    print(f"{COMMANDS} команд /check_promo по {CONCURRENCY} одновременно")
+    for title, stats in (("до (синхронная сессия)", before), ("после (async + кэш)", after)):
+        print(
+            f"  {title:24} обработано {stats['handled']:5}, {stats['rate']:6.0f} команд/с, "
+            f"соединений пула: пик {stats['peak_connections']:2}, после {stats['connections_after']:2}; "
+            f"открыто файлов базы: пик {stats['peak_files']:2}, {stats['files_before']} -> {stats['files_after']}; "
+            f"задержка loop p99 {stats['lag_p99'] * 1000:.1f} мс"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,30 @@
+import argparse
+import sys
+
+from database import SessionLocal
+from utils.media_check import check_media
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Проверка индекса файлов на соответствие диску")
+    parser.add_argument("--verify-hash", action="store_true", help="сверять sha256 содержимого (медленно)")
+    parser.add_argument("--reindex", action="store_true", help="проиндексировать старые изображения и вложения")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = check_media(db, verify_hash=args.verify_hash, reindex=args.reindex)
+    finally:
+        db.close()
+
+    for title, paths in (
+        ("Файл отсутствует", report.missing),
+        ("Размер не совпадает", report.size_mismatch),
+        ("Хэш не совпадает", report.hash_mismatch),
+        ("Нет в индексе", report.unindexed),
+    ):
+        for path in paths:
+            print(f"{title}: {path}")
+
+    print(f"Проверено записей: {report.checked}, проиндексировано: {report.reindexed}")
+    sys.exit(0 if report.ok else 1)
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
-import models
+from database import SessionLocal
+from init_db import init_db
 import crud
 
 def create_first_admin(username: str, password: str):
@@ -29,7 +29,7 @@ if __name__ == "__main__":
     username = sys.argv[1]
     password = sys.argv[2]
     
-    # Создаем таблицы, если они еще не существуют
-    models.Base.metadata.create_all(bind=engine)
+    # Создаем или обновляем схему базы, если это еще не сделано
+    init_db()
     
     create_first_admin(username, password) 
\ No newline at end of file
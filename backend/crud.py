@@ -3,26 +3,39 @@ import models
 import schemas
 from fastapi import UploadFile
 import os
-from datetime import datetime
+from datetime import date, datetime, timedelta
 import json
-from sqlalchemy import Boolean, or_, func
-from typing import List, Optional
-from models import LandPlot, Image, plot_images, QuizQuestion, Request, Admin, AdminSession
+import logging
+from collections import Counter
+from sqlalchemy import Boolean, delete, literal_column, or_, func, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from typing import Iterator, List, Optional, Tuple
+import events
+from database import IS_SQLITE
+from models import (
+    LandPlot, Image, plot_images, QuizQuestion, Request, Admin, AdminSession, AdminStreamTicket, NotificationOutbox,
+    IdempotencyKey,
+    QuizAnswer, QuizOptionStat, RequestType, REQUESTS_SEARCH_DOCUMENT
+)
 from schemas import ImageOrder, QuizQuestionCreate, QuizQuestionUpdate
-from utils.auth import verify_password, get_password_hash, generate_session_token, create_session_expiration
+from utils.auth import (
+    ADMIN_TOKEN_MODE, AdminPrincipal, get_password_hash,
+    generate_session_token, create_session_expiration, create_access_token, hash_session_token
+)
+from utils.dedup import IDEMPOTENCY_KEY_TTL, LEAD_DEDUP_WINDOW, lead_dedup_keys
+from utils.time import get_msk_time
+from utils.lead_search import decode_cursor, fts_match_expression, like_pattern, parse_search
+from utils.phone import normalize_phone
+from utils.promo import (
+    PROMO_CODE_ATTEMPTS, PROMO_REDEEMED, PROMO_USED, generate_promo_code, normalize_promo_code, promo_cache
+)
+from utils.quiz_cache import quiz_cache
+from utils.session_cache import session_cache
+from utils.images import StoredImage, store_image
+from utils.storage import image_file_path, remove_file, storage_key
 
-def deserialize_json_fields(plot):
-    """Десериализуем JSON поля из строк в объекты"""
-    try:
-        if isinstance(plot.terrain, str):
-            plot.terrain = json.loads(plot.terrain)
-        if isinstance(plot.features, str):
-            plot.features = json.loads(plot.features)
-        if isinstance(plot.communications, str):
-            plot.communications = json.loads(plot.communications)
-    except Exception as e:
-        print(f"Ошибка десериализации: {e}")
-    return plot
+logger = logging.getLogger(__name__)
 
 def get_land_plot(db: Session, plot_id: int, show_hidden: bool = False):
     query = db.query(models.LandPlot).filter(models.LandPlot.id == plot_id)
@@ -33,25 +46,13 @@ def get_land_plot(db: Session, plot_id: int, show_hidden: bool = False):
     plot = query.first()
     
     if plot:
-        # Десериализуем JSON поля
-        if isinstance(plot.description, str):
-            plot.description = json.loads(plot.description)
-        if isinstance(plot.features, str):
-            plot.features = json.loads(plot.features) if plot.features else []
-        if isinstance(plot.communications, str):
-            plot.communications = json.loads(plot.communications) if plot.communications else []
-        if isinstance(plot.cadastral_numbers, str):
-            plot.cadastral_numbers = json.loads(plot.cadastral_numbers) if plot.cadastral_numbers else []
-        
         # Сортируем изображения
         plot.images.sort(key=lambda x: (not x.is_main, x.order))
     
     return plot
 
-def get_land_plots(
-    db: Session,
-    skip: int = 0,
-    limit: int = 9,
+def filter_land_plots(
+    query,
     search: str = None,
     status: str = None,
     category: str = None,
@@ -62,9 +63,9 @@ def get_land_plots(
     region: str = None,
     location: str = None,
     show_hidden: bool = False
-) -> List[models.LandPlot]:
-    query = db.query(models.LandPlot)
-
+):
+    """Применяет фильтры каталога к запросу по участкам"""
+    # Фильтруем скрытые участки
     if not show_hidden:
         query = query.filter(models.LandPlot.is_visible == True)
 
@@ -99,90 +100,36 @@ def get_land_plots(
     if location:
         query = query.filter(models.LandPlot.location == location)
 
+    return query
+
+def get_land_plots(
+    db: Session,
+    skip: int = 0,
+    limit: int = 9,
+    show_hidden: bool = False,
+    **filters
+) -> List[models.LandPlot]:
+    query = filter_land_plots(db.query(models.LandPlot), show_hidden=show_hidden, **filters)
     plots = query.offset(skip).limit(limit).all()
     
-    # Десериализуем JSON поля для каждого участка
     for plot in plots:
-        if isinstance(plot.description, str):
-            plot.description = json.loads(plot.description)
-        if isinstance(plot.features, str):
-            plot.features = json.loads(plot.features) if plot.features else []
-        if isinstance(plot.communications, str):
-            plot.communications = json.loads(plot.communications) if plot.communications else []
-        if isinstance(plot.cadastral_numbers, str):
-            plot.cadastral_numbers = json.loads(plot.cadastral_numbers) if plot.cadastral_numbers else []
-        
         # Сортируем изображения
         plot.images.sort(key=lambda x: (not x.is_main, x.order))
     
     return plots
 
-def get_plots_count(
-    db: Session,
-    search: str = None,
-    status: str = None,
-    category: str = None,
-    price_min: float = None,
-    price_max: float = None,
-    area_min: float = None,
-    area_max: float = None,
-    region: str = None,
-    location: str = None,
-    show_hidden: bool = False
-) -> int:
-    query = db.query(func.count(models.LandPlot.id))
-
-    # Фильтруем скрытые участки
-    if not show_hidden:
-        query = query.filter(models.LandPlot.is_visible == True)
-
-    if search:
-        # Добавляем поиск по кадастровым номерам
-        query = query.filter(
-            or_(
-                models.LandPlot.title.ilike(f"%{search}%"),
-                # Используем функцию для поиска в JSON поле
-                func.json_extract(models.LandPlot.cadastral_numbers, '$').like(f"%{search}%")
-            )
-        )
-    
-    if status:
-        query = query.filter(models.LandPlot.status == status)
-    
-    if price_min is not None:
-        query = query.filter(models.LandPlot.price >= price_min)
-    
-    if price_max is not None:
-        query = query.filter(models.LandPlot.price <= price_max)
-    
-    if area_min is not None:
-        query = query.filter(models.LandPlot.area >= area_min)
-    
-    if area_max is not None:
-        query = query.filter(models.LandPlot.area <= area_max)
-    
-    if region:
-        query = query.filter(models.LandPlot.region == region)
-    
-    if location:
-        query = query.filter(models.LandPlot.location == location)
-
+def get_plots_count(db: Session, show_hidden: bool = False, **filters) -> int:
+    query = filter_land_plots(db.query(func.count(models.LandPlot.id)), show_hidden=show_hidden, **filters)
     return query.scalar()
 
 def create_land_plot(db: Session, plot: schemas.LandPlotCreate):
     try:
         plot_dict = plot.model_dump()
-        print(f"Данные для создания участка: {plot_dict}")
+        logger.debug("Данные для создания участка: %s", plot_dict)
         
-        # Преобразуем поля в JSON
-        if isinstance(plot_dict["description"], dict):
-            plot_dict["description"] = json.dumps(plot_dict["description"])
-        if isinstance(plot_dict["features"], list):
-            plot_dict["features"] = json.dumps(plot_dict["features"])
-        if isinstance(plot_dict["communications"], list):
-            plot_dict["communications"] = json.dumps(plot_dict["communications"])
-        if isinstance(plot_dict["cadastral_numbers"], list):
-            plot_dict["cadastral_numbers"] = json.dumps(plot_dict["cadastral_numbers"])
+        # Без явного значения в price_per_meter остается объект property из схемы
+        if not isinstance(plot_dict.get("price_per_meter"), int):
+            plot_dict.pop("price_per_meter", None)
         
         # Проверяем, что price_per_sotka существует
         if "price_per_sotka" not in plot_dict and hasattr(plot, "price_per_meter"):
@@ -192,32 +139,22 @@ def create_land_plot(db: Session, plot: schemas.LandPlotCreate):
         model_fields = [c.name for c in models.LandPlot.__table__.columns]
         for key in list(plot_dict.keys()):
             if key not in model_fields and key != "price_per_meter":
-                print(f"Удаляем поле {key}, которого нет в модели")
+                logger.debug("Удаляем поле %s, которого нет в модели", key)
                 del plot_dict[key]
         
-        print(f"Данные после обработки: {plot_dict}")
+        logger.debug("Данные после обработки: %s", plot_dict)
         
         db_plot = models.LandPlot(**plot_dict)
         db.add(db_plot)
+        db.flush()
+        link_plot_attachments(db, db_plot.id, plot.description.attachments)
         db.commit()
         db.refresh(db_plot)
         
-        # Десериализуем поля перед возвратом
-        if isinstance(db_plot.description, str):
-            db_plot.description = json.loads(db_plot.description)
-        if isinstance(db_plot.features, str):
-            db_plot.features = json.loads(db_plot.features) if db_plot.features else []
-        if isinstance(db_plot.communications, str):
-            db_plot.communications = json.loads(db_plot.communications) if db_plot.communications else []
-        if isinstance(db_plot.cadastral_numbers, str):
-            db_plot.cadastral_numbers = json.loads(db_plot.cadastral_numbers) if db_plot.cadastral_numbers else []
-        
         return db_plot
     except Exception as e:
         db.rollback()
-        print(f"Ошибка в create_land_plot: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Ошибка в create_land_plot: %s", e)
         raise
 
 def delete_land_plot(db: Session, plot_id: int):
@@ -227,10 +164,11 @@ def delete_land_plot(db: Session, plot_id: int):
         for image in db_plot.images:
             # Удаляем файл изображения
             try:
-                if os.path.exists(image.path):
-                    os.remove(image.path)
+                file_path = image_file_path(image)
+                if file_path:
+                    remove_file(file_path)
             except Exception as e:
-                print(f"Ошибка при удалении файла {image.path}: {e}")
+                logger.warning("Ошибка при удалении файла %s: %s", image.path, e)
             # Удаляем запись из базы
             db.delete(image)
         
@@ -240,52 +178,27 @@ def delete_land_plot(db: Session, plot_id: int):
         return True
     return False
 
-def save_image(upload_folder: str, file: UploadFile) -> tuple[str, str]:
+def save_image(upload_folder: str, file: UploadFile) -> StoredImage:
     try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        # Обеспечиваем безопасное имя файла
-        original_filename = file.filename or "unnamed_file"
-        safe_filename = "".join(c for c in original_filename if c.isalnum() or c in ('-', '_', '.'))
-        if not safe_filename:
-            safe_filename = "unnamed_file"
-            
-        # Добавляем расширение, если его нет
-        if '.' not in safe_filename:
-            content_type = file.content_type or "application/octet-stream"
-            if content_type.startswith("image/"):
-                ext = content_type.split("/")[1]
-                if ext == "jpeg":
-                    ext = "jpg"
-                safe_filename = f"{safe_filename}.{ext}"
-        
-        filename = f"{timestamp}_{safe_filename}"
-        file_path = os.path.join(upload_folder, filename)
-        
-        # Создаем директорию, если она не существует
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        # Выводим отладочную информацию
-        print(f"Сохранение файла: {filename}")
-        print(f"Полный путь: {os.path.abspath(file_path)}")
-        
         try:
             contents = file.file.read()
-            with open(file_path, "wb") as f:
-                f.write(contents)
             file.file.seek(0)  # Возвращаем указатель в начало файла
+
+            # Отпечаток содержимого в имени делает URL неизменяемым
+            stored = store_image(upload_folder, file.filename, file.content_type, contents)
+
+            logger.debug("Сохранен файл %s", os.path.join(upload_folder, stored.filename))
         except Exception as e:
-            print(f"Ошибка при сохранении файла {filename}: {e}")
+            logger.error("Ошибка при сохранении файла %s: %s", file.filename, e)
             raise
         
-        # Возвращаем и имя файла, и путь для URL
-        return filename, f"/images/{filename}"  # Изменили путь с /static/images на /images
+        # Возвращаем имя файла, путь для URL и вычисленные метаданные
+        return stored
     except Exception as e:
-        print(f"Ошибка в save_image: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Ошибка в save_image: %s", e)
         raise
 
-def create_image(db: Session, filename: str, path: str, order: int = -1):
+def create_image(db: Session, filename: str, path: str, order: int = -1, **image_metadata):
     try:
         # Если order не указан или -1, получаем максимальный текущий порядок
         if order == -1:
@@ -293,13 +206,13 @@ def create_image(db: Session, filename: str, path: str, order: int = -1):
             order += 1
             
         # Создаем новое изображение с указанным порядком
-        db_image = models.Image(filename=filename, path=path, order=order)
+        db_image = models.Image(filename=filename, path=path, order=order, **image_metadata)
         db.add(db_image)
         db.commit()
         db.refresh(db_image)
         return db_image
     except Exception as e:
-        print(f"Ошибка в create_image: {e}")
+        logger.error("Ошибка в create_image: %s", e)
         db.rollback()
         raise
 
@@ -309,17 +222,102 @@ def add_image_to_plot(db: Session, plot_id: int, image_id: int):
         image = db.query(models.Image).filter(models.Image.id == image_id).first()
         
         if not plot or not image:
-            print(f"Не найден участок (id={plot_id}) или изображение (id={image_id})")
+            logger.warning("Не найден участок (id=%s) или изображение (id=%s)", plot_id, image_id)
             return False
             
         plot.images.append(image)
         db.commit()
         return True
     except Exception as e:
-        print(f"Ошибка в add_image_to_plot: {e}")
+        logger.error("Ошибка в add_image_to_plot: %s", e)
         db.rollback()
         return False
 
+def create_plot_images(db: Session, plot_id: int, stored_images: List[StoredImage], main_index: int = -1) -> List[dict]:
+    """
+    Создает записи изображений и привязывает их к участку одной транзакцией.
+    Порядок продолжает текущий порядок изображений участка без пропусков.
+    """
+    try:
+        plot = db.query(models.LandPlot).filter(models.LandPlot.id == plot_id).first()
+        if not plot:
+            return []
+
+        base_order = (
+            db.query(func.max(models.Image.order))
+            .join(plot_images, plot_images.c.image_id == models.Image.id)
+            .filter(plot_images.c.plot_id == plot_id)
+            .scalar()
+        )
+        base_order = -1 if base_order is None else base_order
+
+        # Главным становится выбранное изображение или первое, если у участка его нет
+        has_main = any(img.is_main for img in plot.images)
+        if main_index < 0 and not has_main:
+            main_index = 0
+        if 0 <= main_index < len(stored_images):
+            for img in plot.images:
+                img.is_main = False
+
+        db_images = [
+            models.Image(
+                filename=stored.filename,
+                path=stored.path,
+                order=base_order + 1 + index,
+                is_main=index == main_index,
+                **stored.metadata()
+            )
+            for index, stored in enumerate(stored_images)
+        ]
+        plot.images.extend(db_images)
+        db.flush()
+
+        result = [{"filename": img.filename, "path": img.path, "id": img.id} for img in db_images]
+        db.commit()
+        return result
+    except Exception as e:
+        logger.error("Ошибка в create_plot_images: %s", e)
+        db.rollback()
+        raise
+
+def create_attachment(
+    db: Session,
+    public_id: str,
+    name: str,
+    type: str,
+    url: str,
+    file_path: str,
+    size: int,
+    mime_type: Optional[str],
+    content_hash: str
+) -> models.Attachment:
+    """Записывает метаданные загруженного документа в индекс"""
+    db_attachment = models.Attachment(
+        public_id=public_id,
+        name=name,
+        type=type,
+        url=url,
+        storage_key=storage_key(file_path),
+        size=size,
+        mime_type=mime_type,
+        content_hash=content_hash
+    )
+    db.add(db_attachment)
+    db.commit()
+    db.refresh(db_attachment)
+    return db_attachment
+
+def get_attachment_by_key(db: Session, key: str) -> Optional[models.Attachment]:
+    return db.query(models.Attachment).filter(models.Attachment.storage_key == key).first()
+
+def link_plot_attachments(db: Session, plot_id: int, attachments: List[schemas.FileAttachment]):
+    """Привязывает проиндексированные документы к участку (без коммита)"""
+    urls = [attachment.url for attachment in attachments]
+    if urls:
+        db.query(models.Attachment).filter(models.Attachment.url.in_(urls)).update(
+            {"plot_id": plot_id}, synchronize_session=False
+        )
+
 def update_land_plot(db: Session, plot_id: int, plot: schemas.LandPlotUpdate):
     db_plot = get_land_plot(db, plot_id, show_hidden=True)
     if not db_plot:
@@ -327,32 +325,15 @@ def update_land_plot(db: Session, plot_id: int, plot: schemas.LandPlotUpdate):
     
     plot_data = plot.model_dump(exclude_unset=True)
     
-    # Преобразуем поля в JSON
-    if 'description' in plot_data and isinstance(plot_data['description'], dict):
-        plot_data['description'] = json.dumps(plot_data['description'])
-    if 'features' in plot_data and isinstance(plot_data['features'], list):
-        plot_data['features'] = json.dumps(plot_data['features'])
-    if 'communications' in plot_data and isinstance(plot_data['communications'], list):
-        plot_data['communications'] = json.dumps(plot_data['communications'])
-    if 'cadastral_numbers' in plot_data and isinstance(plot_data['cadastral_numbers'], list):
-        plot_data['cadastral_numbers'] = json.dumps(plot_data['cadastral_numbers'])
-    
     for key, value in plot_data.items():
         setattr(db_plot, key, value)
     
+    if plot.description is not None:
+        link_plot_attachments(db, plot_id, plot.description.attachments)
+    
     db.commit()
     db.refresh(db_plot)
     
-    # Десериализуем поля перед возвратом
-    if isinstance(db_plot.description, str):
-        db_plot.description = json.loads(db_plot.description)
-    if isinstance(db_plot.features, str):
-        db_plot.features = json.loads(db_plot.features) if db_plot.features else []
-    if isinstance(db_plot.communications, str):
-        db_plot.communications = json.loads(db_plot.communications) if db_plot.communications else []
-    if isinstance(db_plot.cadastral_numbers, str):
-        db_plot.cadastral_numbers = json.loads(db_plot.cadastral_numbers) if db_plot.cadastral_numbers else []
-    
     return db_plot
 
 def update_plot_visibility(
@@ -367,7 +348,7 @@ def update_plot_visibility(
     db_plot.is_visible = is_visible
     db.commit()
     db.refresh(db_plot)
-    return deserialize_json_fields(db_plot)
+    return db_plot
 
 def get_image(db: Session, image_id: int):
     return db.query(models.Image).filter(models.Image.id == image_id).first()
@@ -379,16 +360,14 @@ def delete_image(db: Session, image_id: int) -> bool:
             return False
             
         # Удаляем файл
-        file_path = os.path.join('static', 'images', image.filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        remove_file(image_file_path(image))
             
         # Удаляем запись из БД
         db.delete(image)
         db.commit()
         return True
     except Exception as e:
-        print(f"Ошибка при удалении изображения: {e}")
+        logger.error("Ошибка при удалении изображения: %s", e)
         db.rollback()
         return False
 
@@ -415,7 +394,7 @@ def set_image_as_main(db: Session, plot_id: int, image_id: int) -> bool:
         db.commit()
         return True
     except Exception as e:
-        print(f"Ошибка при установке главного изображения: {e}")
+        logger.error("Ошибка при установке главного изображения: %s", e)
         db.rollback()
         return False
 
@@ -447,19 +426,19 @@ def reorder_plot_images(db: Session, plot_id: int, images: List[ImageOrder]):
                         raise ValueError("Может быть только одно главное изображение")
                     image.is_main = True
                     main_image_set = True
-                    print(f"Устанавливаю изображение {image.id} как главное")
+                    logger.debug("Устанавливаю изображение %s как главное", image.id)
         
         # Если ни одно изображение не отмечено как главное, делаем первое главным
         if not main_image_set and images:
             first_image = db.query(models.Image).filter(models.Image.id == images[0].id).first()
             if first_image:
                 first_image.is_main = True
-                print(f"Автоматически устанавливаю первое изображение {first_image.id} как главное")
+                logger.debug("Автоматически устанавливаю первое изображение %s как главное", first_image.id)
         
         db.commit()
         return True
     except Exception as e:
-        print(f"Ошибка при обновлении порядка изображений: {str(e)}")
+        logger.error("Ошибка при обновлении порядка изображений: %s", e)
         db.rollback()
         raise e
 
@@ -522,6 +501,7 @@ def create_quiz_question(db: Session, question: QuizQuestionCreate):
     db_question = QuizQuestion(**question_data)
     db.add(db_question)
     db.commit()
+    quiz_cache.invalidate()
     db.refresh(db_question)
     
     # Десериализуем options перед возвратом
@@ -549,6 +529,7 @@ def update_quiz_question(db: Session, question_id: int, question: QuizQuestionUp
         setattr(db_question, key, value)
     
     db.commit()
+    quiz_cache.invalidate()
     db.refresh(db_question)
     
     # Десериализуем options перед возвратом
@@ -565,34 +546,284 @@ def delete_quiz_question(db: Session, question_id: int) -> bool:
     
     db.delete(db_question)
     db.commit()
+    quiz_cache.invalidate()
     return True
 
 # Функции для работы с заявками
-def get_requests(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
+def filter_requests(
+    query,
     type: str = None,
-    status: str = None
-) -> List[Request]:
-    query = db.query(Request)
-    
+    status: str = None,
+    search: str = None,
+    date_from: date = None,
+    date_to: date = None,
+    cursor: str = None
+):
+    """
+    Применяет фильтры списка заявок и упорядочивает от новых к старым.
+    search - подстрока в имени, телефоне, email, сообщении или заметках
+    (см. utils.lead_search), date_from/date_to - даты создания включительно,
+    cursor - позиция последней заявки предыдущей страницы.
+    ValueError - поврежденный курсор
+    """
     if type:
         query = query.filter(Request.type == type)
     if status:
         query = query.filter(Request.status == status)
-    
-    return query.order_by(Request.created_at.desc()).offset(skip).limit(limit).all()
+    if date_from:
+        query = query.filter(Request.created_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.filter(Request.created_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+
+    search_query = parse_search(search)
+    if search_query is not None:
+        if IS_SQLITE:
+            match = fts_match_expression(search_query)
+            if match:
+                query = query.filter(Request.id.in_(
+                    select(literal_column("rowid")).select_from(text("requests_fts"))
+                    .where(text("requests_fts MATCH :search_match").bindparams(search_match=match))
+                ))
+        else:
+            document = literal_column(REQUESTS_SEARCH_DOCUMENT)
+            if search_query.phone:
+                query = query.filter(or_(*(
+                    Request.phone_normalized.like(like_pattern(digits), escape="\\")
+                    for digits in search_query.phone
+                )))
+            for term in search_query.terms:
+                query = query.filter(document.like(like_pattern(term), escape="\\"))
+        # Короткие слова - среди найденных по остальным условиям. lower() в SQLite
+        # не меняет кириллицу, поэтому проверяются и написания с заглавной буквы
+        for term in search_query.short_terms:
+            query = query.filter(or_(*(
+                column.ilike(like_pattern(variant), escape="\\")
+                for column in (Request.name, Request.phone_normalized, Request.email, Request.message, Request.notes)
+                for variant in dict.fromkeys((term, term.capitalize(), term.upper()))
+            )))
+
+    if cursor:
+        created_at, request_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Request.created_at, Request.id) < tuple_(created_at, request_id))
+    return query.order_by(Request.created_at.desc(), Request.id.desc())
+
+def get_requests(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    **filters
+) -> List[Request]:
+    query = filter_requests(db.query(Request), **filters)
+    if not filters.get("cursor"):
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def find_submitted_request(
+    db: Session,
+    idempotency_key: Optional[str],
+    dedup_keys: List[str]
+) -> Optional[Request]:
+    """Ранее сохраненная заявка, повтором которой является текущая отправка"""
+    now = datetime.utcnow()
+    if idempotency_key:
+        original = db.query(Request).join(IdempotencyKey, IdempotencyKey.request_id == Request.id).filter(
+            IdempotencyKey.key == idempotency_key,
+            IdempotencyKey.created_at > now - timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+        ).first()
+        if original is not None:
+            return original
+    if dedup_keys:
+        return db.query(Request).filter(
+            Request.dedup_key.in_(dedup_keys),
+            Request.created_at > now - timedelta(seconds=LEAD_DEDUP_WINDOW)
+        ).first()
+    return None
 
 def create_request(
     db: Session,
-    request: schemas.RequestCreate
+    request: schemas.RequestCreate,
+    notify: bool = False,
+    with_promo_code: bool = False,
+    idempotency_key: Optional[str] = None
 ) -> Request:
-    db_request = Request(**request.model_dump())
-    db.add(db_request)
+    """
+    Создает заявку; с notify в той же транзакции ставит уведомление в outbox.
+    with_promo_code - выдать заявке новый промокод: если он совпал с уже
+    выданным (уникальный индекс), транзакция повторяется с другим кодом.
+
+    Повторная отправка (тот же idempotency_key или заявка того же типа с
+    того же телефона в пределах LEAD_DEDUP_WINDOW, см. utils.dedup)
+    возвращает исходную заявку: без записи в базу и без уведомления.
+    """
+    now = datetime.utcnow()
+    dedup_keys = lead_dedup_keys(getattr(request.type, "value", request.type), request.phone, now)
+    for attempt in range(PROMO_CODE_ATTEMPTS):
+        original = find_submitted_request(db, idempotency_key, dedup_keys)
+        if original is not None:
+            logger.info("Повторная отправка заявки %s, новая не создается", original.id)
+            return original
+
+        db_request = Request(
+            **request.model_dump(), phone_normalized=normalize_phone(request.phone), created_at=now,
+            dedup_key=dedup_keys[0] if dedup_keys else None
+        )
+        if with_promo_code:
+            db_request.promo_code = generate_promo_code()
+        db.add(db_request)
+        try:
+            db.flush()
+            if idempotency_key:
+                # Истекший, но еще не удаленный ключ освобождается
+                db.query(IdempotencyKey).filter(
+                    IdempotencyKey.key == idempotency_key,
+                    IdempotencyKey.created_at <= now - timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+                ).delete(synchronize_session=False)
+                db.add(IdempotencyKey(key=idempotency_key, request_id=db_request.id, created_at=now))
+                db.flush()
+        except IntegrityError:
+            # Одновременный повтор уже сохранил заявку (найдется на следующем шаге) или совпал промокод
+            db.rollback()
+            if attempt == PROMO_CODE_ATTEMPTS - 1:
+                raise
+            continue
+        if db_request.type == RequestType.QUIZ:
+            record_quiz_answers(db, db_request)
+        if notify:
+            enqueue_notification(db, "request", request_notification_payload(db_request))
+        events.publish(db, "request.created", request_event_payload(db_request))
+        db.commit()
+        db.refresh(db_request)
+        return db_request
+
+def parse_quiz_answers(db: Session, answers) -> List[Tuple[int, str]]:
+    """
+    Пары (id вопроса, ответ) из Request.answers. Ключ - id вопроса
+    (так отправляет квиз), в старых заявках - текст вопроса
+    """
+    if isinstance(answers, str):
+        answers = json.loads(answers)
+    if not isinstance(answers, dict):
+        return []
+    pairs = []
+    question_ids = None
+    for key, option in answers.items():
+        if option is None or option == "":
+            continue
+        key = str(key)
+        if key.isdigit():
+            question_id = int(key)
+        else:
+            if question_ids is None:
+                question_ids = dict(db.query(QuizQuestion.question, QuizQuestion.id))
+            question_id = question_ids.get(key)
+            if question_id is None:
+                continue
+        pairs.append((question_id, str(option)[:200]))
+    return pairs
+
+def record_quiz_answers(db: Session, db_request: Request):
+    """
+    Записывает ответы квиза в quiz_answers и увеличивает счетчики
+    quiz_option_stats - в транзакции вызывающего, одним UPSERT
+    """
+    pairs = parse_quiz_answers(db, db_request.answers)
+    if pairs:
+        db.execute(QuizAnswer.__table__.insert(), [
+            {"request_id": db_request.id, "question_id": question_id, "option": option,
+             "created_at": db_request.created_at}
+            for question_id, option in pairs
+        ])
+    increments = Counter(pairs)
+    increments[(0, "")] += 1  # Отправленные квизы
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    table = QuizOptionStat.__table__
+    upsert = dialect.insert(table).values([
+        {"question_id": question_id, "option": option, "count": count}
+        for (question_id, option), count in increments.items()
+    ])
+    db.execute(upsert.on_conflict_do_update(
+        index_elements=[table.c.question_id, table.c.option],
+        set_={"count": table.c.count + upsert.excluded.count}
+    ))
+
+def request_notification_payload(db_request: Request) -> dict:
+    """Данные заявки для уведомления в Telegram"""
+    return {
+        "id": db_request.id,
+        "type": getattr(db_request.type, "value", db_request.type),
+        "name": db_request.name,
+        "phone": db_request.phone,
+        "email": db_request.email,
+        "message": db_request.message,
+        "promo_code": db_request.promo_code,
+        "answers": db_request.answers
+    }
+
+def request_event_payload(db_request: Request) -> dict:
+    """Данные заявки для ленты событий админки - как в списке заявок"""
+    return schemas.Request.model_validate(db_request).model_dump(mode="json")
+
+def enqueue_notification(db: Session, kind: str, payload: dict) -> NotificationOutbox:
+    """Добавляет уведомление в outbox; фиксируется вместе с транзакцией вызывающего"""
+    notification = NotificationOutbox(kind=kind, payload=payload)
+    db.add(notification)
+    return notification
+
+def get_due_notifications(db: Session, limit: int) -> List[NotificationOutbox]:
+    return (
+        db.query(NotificationOutbox)
+        .filter(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= datetime.utcnow())
+        .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+        .limit(limit)
+        .all()
+    )
+
+def mark_notifications_sent(db: Session, notification_ids: List[int]):
+    db.query(NotificationOutbox).filter(NotificationOutbox.id.in_(notification_ids)).update({
+        "status": "sent",
+        "sent_at": datetime.utcnow(),
+        "last_error": None
+    }, synchronize_session=False)
     db.commit()
-    db.refresh(db_request)
-    return db_request
+
+def reschedule_notifications(
+    db: Session,
+    notification_ids: List[int],
+    error: str,
+    next_attempt_at: datetime,
+    count_attempt: bool = True,
+    dead: bool = False
+):
+    """Неудачная попытка: новая попытка в next_attempt_at или перевод в dead"""
+    values = {
+        "status": "dead" if dead else "pending",
+        "next_attempt_at": next_attempt_at,
+        "last_error": error[:1000]
+    }
+    if count_attempt:
+        values["attempts"] = NotificationOutbox.attempts + 1
+    db.query(NotificationOutbox).filter(NotificationOutbox.id.in_(notification_ids)).update(
+        values, synchronize_session=False
+    )
+    db.commit()
+
+def requeue_dead_notifications(db: Session) -> int:
+    """Возвращает неотправленные уведомления в очередь с обнуленным счетчиком попыток"""
+    count = db.query(NotificationOutbox).filter(NotificationOutbox.status == "dead").update({
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": datetime.utcnow()
+    })
+    db.commit()
+    return count
+
+def delete_sent_notifications(db: Session, before: datetime) -> int:
+    count = db.query(NotificationOutbox).filter(
+        NotificationOutbox.status == "sent",
+        NotificationOutbox.sent_at < before
+    ).delete(synchronize_session=False)
+    db.commit()
+    return count
 
 def update_request(
     db: Session,
@@ -606,10 +837,88 @@ def update_request(
     for key, value in request.model_dump().items():
         setattr(db_request, key, value)
     
+    db.flush()
+    events.publish(db, "request.updated", request_event_payload(db_request))
     db.commit()
     db.refresh(db_request)
     return db_request
 
+def bulk_update_requests(
+    db: Session,
+    changes: dict,
+    ids: Optional[List[int]] = None,
+    filters: Optional[dict] = None
+) -> int:
+    """
+    Меняет status/notes заявок из ids или подходящих под filters (см.
+    filter_requests) одним UPDATE, без загрузки заявок. Возвращает число
+    измененных заявок
+    """
+    statement = update(Request).values(**changes, updated_at=datetime.utcnow())
+    if ids is not None:
+        statement = statement.where(Request.id.in_(ids))
+    else:
+        statement = statement.where(Request.id.in_(filter_requests(select(Request.id), **filters).order_by(None)))
+    updated = db.scalars(statement.returning(Request.id).execution_options(synchronize_session=False)).all()
+    if updated:
+        events.publish(db, "requests.updated", {"ids": updated, "changes": changes})
+    db.commit()
+    return len(updated)
+
+# Поля заявки в выгрузке: колонка и заголовок
+REQUEST_EXPORT_FIELDS = [
+    (Request.id, "ID"),
+    (Request.created_at, "Создана (МСК)"),
+    (Request.type, "Тип"),
+    (Request.status, "Статус"),
+    (Request.name, "Имя"),
+    (Request.phone, "Телефон"),
+    (Request.email, "Email"),
+    (Request.message, "Сообщение"),
+    (Request.promo_code, "Промокод"),
+    (Request.promo_redeemed_at, "Промокод погашен (МСК)"),
+    (Request.notes, "Заметки"),
+]
+EXPORT_BATCH_SIZE = 1000
+
+def export_requests(db: Session, **filters) -> Tuple[List[str], Iterator[list]]:
+    """
+    Заголовок и строки выгрузки заявок (фильтры filter_requests). Ответы
+    квиза - по колонке на вопрос. Строки читаются из базы пачками по
+    EXPORT_BATCH_SIZE по мере обхода итератора, сессия должна быть открыта
+    до его завершения
+    """
+    questions = db.query(QuizQuestion.id, QuizQuestion.question).order_by(QuizQuestion.order, QuizQuestion.id).all()
+    header = [title for _, title in REQUEST_EXPORT_FIELDS] + [question for _, question in questions]
+
+    def rows() -> Iterator[list]:
+        query = filter_requests(select(*(column for column, _ in REQUEST_EXPORT_FIELDS)), **filters)
+        result = db.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for batch in result.partitions():
+            answers = {}
+            for request_id, question_id, option in db.execute(
+                select(QuizAnswer.request_id, QuizAnswer.question_id, QuizAnswer.option)
+                .where(QuizAnswer.request_id.in_([row.id for row in batch]))
+            ):
+                answers.setdefault(request_id, {})[question_id] = option
+            for row in batch:
+                request_answers = answers.get(row.id, {})
+                yield [
+                    row.id,
+                    get_msk_time(row.created_at) if row.created_at else None,
+                    row.type.value,
+                    row.status,
+                    row.name,
+                    row.phone,
+                    row.email,
+                    row.message,
+                    row.promo_code,
+                    get_msk_time(row.promo_redeemed_at) if row.promo_redeemed_at else None,
+                    row.notes,
+                ] + [request_answers.get(question_id) for question_id, _ in questions]
+
+    return header, rows()
+
 def get_request(
     db: Session,
     request_id: int
@@ -619,21 +928,8 @@ def get_request(
 def get_admin_by_username(db: Session, username: str):
     return db.query(Admin).filter(Admin.username == username).first()
 
-def get_admin_by_session(db: Session, session_token: str):
-    session = (
-        db.query(AdminSession)
-        .filter(
-            AdminSession.session_token == session_token,
-            AdminSession.is_active == True,
-            AdminSession.expires_at > datetime.utcnow()
-        )
-        .first()
-    )
-    if session:
-        return db.query(Admin).filter(Admin.id == session.admin_id).first()
-    return None
-
-def create_admin_session(db: Session, admin_id: int) -> AdminSession:
+def create_admin_session(db: Session, admin_id: int) -> Tuple[str, AdminSession]:
+    """Создает сессию и возвращает токен (в базе хранится только его хэш) и саму сессию"""
     # Деактивируем все предыдущие сессии
     db.query(AdminSession).filter(
         AdminSession.admin_id == admin_id,
@@ -641,26 +937,87 @@ def create_admin_session(db: Session, admin_id: int) -> AdminSession:
     ).update({"is_active": False})
     
     # Создаем новую сессию
+    expires_at = create_session_expiration()
+    if ADMIN_TOKEN_MODE == "jwt":
+        admin = db.query(Admin).filter(Admin.id == admin_id).first()
+        session_token = create_access_token(AdminPrincipal.from_admin(admin), expires_at)
+    else:
+        session_token = generate_session_token()
     session = AdminSession(
         admin_id=admin_id,
-        session_token=generate_session_token(),
-        expires_at=create_session_expiration()
+        token_hash=hash_session_token(session_token),
+        expires_at=expires_at
     )
     db.add(session)
     db.commit()
+    # Деактивированные сессии больше не должны приниматься из кэша. Эпоха
+    # сдвигается после commit: иначе другой воркер успел бы прочитать старую
+    # сессию активной и закэшировать ее уже с новой эпохой
+    session_cache.invalidate_admin(admin_id)
     db.refresh(session)
-    return session
+    return session_token, session
 
-def authenticate_admin(db: Session, username: str, password: str):
-    admin = get_admin_by_username(db, username)
-    if not admin or not verify_password(password, admin.hashed_password):
-        return None
-    
-    # Обновляем время последнего входа
-    admin.last_login = datetime.utcnow()
+def delete_stale_admin_sessions(db: Session, batch_size: int = 500) -> int:
+    """Удаляет истекшие и деактивированные сессии пачками, возвращает число удаленных"""
+    deleted = 0
+    while True:
+        ids = [
+            session_id for (session_id,) in
+            db.query(AdminSession.id)
+            .filter(or_(AdminSession.is_active == False, AdminSession.expires_at <= datetime.utcnow()))
+            .limit(batch_size)
+        ]
+        if not ids:
+            return deleted
+        db.query(AdminSession).filter(AdminSession.id.in_(ids)).delete(synchronize_session=False)
+        # Короткие транзакции: не держим блокировку записи SQLite
+        db.commit()
+        deleted += len(ids)
+
+def create_stream_ticket(db: Session, admin_id: int, session_token: str) -> str:
+    """
+    Одноразовый билет на подключение к ленте событий, действует
+    EVENTS_TICKET_TTL секунд (в базе хранится только его хэш)
+    """
+    ticket = generate_session_token()
+    db.add(AdminStreamTicket(
+        ticket_hash=hash_session_token(ticket),
+        admin_id=admin_id,
+        session_hash=hash_session_token(session_token),
+        expires_at=datetime.utcnow() + timedelta(seconds=events.EVENTS_TICKET_TTL)
+    ))
     db.commit()
-    
-    return admin
+    return ticket
+
+def redeem_stream_ticket(db: Session, ticket: str) -> Optional[bytes]:
+    """
+    Погашает билет и возвращает хэш токена выдавшей его сессии. None -
+    билет неизвестен, истек или уже использован (DELETE атомарен, поэтому
+    билет принимает только один воркер)
+    """
+    session_hash = db.execute(
+        delete(AdminStreamTicket)
+        .where(
+            AdminStreamTicket.ticket_hash == hash_session_token(ticket),
+            AdminStreamTicket.expires_at > datetime.utcnow()
+        )
+        .returning(AdminStreamTicket.session_hash)
+    ).scalar()
+    db.commit()
+    return session_hash
+
+def delete_expired_stream_tickets(db: Session) -> int:
+    """Удаляет неиспользованные истекшие билеты ленты событий"""
+    count = db.query(AdminStreamTicket).filter(
+        AdminStreamTicket.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return count
+
+def login_admin(db: Session, admin_id: int) -> Tuple[str, AdminSession]:
+    """Отмечает вход администратора и создает для него новую сессию"""
+    db.query(Admin).filter(Admin.id == admin_id).update({"last_login": datetime.utcnow()})
+    return create_admin_session(db, admin_id)
 
 def create_admin(db: Session, username: str, password: str):
     hashed_password = get_password_hash(password)
@@ -671,5 +1028,34 @@ def create_admin(db: Session, username: str, password: str):
     return db_admin
 
 def get_request_by_promo(db: Session, promo_code: str):
-    """Получить заявку по промокоду"""
-    return db.query(models.Request).filter(models.Request.promo_code == promo_code).first() 
\ No newline at end of file
+    """Получить заявку по промокоду (поиск по уникальному индексу)"""
+    promo_code = normalize_promo_code(promo_code)
+    if promo_code is None:
+        return None
+    return db.query(models.Request).filter(models.Request.promo_code == promo_code).first()
+
+def redeem_promo_code(db: Session, promo_code: str) -> Optional[str]:
+    """
+    Гасит промокод одним условным UPDATE. Возвращает PROMO_REDEEMED,
+    PROMO_USED, если код уже погашен, или None, если он не выдавался.
+    """
+    promo_code = normalize_promo_code(promo_code)
+    if promo_code is None:
+        return None
+    redeemed = db.query(Request).filter(
+        Request.promo_code == promo_code,
+        Request.promo_redeemed_at.is_(None)
+    ).update({"promo_redeemed_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    promo_cache.invalidate(promo_code)
+    if redeemed:
+        return PROMO_REDEEMED
+    return PROMO_USED if get_request_by_promo(db, promo_code) else None 
+
+def delete_expired_idempotency_keys(db: Session) -> int:
+    """Удаляет ключи Idempotency-Key старше IDEMPOTENCY_KEY_TTL"""
+    count = db.query(IdempotencyKey).filter(
+        IdempotencyKey.created_at <= datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_KEY_TTL)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return count
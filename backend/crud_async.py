@@ -0,0 +1,263 @@
+"""
+Асинхронные версии функций чтения из crud.py для async-обработчиков.
+
+Правило для обработчиков:
+- async def - только чтение через AsyncSession (Depends(get_async_db))
+  и функции этого модуля, event loop при этом не блокируется;
+- обработчики, которые пишут в базу, объявляются обычным def с Session
+  (Depends(get_db)) - FastAPI выполняет их в пуле потоков;
+- если async-обработчику все же нужна синхронная запись (например, вход
+  после асинхронной проверки пароля), она вызывается через run_in_threadpool.
+"""
+import json
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+import serializers
+from crud import filter_land_plots, filter_requests
+from database import AsyncSessionLocal
+from models import LandPlot, QuizQuestion, QuizOptionStat, Request, Admin, AdminSession
+from utils.auth import ADMIN_TOKEN_MODE, AdminPrincipal, decode_access_token, hash_session_token, verify_password_async
+from utils.quiz_cache import QuizDocument, quiz_cache
+from utils.promo import PROMO_REDEEMED, PROMO_USED, PROMO_VALID, normalize_promo_code, promo_cache
+from utils.session_cache import session_cache
+from utils.ttl_cache import MISSING
+
+
+def _active_session(token_hash: bytes):
+    return (
+        select(Admin, AdminSession.expires_at)
+        .join(AdminSession, AdminSession.admin_id == Admin.id)
+        .filter(
+            AdminSession.token_hash == token_hash,
+            AdminSession.is_active == True,
+            AdminSession.expires_at > datetime.utcnow()
+        )
+        .limit(1)
+    )
+
+
+async def get_admin_session(db: AsyncSession, session_token: str):
+    """Администратор и срок действия активной сессии - одним запросом"""
+    result = await db.execute(_active_session(hash_session_token(session_token)))
+    return result.first()
+
+
+async def is_admin_session_active(session_hash: bytes) -> bool:
+    """
+    Действует ли сессия с хэшем токена session_hash. Без кэша сессий:
+    лента событий должна сразу заметить, что сессию деактивировали
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(_active_session(session_hash))
+    return result.first() is not None
+
+
+async def get_admin_principal(session_token: str) -> Optional[AdminPrincipal]:
+    """
+    Проверяет токен администратора. Подписанный токен (ADMIN_TOKEN_MODE=jwt)
+    проверяется без базы, обычный - по кэшу, и только при промахе запросом
+    к admin_sessions.
+    """
+    if ADMIN_TOKEN_MODE == "jwt":
+        return decode_access_token(session_token)
+
+    principal = session_cache.get(session_token)
+    if principal is not None:
+        return principal
+
+    epoch = session_cache.epoch()
+    async with AsyncSessionLocal() as db:
+        row = await get_admin_session(db, session_token)
+    if row is None:
+        return None
+    principal = AdminPrincipal.from_admin(row.Admin)
+    session_cache.set(session_token, principal, row.expires_at, epoch)
+    return principal
+
+
+async def authenticate_admin(db: AsyncSession, username: str, password: str) -> Optional[Admin]:
+    """Проверяет пароль в пуле хэширования, не блокируя event loop"""
+    admin = await db.scalar(select(Admin).filter(Admin.username == username))
+    if not admin or not await verify_password_async(password, admin.hashed_password):
+        return None
+    return admin
+
+
+async def serialize_land_plots(db: AsyncSession, **kwargs) -> bytes:
+    """JSON страницы каталога, см. serializers.serialize_land_plots"""
+    return await db.run_sync(lambda session: serializers.serialize_land_plots(session, **kwargs))
+
+
+async def serialize_land_plot(db: AsyncSession, plot_id: int, show_hidden: bool = False) -> Optional[bytes]:
+    """JSON одного участка, см. serializers.serialize_land_plot"""
+    return await db.run_sync(serializers.serialize_land_plot, plot_id, show_hidden)
+
+
+async def get_plots_count(db: AsyncSession, show_hidden: bool = False, **filters) -> int:
+    query = filter_land_plots(select(func.count(LandPlot.id)), show_hidden=show_hidden, **filters)
+    return await db.scalar(query)
+
+
+async def get_plot_values(db: AsyncSession, column) -> List[str]:
+    """Уникальные непустые значения колонки видимых участков (регионы, локации, категории)"""
+    result = await db.scalars(
+        select(column)
+        .filter(LandPlot.is_visible == True)  # Только видимые участки
+        .group_by(column)
+    )
+    return sorted(value for value in result if value)
+
+
+async def get_contact_info(db: AsyncSession) -> Optional[models.ContactInfo]:
+    return await db.scalar(select(models.ContactInfo).limit(1))
+
+
+async def get_public_quiz() -> QuizDocument:
+    """Документ публичного квиза из кэша; сессия открывается только при промахе"""
+    document = quiz_cache.get()
+    if document is not None:
+        return document
+    epoch = quiz_cache.epoch()
+    async with AsyncSessionLocal() as db:
+        document = await db.run_sync(serializers.serialize_quiz)
+    quiz_cache.set(document, epoch)
+    return document
+
+
+async def get_quiz_stats(db: AsyncSession) -> dict:
+    """
+    Воронка и распределение ответов квиза по счетчикам quiz_option_stats:
+    время не зависит от числа заявок
+    """
+    counts = {}
+    for question_id, option, count in await db.execute(
+        select(QuizOptionStat.question_id, QuizOptionStat.option, QuizOptionStat.count)
+    ):
+        counts.setdefault(question_id, {})[option] = count
+    submissions = counts.pop(0, {}).get("", 0)
+
+    questions = await db.execute(
+        select(QuizQuestion.id, QuizQuestion.question, QuizQuestion.options, QuizQuestion.order)
+        .filter(QuizQuestion.is_active == True)
+        .order_by(QuizQuestion.order, QuizQuestion.id)
+    )
+    funnel = []
+    distribution = []
+    for question_id, question, options, order in questions:
+        if isinstance(options, str):
+            options = json.loads(options)
+        option_counts = counts.get(question_id, {})
+        answered = sum(option_counts.values())
+        # Варианты вопроса по порядку, затем ответы, которых среди вариантов уже нет
+        names = list(options or []) + sorted(name for name in option_counts if name not in (options or []))
+        funnel.append({
+            "question_id": question_id,
+            "question": question,
+            "order": order,
+            "answered": answered,
+            "rate": round(answered / submissions, 4) if submissions else 0,
+        })
+        distribution.append({
+            "question_id": question_id,
+            "question": question,
+            "answered": answered,
+            "options": [
+                {
+                    "option": name,
+                    "count": option_counts.get(name, 0),
+                    "share": round(option_counts.get(name, 0) / answered, 4) if answered else 0,
+                }
+                for name in names
+            ],
+        })
+    return {"submissions": submissions, "funnel": funnel, "questions": distribution}
+
+
+async def get_quiz_questions(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[QuizQuestion]:
+    """Получить список вопросов для квиза"""
+    result = await db.scalars(
+        select(QuizQuestion)
+        .order_by(QuizQuestion.order)
+        .offset(skip)
+        .limit(limit)
+    )
+    questions = result.all()
+
+    # Убедимся, что options - это список
+    for question in questions:
+        if isinstance(question.options, str):
+            question.options = json.loads(question.options)
+
+    return questions
+
+
+async def get_requests(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    **filters
+) -> List[Request]:
+    """Заявки с фильтрами crud.filter_requests; с курсором skip не используется"""
+    query = filter_requests(select(Request), **filters)
+    if not filters.get("cursor"):
+        query = query.offset(skip)
+    result = await db.scalars(query.limit(limit))
+    return result.all()
+
+
+async def get_request(db: AsyncSession, request_id: int) -> Optional[Request]:
+    return await db.get(Request, request_id)
+
+
+async def count(db: AsyncSession, model, *criteria) -> int:
+    """Число записей модели, удовлетворяющих условиям"""
+    return await db.scalar(select(func.count()).select_from(model).filter(*criteria))
+
+
+async def get_promo_state(db: AsyncSession, promo_code: str) -> Optional[str]:
+    """PROMO_VALID, PROMO_USED или None, если промокод не выдавался (поиск по индексу)"""
+    redeemed_at = await db.execute(
+        select(Request.promo_redeemed_at).filter(Request.promo_code == promo_code).limit(1)
+    )
+    row = redeemed_at.first()
+    if row is None:
+        return None
+    return PROMO_VALID if row.promo_redeemed_at is None else PROMO_USED
+
+
+async def check_promo_code(promo_code: str) -> Optional[str]:
+    """get_promo_state с кэшем на PROMO_CACHE_TTL секунд; сессия открывается только при промахе"""
+    promo_code = normalize_promo_code(promo_code)
+    if promo_code is None:
+        return None
+    state = promo_cache.get(promo_code)
+    if state is not MISSING:
+        return state
+    epoch = promo_cache.epoch()
+    async with AsyncSessionLocal() as db:
+        state = await get_promo_state(db, promo_code)
+    promo_cache.set(promo_code, state, epoch)
+    return state
+
+
+async def redeem_promo_code(promo_code: str) -> Optional[str]:
+    """Гасит промокод, см. crud.redeem_promo_code"""
+    promo_code = normalize_promo_code(promo_code)
+    if promo_code is None:
+        return None
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(Request)
+            .where(Request.promo_code == promo_code, Request.promo_redeemed_at.is_(None))
+            .values(promo_redeemed_at=datetime.utcnow())
+        )
+        await db.commit()
+        promo_cache.invalidate(promo_code)
+        if result.rowcount:
+            return PROMO_REDEEMED
+        return PROMO_USED if await get_promo_state(db, promo_code) else None
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -6,25 +7,41 @@ import os
 # Создаем директорию для базы данных, если её нет
 os.makedirs("db", exist_ok=True)
 
-# Используем SQLite вместо PostgreSQL
-SQLALCHEMY_DATABASE_URL = "sqlite:///./db/altailand.db"
+# По умолчанию SQLite, для PostgreSQL задается DATABASE_URL (postgresql://...)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./db/altailand.db")
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
 
-# Создаем движок SQLite с поддержкой внешних ключей
+
+def async_database_url(url: str) -> str:
+    """URL того же подключения для асинхронного драйвера (aiosqlite/asyncpg)"""
+    scheme, rest = url.split("://", 1)
+    driver = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}.get(scheme.split("+")[0], scheme)
+    return f"{driver}://{rest}"
+
+
+ASYNC_DATABASE_URL = async_database_url(SQLALCHEMY_DATABASE_URL)
+
+# Синхронный движок: запись и обработчики, выполняемые в пуле потоков
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Только для SQLite
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {}  # Только для SQLite
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+# Асинхронный движок: чтение в async-обработчиках, не блокирует event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
-# Создаем все таблицы
-from models import *
-Base.metadata.create_all(bind=engine)
+# Схемой управляет Alembic (см. init_db.py), при импорте таблицы не создаются
+Base = declarative_base()
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
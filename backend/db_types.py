@@ -0,0 +1,24 @@
+import orjson
+from sqlalchemy.types import Text, TypeDecorator
+
+
+class JSONText(TypeDecorator):
+    """
+    JSON-колонка, хранящая значение текстом и декодирующая его ровно один раз
+    быстрым парсером orjson. Совместима по хранению с колонкой JSON в SQLite.
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, (str, bytes)):
+            return orjson.loads(value)
+        # Драйвер уже разобрал значение (например, колонка json в PostgreSQL)
+        return value
@@ -0,0 +1,282 @@
+"""
+Лента событий заявок для админки (GET /admin/events, Server-Sent Events).
+
+Вместо опроса /admin/requests/ и /admin/stats каждые несколько секунд
+из каждой вкладки админка подписывается на события:
+- request.created - новая заявка (данные как в списке заявок);
+- request.updated - изменены статус или заметки заявки;
+- requests.updated - массовое изменение (ids и изменения);
+- reset - события после Last-Event-ID уже недоступны, список нужно
+  загрузить заново.
+
+crud публикует событие в транзакции изменения (publish), подписчики
+получают его только после commit. Где хранятся события, задает
+EVENTS_BACKEND:
+- local - в памяти процесса (последние EVENTS_BUFFER_SIZE), для одного
+  воркера и тестов;
+- database - таблица lead_events, общая для воркеров (WEB_CONCURRENCY > 1,
+  по умолчанию в этом случае). Каждый воркер читает новые события раз в
+  EVENTS_POLL_INTERVAL секунд одним запросом, сколько бы вкладок ни было
+  подключено; события старше EVENTS_RETENTION_HOURS удаляет фоновая задача.
+
+Номер события - id: при переподключении браузер передает последний
+полученный в Last-Event-ID, и лента продолжается с пропущенных событий.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Deque, List, Optional
+
+import orjson
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import LeadEvent
+
+logger = logging.getLogger(__name__)
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "database" if WEB_CONCURRENCY > 1 else "local")
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", 1))
+EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", 1000))
+EVENTS_RETENTION_HOURS = int(os.getenv("EVENTS_RETENTION_HOURS", 24))
+# Пинг подписчикам без событий, чтобы прокси не закрывал соединение
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", 15))
+# Соединение закрывается через столько секунд, браузер переподключается с
+# Last-Event-ID. Иначе остановка воркера ждет закрытия вкладок админки
+EVENTS_STREAM_TIMEOUT = float(os.getenv("EVENTS_STREAM_TIMEOUT", 300))
+# Как часто открытая лента проверяет, что сессия администратора действует
+EVENTS_AUTH_RECHECK = float(os.getenv("EVENTS_AUTH_RECHECK", 15))
+# Срок действия одноразового билета на подключение (POST /admin/events/ticket)
+EVENTS_TICKET_TTL = int(os.getenv("EVENTS_TICKET_TTL", 30))
+
+EVENTS_BATCH_SIZE = 500
+# Ключ advisory-блокировки PostgreSQL: события фиксируются в порядке id
+EVENTS_LOCK_KEY = 4807
+# События транзакции, ожидающие commit (Session.info)
+_PENDING = "lead_events"
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    kind: str
+    data: dict
+
+
+def format_sse(lead_event: Event) -> bytes:
+    """Событие в формате text/event-stream"""
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (
+        lead_event.id, lead_event.kind.encode(), orjson.dumps(lead_event.data)
+    )
+
+
+class LocalBackend:
+    """События в памяти процесса: видны только подписчикам этого воркера"""
+
+    def __init__(self, size: int = EVENTS_BUFFER_SIZE):
+        self._events: Deque[Event] = deque(maxlen=size)
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def add(self, db: Session, kind: str, data: dict):
+        # Событие получает номер после commit, см. committed
+        pass
+
+    def committed(self, items: List[tuple]):
+        with self._lock:
+            for kind, data in items:
+                self._last_id += 1
+                self._events.append(Event(self._last_id, kind, data))
+
+    def read(self, after_id: int, limit: int) -> List[Event]:
+        with self._lock:
+            return [lead_event for lead_event in self._events if lead_event.id > after_id][:limit]
+
+    def first_id(self) -> Optional[int]:
+        with self._lock:
+            return self._events[0].id if self._events else None
+
+    def last_id(self) -> int:
+        return self._last_id
+
+
+class DatabaseBackend:
+    """События в таблице lead_events: общие для всех воркеров"""
+
+    def add(self, db: Session, kind: str, data: dict):
+        if db.get_bind().dialect.name == "postgresql":
+            # Иначе транзакция с меньшим id может зафиксироваться позже и
+            # подписчик, уже прочитавший следующие события, ее пропустит
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": EVENTS_LOCK_KEY})
+        db.add(LeadEvent(kind=kind, payload=data))
+
+    def committed(self, items: List[tuple]):
+        pass
+
+    def read(self, after_id: int, limit: int) -> List[Event]:
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(LeadEvent.id, LeadEvent.kind, LeadEvent.payload)
+                .filter(LeadEvent.id > after_id)
+                .order_by(LeadEvent.id)
+                .limit(limit)
+                .all()
+            )
+            return [Event(row.id, row.kind, row.payload) for row in rows]
+        finally:
+            db.close()
+
+    def first_id(self) -> Optional[int]:
+        db = SessionLocal()
+        try:
+            return db.query(func.min(LeadEvent.id)).scalar()
+        finally:
+            db.close()
+
+    def last_id(self) -> int:
+        db = SessionLocal()
+        try:
+            return db.query(func.max(LeadEvent.id)).scalar() or 0
+        finally:
+            db.close()
+
+    def delete_expired(self) -> int:
+        db = SessionLocal()
+        try:
+            before = datetime.utcnow() - timedelta(hours=EVENTS_RETENTION_HOURS)
+            deleted = db.query(LeadEvent).filter(LeadEvent.created_at < before).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+
+class EventHub:
+    """
+    Раздача событий подписчикам процесса. run() читает новые события из
+    backend (одна задача на воркер) и хранит последние EVENTS_BUFFER_SIZE,
+    подписчики читают их из общего буфера
+    """
+
+    def __init__(self, backend, buffer_size: int = EVENTS_BUFFER_SIZE):
+        self.backend = backend
+        self._events: Deque[Event] = deque(maxlen=buffer_size)
+        self._last_id = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._changed: Optional[asyncio.Event] = None
+
+    def publish(self, db: Session, kind: str, data: dict):
+        """Событие фиксируется вместе с транзакцией db"""
+        self.backend.add(db, kind, data)
+        db.info.setdefault(_PENDING, []).append((kind, data))
+
+    def committed(self, session: Session):
+        items = session.info.pop(_PENDING, None)
+        if not items:
+            return
+        self.backend.committed(items)
+        # Новые события этого воркера раздаются сразу, не дожидаясь опроса
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                # Event loop уже закрыт (остановка приложения)
+                pass
+
+    async def run(self):
+        """Бесконечный цикл чтения событий"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._changed = asyncio.Event()
+        self._last_id = await asyncio.to_thread(self.backend.last_id)
+        while True:
+            self._wakeup.clear()
+            try:
+                events = await asyncio.to_thread(self.backend.read, self._last_id, EVENTS_BATCH_SIZE)
+            except Exception as e:
+                logger.error("Ошибка чтения событий заявок: %s", e)
+                events = []
+            if events:
+                self._events.extend(events)
+                self._last_id = events[-1].id
+                changed, self._changed = self._changed, asyncio.Event()
+                changed.set()
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), EVENTS_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def _buffered_after(self, position: int) -> Optional[List[Event]]:
+        """События буфера после position; None - буфер начинается позже"""
+        if not self._events or position < self._events[0].id - 1:
+            return None
+        events = []
+        for lead_event in reversed(self._events):
+            if lead_event.id <= position:
+                break
+            events.append(lead_event)
+        events.reverse()
+        return events
+
+    async def subscribe(self, last_event_id: Optional[int] = None) -> AsyncIterator[Optional[Event]]:
+        """
+        События после last_event_id (без него - только новые). None -
+        событий не было EVENTS_HEARTBEAT секунд
+        """
+        if self._changed is None:
+            raise RuntimeError("EventHub не запущен")
+        position = self._last_id if last_event_id is None else min(last_event_id, self._last_id)
+        while True:
+            changed = self._changed
+            if position < self._last_id:
+                events = self._buffered_after(position)
+                if events is None:
+                    first_id = await asyncio.to_thread(self.backend.first_id)
+                    if first_id is not None and position >= first_id - 1:
+                        events = await asyncio.to_thread(self.backend.read, position, EVENTS_BATCH_SIZE)
+                    if not events:
+                        # Пропущенные события уже удалены
+                        position = self._last_id
+                        yield Event(position, "reset", {})
+                        continue
+                for lead_event in events:
+                    position = lead_event.id
+                    yield lead_event
+                continue
+            try:
+                await asyncio.wait_for(changed.wait(), EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield None
+
+
+hub = EventHub(DatabaseBackend() if EVENTS_BACKEND == "database" else LocalBackend())
+
+
+def publish(db: Session, kind: str, data: dict):
+    hub.publish(db, kind, data)
+
+
+def delete_expired_events() -> int:
+    """Удаляет события старше EVENTS_RETENTION_HOURS (EVENTS_BACKEND=database)"""
+    if isinstance(hub.backend, DatabaseBackend):
+        return hub.backend.delete_expired()
+    return 0
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_committed(session):
+    hub.committed(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back(session):
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,49 @@
+import argparse
+import logging
+
+from database import SessionLocal
+from utils.media_gc import MIN_ORPHAN_AGE, QUARANTINE_PERIOD, BATCH_SIZE, run_gc
+
+logger = logging.getLogger(__name__)
+
+
+def collect_garbage(dry_run: bool = False, **kwargs):
+    """Запускает сборку мусора с новой сессией БД и пишет отчет в лог"""
+    db = SessionLocal()
+    try:
+        report = run_gc(db, dry_run=dry_run, **kwargs)
+    finally:
+        db.close()
+    if dry_run:
+        for path in report.orphans:
+            logger.info("Без ссылок: %s", path)
+    logger.info(
+        "Проверено файлов: %s, без ссылок: %s, в карантин: %s, восстановлено: %s, удалено: %s, освобождено: %.2f MB",
+        report.scanned, report.orphaned, report.quarantined, report.restored, report.deleted,
+        report.reclaimed_bytes / 1024 / 1024
+    )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Очистка неиспользуемых загруженных файлов")
+    parser.add_argument("--dry-run", action="store_true", help="только показать файлы без ссылок")
+    parser.add_argument("--min-age", type=int, default=MIN_ORPHAN_AGE, help="минимальный возраст файла, сек")
+    parser.add_argument("--quarantine-period", type=int, default=QUARANTINE_PERIOD, help="срок карантина, сек")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="размер пачки файлов")
+    args = parser.parse_args()
+
+    report = collect_garbage(
+        dry_run=args.dry_run,
+        min_age=args.min_age,
+        quarantine_period=args.quarantine_period,
+        batch_size=args.batch_size
+    )
+    if args.dry_run:
+        for path in report.orphans:
+            print(f"Без ссылок: {path}")
+    print(
+        f"Проверено файлов: {report.scanned}, без ссылок: {report.orphaned}, "
+        f"в карантин: {report.quarantined}, восстановлено: {report.restored}, "
+        f"удалено: {report.deleted}, освобождено: {report.reclaimed_bytes / 1024 / 1024:.2f} MB"
+    )
@@ -0,0 +1,35 @@
+import argparse
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+import models
+from database import engine
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def init_db() -> str:
+    """
+    Готовит схему базы к запуску приложения. Пустая база создается по
+    моделям и помечается последней ревизией (цепочка миграций начинается
+    с уже существующих таблиц), существующая - обновляется миграциями.
+    """
+    config = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BASE_DIR, "migrations"))
+    if not inspect(engine).get_table_names():
+        models.Base.metadata.create_all(bind=engine)
+        command.stamp(config, "head")
+        return "created"
+    command.upgrade(config, "head")
+    return "upgraded"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Создание или обновление схемы базы данных")
+    parser.parse_args()
+
+    result = init_db()
+    print("Схема базы создана" if result == "created" else "Схема базы обновлена")
@@ -0,0 +1,116 @@
+"""
+Фоновые задачи приложения: Telegram-бот и отправка уведомлений, очистка
+неиспользуемых файлов, истекших сессий, ключей Idempotency-Key и
+старых событий заявок, начальные данные.
+
+По умолчанию (BACKGROUND_JOBS=leader) их запускает один из воркеров
+приложения, см. utils.leader. С BACKGROUND_JOBS=off веб-воркеры задачи
+не запускают, и они выполняются отдельным процессом: python jobs.py
+"""
+import argparse
+import asyncio
+import os
+from typing import List
+
+from dotenv import load_dotenv
+
+# Настройки читаются модулями при импорте
+load_dotenv()
+
+import crud
+import events
+from database import SessionLocal
+from gc_media import collect_garbage
+from schemas import ContactInfoBase
+from sweep_sessions import sweep_admin_sessions
+from outbox import OutboxDispatcher
+from telegram_bot.service import TELEGRAM_BOT_ENABLED, start_bot
+from utils import metrics
+from utils.log import setup_logging
+from utils.scheduler import run_periodic
+
+# Интервал автоматической очистки неиспользуемых файлов (0 - отключено)
+MEDIA_GC_INTERVAL = int(os.getenv("MEDIA_GC_INTERVAL", 24 * 3600))
+# Интервал удаления истекших сессий администраторов (0 - отключено)
+ADMIN_SESSION_SWEEP_INTERVAL = int(os.getenv("ADMIN_SESSION_SWEEP_INTERVAL", 3600))
+# Интервал удаления истекших ключей Idempotency-Key (0 - отключено)
+IDEMPOTENCY_SWEEP_INTERVAL = int(os.getenv("IDEMPOTENCY_SWEEP_INTERVAL", 3600))
+# Интервал удаления старых событий заявок из lead_events (0 - отключено)
+EVENTS_SWEEP_INTERVAL = int(os.getenv("EVENTS_SWEEP_INTERVAL", 3600))
+
+
+def init_contact_info():
+    """Создает контактную информацию по умолчанию, если её нет"""
+    db = SessionLocal()
+    try:
+        if crud.get_contact_info(db):
+            return
+        default_contacts = ContactInfoBase(
+            phone="+7 (XXX) XXX-XX-XX",
+            email="example@example.com",
+            address="Адрес компании",
+            work_hours={
+                "monday_friday": "09:00 - 18:00",
+                "saturday_sunday": "Выходной"
+            },
+            social_links={
+                "whatsapp": {"enabled": False, "username": ""},
+                "telegram": {"enabled": False, "username": ""},
+                "vk": {"enabled": False, "username": ""}
+            }
+        )
+        crud.create_contact_info(db, default_contacts)
+    finally:
+        db.close()
+
+
+def sweep_idempotency_keys() -> int:
+    db = SessionLocal()
+    try:
+        return crud.delete_expired_idempotency_keys(db)
+    finally:
+        db.close()
+
+
+def start_background_jobs() -> List[asyncio.Task]:
+    """Запускает фоновые задачи в текущем event loop"""
+    init_contact_info()
+
+    # Бот в отдельном таске (aiogram загружается только здесь)
+    tasks = [asyncio.create_task(start_bot())]
+    # Отправка уведомлений о заявках из outbox
+    if TELEGRAM_BOT_ENABLED:
+        tasks.append(asyncio.create_task(OutboxDispatcher().run()))
+
+    # Очистка неиспользуемых файлов и истекших сессий выполняется в отдельном потоке
+    if MEDIA_GC_INTERVAL > 0:
+        tasks.append(asyncio.create_task(run_periodic(collect_garbage, MEDIA_GC_INTERVAL, "media_gc")))
+    if ADMIN_SESSION_SWEEP_INTERVAL > 0:
+        tasks.append(asyncio.create_task(
+            run_periodic(sweep_admin_sessions, ADMIN_SESSION_SWEEP_INTERVAL, "admin_session_sweep")
+        ))
+    if IDEMPOTENCY_SWEEP_INTERVAL > 0:
+        tasks.append(asyncio.create_task(
+            run_periodic(sweep_idempotency_keys, IDEMPOTENCY_SWEEP_INTERVAL, "idempotency_sweep")
+        ))
+    if EVENTS_SWEEP_INTERVAL > 0 and events.EVENTS_BACKEND == "database":
+        tasks.append(asyncio.create_task(
+            run_periodic(events.delete_expired_events, EVENTS_SWEEP_INTERVAL, "lead_events_sweep")
+        ))
+    return tasks
+
+
+async def run_forever():
+    tasks = start_background_jobs()
+    # Счетчики диспетчера уведомлений попадают в /metrics веб-воркеров через METRICS_DIR
+    if metrics.METRICS_ENABLED:
+        tasks.append(asyncio.create_task(run_periodic(metrics.flush, metrics.METRICS_FLUSH_INTERVAL, "metrics_flush")))
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Фоновые задачи приложения в отдельном процессе")
+    parser.parse_args()
+
+    setup_logging()
+    asyncio.run(run_forever())
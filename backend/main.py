@@ -1,25 +1,41 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 import os
+import stat
+from datetime import timezone
 import asyncio
+import logging
+from typing import Optional
+from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 from fastapi import HTTPException
 
+# Загружаем .env до локальных импортов: модули читают настройки при импорте
+load_dotenv()
+
+from utils.log import RequestIdMiddleware, setup_logging, stop_logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
 # Локальные импорты
-import models
-from database import engine, get_db
+from database import async_engine, get_db
+import events
 from routers import plots, requests, admin, quiz, contacts
-from telegram_bot.bot import start_bot
 import crud
-from schemas import ContactInfoBase
-
-load_dotenv()
+from utils.static import CachedStaticFiles
+from utils.storage import UPLOADS_FOLDER, key_to_path
+from utils.leader import run_as_leader
+from utils.scheduler import run_periodic
+from utils import metrics
+from jobs import start_background_jobs
+from telegram_bot.service import close_bot
 
-models.Base.metadata.create_all(bind=engine)
+# Где выполняются фоновые задачи: leader - в одном из воркеров приложения,
+# off - в отдельном процессе (python jobs.py)
+BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS", "leader")
 
-app = FastAPI(title="AltaiLand API")
+app = FastAPI(title="AltaiLand API", default_response_class=ORJSONResponse)
 
 # Настройка CORS
 app.add_middleware(
@@ -35,13 +51,27 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Идентификатор запроса в логах и заголовке X-Request-ID
+app.add_middleware(RequestIdMiddleware)
+
+# Метрики Prometheus; выключенные не добавляют ни middleware, ни обработчиков SQLAlchemy
+if metrics.METRICS_ENABLED:
+    metrics.install_query_hooks()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics(authorization: Optional[str] = Header(None)):
+        if not metrics.is_authorized(authorization):
+            raise HTTPException(status_code=401, detail="Неверный токен метрик", headers={"WWW-Authenticate": "Bearer"})
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 # Создаем директории для статических файлов, если их нет
 os.makedirs("static/images", exist_ok=True)
 os.makedirs("static/uploads", exist_ok=True)
 
-# Монтируем статические файлы
-app.mount("/images", StaticFiles(directory="static/images", html=False, check_dir=True), name="images")
-app.mount("/uploads", StaticFiles(directory="static/uploads", html=False, check_dir=True), name="uploads")
+# Монтируем статические файлы (файлы с отпечатком содержимого кэшируются на год)
+app.mount("/images", CachedStaticFiles(directory="static/images", html=False, check_dir=True), name="images")
+app.mount("/uploads", CachedStaticFiles(directory="static/uploads", html=False, check_dir=True), name="uploads")
 
 # Подключаем роутеры
 app.include_router(plots.router, prefix="/plots", tags=["plots"])
@@ -53,46 +83,68 @@ app.include_router(contacts.router)
 # Добавим тестовый эндпоинт для проверки загрузки
 @app.post("/test-upload")
 async def test_upload(file: UploadFile = File(...)):
-    print(f"Test upload received: {file.filename}")  # Для отладки
+    logger.debug("Test upload received: %s", file.filename)
     return {"filename": file.filename}
 
 @app.get("/download/{file_path:path}")
-async def download_file(file_path: str):
-    file_path = os.path.join("static/uploads", file_path)
-    if not os.path.exists(file_path):
+def download_file(file_path: str, db: Session = Depends(get_db)):
+    # Тип, размер и время файла берем из индекса вложений без обращения к
+    # диску; документы, которых в индексе нет (загруженные до него),
+    # отдаются прямо из static/uploads
+    attachment = crud.get_attachment_by_key(db, f"uploads/{file_path}")
+    if attachment and attachment.created_at:
+        mtime = attachment.created_at.replace(tzinfo=timezone.utc).timestamp()
+        return FileResponse(
+            path=key_to_path(attachment.storage_key),
+            filename=os.path.basename(file_path),
+            media_type=attachment.mime_type,
+            headers={"ETag": f'"{attachment.content_hash}"'},
+            stat_result=os.stat_result((stat.S_IFREG | 0o644, 0, 0, 1, 0, 0, attachment.size, mtime, mtime, mtime))
+        )
+
+    if attachment:
+        # Записи индекса без created_at: время файла берем с диска
+        path = key_to_path(attachment.storage_key)
+        media_type = attachment.mime_type
+    else:
+        path = os.path.normpath(os.path.join(UPLOADS_FOLDER, file_path))
+        media_type = None  # Автоматическое определение MIME-типа
+        if os.path.dirname(path) != os.path.normpath(UPLOADS_FOLDER):
+            raise HTTPException(status_code=404, detail="Файл не найден")
+
+    # Файл мог пропасть с диска: 404 вместо ошибки посреди ответа
+    try:
+        stat_result = os.stat(path)
+    except OSError:
         raise HTTPException(status_code=404, detail="Файл не найден")
-    
-    filename = os.path.basename(file_path)
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+
     return FileResponse(
-        path=file_path, 
-        filename=filename, 
-        media_type=None  # Автоматическое определение MIME-типа
+        path=path,
+        filename=os.path.basename(file_path),
+        media_type=media_type,
+        stat_result=stat_result
     )
 
 @app.on_event("startup")
 async def startup_event():
-    # Запускаем бота в отдельном таске
-    asyncio.create_task(start_bot())
-    
-    # Инициализируем контактную информацию, если её нет
-    db = next(get_db())
-    contact_info = crud.get_contact_info(db)
-    if not contact_info:
-        default_contacts = ContactInfoBase(
-            phone="+7 (XXX) XXX-XX-XX",
-            email="example@example.com",
-            address="Адрес компании",
-            work_hours={
-                "monday_friday": "09:00 - 18:00",
-                "saturday_sunday": "Выходной"
-            },
-            social_links={
-                "whatsapp": {"enabled": False, "username": ""},
-                "telegram": {"enabled": False, "username": ""},
-                "vk": {"enabled": False, "username": ""}
-            }
-        )
-        crud.create_contact_info(db, default_contacts)
+    # Бот и периодические задачи выполняет только один процесс из воркеров
+    if BACKGROUND_JOBS == "leader":
+        run_as_leader(start_background_jobs)
+
+    # Ленту событий заявок раздает каждый воркер своим подписчикам
+    asyncio.create_task(events.hub.run())
+
+    # Каждый воркер периодически сохраняет свои метрики для общего /metrics
+    if metrics.METRICS_ENABLED and metrics.MULTIPROCESS:
+        asyncio.create_task(run_periodic(metrics.flush, metrics.METRICS_FLUSH_INTERVAL, "metrics_flush"))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await async_engine.dispose()
+    await close_bot()
+    stop_logging()
 
 @app.get("/")
 async def root():
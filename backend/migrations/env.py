@@ -15,6 +15,10 @@ from models import Base
 # access to the values within the .ini file in use.
 config = context.config
 
+# База, заданная для приложения, имеет приоритет над alembic.ini
+if os.getenv("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", os.getenv("DATABASE_URL"))
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
@@ -0,0 +1,93 @@
+"""
+Переименовывает уже загруженные файлы в static/images и static/uploads
+в имена с отпечатком содержимого и обновляет ссылки на них в базе:
+images.filename/images.path и URL вложений в land_plots.description.
+
+Запуск из каталога backend: python -m migrations.fingerprint_static_files
+"""
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from database import SQLALCHEMY_DATABASE_URL
+from utils.storage import IMAGES_FOLDER, UPLOADS_FOLDER, fingerprint_filename, is_fingerprinted, write_file
+
+
+def fingerprint_folder(folder: str) -> dict:
+    """Переименовывает файлы каталога, возвращает {старое имя: новое имя}"""
+    renamed = {}
+    if not os.path.isdir(folder):
+        return renamed
+
+    for filename in os.listdir(folder):
+        file_path = os.path.join(folder, filename)
+        if not os.path.isfile(file_path) or filename.endswith(".gz") or is_fingerprinted(filename):
+            continue
+
+        with open(file_path, "rb") as f:
+            contents = f.read()
+        new_filename = fingerprint_filename(filename, contents)
+        write_file(folder, new_filename, contents)
+        renamed[filename] = new_filename
+    return renamed
+
+
+def _load_json(value):
+    """Разбирает (возможно, дважды закодированное) JSON-значение, возвращает значение и глубину"""
+    depth = 0
+    while isinstance(value, str):
+        value = json.loads(value)
+        depth += 1
+    return value, depth
+
+
+def _dump_json(value, depth: int) -> str:
+    for _ in range(depth):
+        value = json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def run_migration():
+    images_renamed = fingerprint_folder(IMAGES_FOLDER)
+    uploads_renamed = fingerprint_folder(UPLOADS_FOLDER)
+    print(f"Переименовано изображений: {len(images_renamed)}, документов: {len(uploads_renamed)}")
+
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+    with engine.connect() as connection:
+        for old, new in images_renamed.items():
+            connection.execute(
+                text("UPDATE images SET filename = :new, path = :path WHERE filename = :old"),
+                {"new": new, "path": f"/images/{new}", "old": old}
+            )
+
+        rows = connection.execute(text("SELECT id, description FROM land_plots")).fetchall()
+        for plot_id, raw_description in rows:
+            if not raw_description:
+                continue
+            description, depth = _load_json(raw_description)
+            changed = False
+            for attachment in description.get("attachments", []):
+                url = attachment.get("url", "")
+                old = url.rsplit("/", 1)[-1]
+                if url.startswith("/uploads/") and old in uploads_renamed:
+                    attachment["url"] = f"/uploads/{uploads_renamed[old]}"
+                    changed = True
+            if changed:
+                connection.execute(
+                    text("UPDATE land_plots SET description = :description WHERE id = :id"),
+                    {"description": _dump_json(description, depth), "id": plot_id}
+                )
+
+        connection.commit()
+
+    # Старые файлы удаляем только после успешного обновления ссылок
+    for folder, renamed in ((IMAGES_FOLDER, images_renamed), (UPLOADS_FOLDER, uploads_renamed)):
+        for old in renamed:
+            os.remove(os.path.join(folder, old))
+
+
+if __name__ == "__main__":
+    run_migration()
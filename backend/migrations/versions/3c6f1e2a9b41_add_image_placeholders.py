@@ -0,0 +1,33 @@
+"""add image placeholders
+
+Revision ID: 3c6f1e2a9b41
+Revises: 9000c3edb27f
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c6f1e2a9b41'
+down_revision: Union[str, None] = '9000c3edb27f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('images', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('images', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('images', sa.Column('dominant_color', sa.String(length=7), nullable=True))
+    op.add_column('images', sa.Column('placeholder', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('images') as batch_op:
+        batch_op.drop_column('placeholder')
+        batch_op.drop_column('dominant_color')
+        batch_op.drop_column('height')
+        batch_op.drop_column('width')
@@ -0,0 +1,27 @@
+"""add land plot version
+
+Revision ID: 5e8f2a7c3d19
+Revises: a41f5d0c7e92
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8f2a7c3d19'
+down_revision: Union[str, None] = 'a41f5d0c7e92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('land_plots', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('land_plots') as batch_op:
+        batch_op.drop_column('version')
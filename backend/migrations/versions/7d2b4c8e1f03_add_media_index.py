@@ -0,0 +1,116 @@
+"""add media index
+
+Revision ID: 7d2b4c8e1f03
+Revises: 3c6f1e2a9b41
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+import hashlib
+import json
+import mimetypes
+import os
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2b4c8e1f03'
+down_revision: Union[str, None] = '3c6f1e2a9b41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UPLOADS_FOLDER = os.path.join('static', 'uploads')
+
+
+def _file_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _backfill_attachments(attachments: sa.Table) -> None:
+    """
+    Записи индекса для уже загруженных документов: сначала вложения из
+    описаний участков, затем остальные файлы static/uploads
+    """
+    connection = op.get_bind()
+    entries = {}
+    for plot_id, description in connection.execute(sa.text("SELECT id, description FROM land_plots")):
+        # До a41f5d0c7e92 описание могло быть сериализовано дважды
+        while isinstance(description, str):
+            description = json.loads(description)
+        for attachment in (description or {}).get('attachments', []):
+            url = attachment.get('url') or ''
+            filename = os.path.basename(url[len('/uploads/'):]) if url.startswith('/uploads/') else ''
+            if filename and filename not in entries:
+                entries[filename] = {
+                    'public_id': attachment.get('id'), 'plot_id': plot_id, 'name': attachment.get('name'),
+                    'type': attachment.get('type'),
+                }
+    if os.path.isdir(UPLOADS_FOLDER):
+        for filename in os.listdir(UPLOADS_FOLDER):
+            if not filename.endswith(('.gz', '.tmp')):
+                entries.setdefault(filename, {'public_id': None, 'plot_id': None, 'name': filename, 'type': None})
+
+    rows = []
+    for filename, entry in entries.items():
+        file_path = os.path.join(UPLOADS_FOLDER, filename)
+        if not os.path.isfile(file_path):
+            continue
+        rows.append(dict(
+            entry,
+            url=f'/uploads/{filename}',
+            storage_key=f'uploads/{filename}',
+            size=os.path.getsize(file_path),
+            mime_type=mimetypes.guess_type(filename)[0],
+            content_hash=_file_hash(file_path),
+            created_at=datetime.utcfromtimestamp(os.path.getmtime(file_path)),
+        ))
+    if rows:
+        op.bulk_insert(attachments, rows)
+
+
+def upgrade() -> None:
+    op.add_column('images', sa.Column('size', sa.Integer(), nullable=True))
+    op.add_column('images', sa.Column('mime_type', sa.String(), nullable=True))
+    op.add_column('images', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('images', sa.Column('storage_key', sa.String(), nullable=True))
+    op.create_index(op.f('ix_images_storage_key'), 'images', ['storage_key'], unique=False)
+
+    attachments = op.create_table(
+        'attachments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('public_id', sa.String(), nullable=True),
+        sa.Column('plot_id', sa.Integer(), nullable=True),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('type', sa.String(), nullable=True),
+        sa.Column('url', sa.String(), nullable=True),
+        sa.Column('storage_key', sa.String(), nullable=True),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('mime_type', sa.String(), nullable=True),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['plot_id'], ['land_plots.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_attachments_id'), 'attachments', ['id'], unique=False)
+    op.create_index(op.f('ix_attachments_public_id'), 'attachments', ['public_id'], unique=False)
+    op.create_index(op.f('ix_attachments_plot_id'), 'attachments', ['plot_id'], unique=False)
+    op.create_index(op.f('ix_attachments_url'), 'attachments', ['url'], unique=True)
+    op.create_index(op.f('ix_attachments_storage_key'), 'attachments', ['storage_key'], unique=True)
+    _backfill_attachments(attachments)
+
+
+def downgrade() -> None:
+    op.drop_table('attachments')
+    op.drop_index(op.f('ix_images_storage_key'), table_name='images')
+    with op.batch_alter_table('images') as batch_op:
+        batch_op.drop_column('storage_key')
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('mime_type')
+        batch_op.drop_column('size')
@@ -0,0 +1,69 @@
+"""normalize double-encoded land_plots json columns
+
+Revision ID: a41f5d0c7e92
+Revises: 7d2b4c8e1f03
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f5d0c7e92'
+down_revision: Union[str, None] = '7d2b4c8e1f03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JSON_COLUMNS = ('description', 'cadastral_numbers', 'features', 'communications')
+DEFAULTS = {
+    'description': {"text": "", "attachments": []},
+    'cadastral_numbers': [],
+    'features': [],
+    'communications': [],
+}
+
+
+def _normalize(raw, default):
+    """Снимает все уровни кодирования, возвращает значение в виде JSON-текста"""
+    value = raw
+    while isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            # Старые записи могли хранить описание простым текстом
+            value = {"text": value, "attachments": []} if isinstance(default, dict) else [value]
+    if value is None:
+        value = default
+    return json.dumps(value, ensure_ascii=False)
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.text(f"SELECT id, {', '.join(JSON_COLUMNS)} FROM land_plots")
+    ).fetchall()
+
+    for row in rows:
+        plot_id, values = row[0], row[1:]
+        normalized = {
+            column: _normalize(raw, DEFAULTS[column])
+            for column, raw in zip(JSON_COLUMNS, values)
+        }
+        if any(normalized[column] != raw for column, raw in zip(JSON_COLUMNS, values)):
+            connection.execute(
+                sa.text(
+                    "UPDATE land_plots SET "
+                    + ", ".join(f"{column} = :{column}" for column in JSON_COLUMNS)
+                    + " WHERE id = :id"
+                ),
+                {**normalized, "id": plot_id}
+            )
+
+
+def downgrade() -> None:
+    # Нормализованные значения читаются и старым кодом, откат данных не нужен
+    pass
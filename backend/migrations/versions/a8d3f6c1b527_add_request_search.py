@@ -0,0 +1,81 @@
+"""add request search
+
+Revision ID: a8d3f6c1b527
+Revises: f4c9e2b7a613
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from utils.phone import normalize_phone
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8d3f6c1b527'
+down_revision: Union[str, None] = 'f4c9e2b7a613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_DOCUMENT = (
+    "lower(coalesce(name, '') || ' ' || coalesce(phone_normalized, '') || ' ' || coalesce(email, '')"
+    " || ' ' || coalesce(message, '') || ' ' || coalesce(notes, ''))"
+)
+FTS_COLUMNS = "name, phone_normalized, email, message, notes"
+FTS_NEW = "new.id, new.name, new.phone_normalized, new.email, new.message, new.notes"
+FTS_OLD = "old.id, old.name, old.phone_normalized, old.email, old.message, old.notes"
+
+
+def upgrade() -> None:
+    op.add_column('requests', sa.Column('phone_normalized', sa.String(), nullable=True))
+    connection = op.get_bind()
+    for request_id, phone in connection.execute(sa.text("SELECT id, phone FROM requests")).fetchall():
+        phone_normalized = normalize_phone(phone)
+        if phone_normalized is not None:
+            connection.execute(
+                sa.text("UPDATE requests SET phone_normalized = :phone WHERE id = :id"),
+                {"phone": phone_normalized, "id": request_id}
+            )
+    op.create_index('ix_requests_phone_normalized', 'requests', ['phone_normalized'], unique=False)
+    op.create_index('ix_requests_created_at_id', 'requests', ['created_at', 'id'], unique=False)
+
+    if connection.dialect.name == 'sqlite':
+        op.execute(
+            f"CREATE VIRTUAL TABLE requests_fts USING fts5({FTS_COLUMNS}, "
+            "content='requests', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            f"CREATE TRIGGER requests_fts_insert AFTER INSERT ON requests BEGIN "
+            f"INSERT INTO requests_fts(rowid, {FTS_COLUMNS}) VALUES ({FTS_NEW}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER requests_fts_delete AFTER DELETE ON requests BEGIN "
+            f"INSERT INTO requests_fts(requests_fts, rowid, {FTS_COLUMNS}) VALUES ('delete', {FTS_OLD}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER requests_fts_update AFTER UPDATE OF name, phone_normalized, email, message, notes "
+            f"ON requests BEGIN "
+            f"INSERT INTO requests_fts(requests_fts, rowid, {FTS_COLUMNS}) VALUES ('delete', {FTS_OLD}); "
+            f"INSERT INTO requests_fts(rowid, {FTS_COLUMNS}) VALUES ({FTS_NEW}); END"
+        )
+        # Индекс по уже сохраненным заявкам
+        op.execute("INSERT INTO requests_fts(requests_fts) VALUES ('rebuild')")
+    elif connection.dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(f"CREATE INDEX ix_requests_search ON requests USING gin (({SEARCH_DOCUMENT}) gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    if connection.dialect.name == 'sqlite':
+        for trigger in ('requests_fts_update', 'requests_fts_delete', 'requests_fts_insert'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS requests_fts")
+    elif connection.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_requests_search")
+    op.drop_index('ix_requests_created_at_id', table_name='requests')
+    op.drop_index('ix_requests_phone_normalized', table_name='requests')
+    with op.batch_alter_table('requests') as batch_op:
+        batch_op.drop_column('phone_normalized')
@@ -0,0 +1,36 @@
+"""add lead events
+
+Revision ID: b2e7d4a9c615
+Revises: a8d3f6c1b527
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2e7d4a9c615'
+down_revision: Union[str, None] = 'a8d3f6c1b527'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'lead_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sqlite_autoincrement=True
+    )
+    op.create_index('ix_lead_events_created_at', 'lead_events', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_lead_events_created_at', table_name='lead_events')
+    op.drop_table('lead_events')
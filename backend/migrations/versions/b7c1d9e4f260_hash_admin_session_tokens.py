@@ -0,0 +1,68 @@
+"""hash admin session tokens
+
+Revision ID: b7c1d9e4f260
+Revises: 5e8f2a7c3d19
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+import hashlib
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c1d9e4f260'
+down_revision: Union[str, None] = '5e8f2a7c3d19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    # Истекшие и деактивированные сессии больше не нужны
+    connection.execute(
+        sa.text("DELETE FROM admin_sessions WHERE is_active = :inactive OR expires_at <= :now"),
+        {"inactive": False, "now": datetime.utcnow()}
+    )
+
+    op.add_column('admin_sessions', sa.Column('token_hash', sa.LargeBinary(length=32), nullable=True))
+    rows = connection.execute(sa.text("SELECT id, session_token FROM admin_sessions")).fetchall()
+    for session_id, token in rows:
+        connection.execute(
+            sa.text("UPDATE admin_sessions SET token_hash = :token_hash WHERE id = :id"),
+            {"token_hash": hashlib.sha256((token or "").encode()).digest(), "id": session_id}
+        )
+
+    with op.batch_alter_table('admin_sessions') as batch_op:
+        batch_op.drop_index('ix_admin_sessions_session_token')
+        batch_op.drop_column('session_token')
+        batch_op.alter_column('token_hash', existing_type=sa.LargeBinary(length=32), nullable=False)
+
+    op.create_index(
+        'ix_admin_sessions_active_token',
+        'admin_sessions',
+        ['token_hash', 'expires_at', 'admin_id', 'is_active'],
+        unique=False,
+        sqlite_where=sa.text('is_active = 1'),
+        postgresql_where=sa.text('is_active = true')
+    )
+
+
+def downgrade() -> None:
+    # Исходные токены из хэшей не восстановить: все сессии становятся недействительными
+    op.drop_index('ix_admin_sessions_active_token', table_name='admin_sessions')
+    op.add_column('admin_sessions', sa.Column('session_token', sa.String(), nullable=True))
+    connection = op.get_bind()
+    rows = connection.execute(sa.text("SELECT id, token_hash FROM admin_sessions")).fetchall()
+    for session_id, token_hash in rows:
+        connection.execute(
+            sa.text("UPDATE admin_sessions SET session_token = :token, is_active = :inactive WHERE id = :id"),
+            {"token": bytes(token_hash).hex(), "inactive": False, "id": session_id}
+        )
+
+    with op.batch_alter_table('admin_sessions') as batch_op:
+        batch_op.drop_column('token_hash')
+        batch_op.create_index('ix_admin_sessions_session_token', ['session_token'], unique=True)
@@ -0,0 +1,44 @@
+"""index promo codes
+
+Revision ID: d6a2f9b3e815
+Revises: c3e8a5f1d742
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6a2f9b3e815'
+down_revision: Union[str, None] = 'c3e8a5f1d742'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('requests', sa.Column('promo_redeemed_at', sa.DateTime(), nullable=True))
+    connection = op.get_bind()
+    # Погашенными раньше отмечали статусом заявки
+    connection.execute(sa.text(
+        "UPDATE requests SET promo_redeemed_at = updated_at WHERE status = 'used' AND promo_code IS NOT NULL"
+    ))
+    # Совпавшие коды (выдавались без проверки): первый остается, к остальным добавляется id заявки
+    duplicates = connection.execute(sa.text(
+        "SELECT id, promo_code FROM requests r WHERE promo_code IS NOT NULL AND EXISTS ("
+        "SELECT 1 FROM requests p WHERE p.promo_code = r.promo_code AND p.id < r.id)"
+    )).fetchall()
+    for request_id, promo_code in duplicates:
+        connection.execute(
+            sa.text("UPDATE requests SET promo_code = :promo_code WHERE id = :id"),
+            {"promo_code": f"{promo_code}-{request_id}", "id": request_id}
+        )
+    op.create_index('ix_requests_promo_code', 'requests', ['promo_code'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_requests_promo_code', table_name='requests')
+    with op.batch_alter_table('requests') as batch_op:
+        batch_op.drop_column('promo_redeemed_at')
@@ -0,0 +1,38 @@
+"""add admin stream tickets
+
+Revision ID: d8b3e6f2a941
+Revises: b2e7d4a9c615
+Create Date: 2026-10-20 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8b3e6f2a941'
+down_revision: Union[str, None] = 'b2e7d4a9c615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'admin_stream_tickets',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('ticket_hash', sa.LargeBinary(length=32), nullable=False),
+        sa.Column('admin_id', sa.Integer(), nullable=False),
+        sa.Column('session_hash', sa.LargeBinary(length=32), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['admin_id'], ['admins.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('ticket_hash')
+    )
+    op.create_index('ix_admin_stream_tickets_expires_at', 'admin_stream_tickets', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_admin_stream_tickets_expires_at', table_name='admin_stream_tickets')
+    op.drop_table('admin_stream_tickets')
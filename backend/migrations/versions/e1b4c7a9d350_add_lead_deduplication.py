@@ -0,0 +1,41 @@
+"""add lead deduplication
+
+Revision ID: e1b4c7a9d350
+Revises: d6a2f9b3e815
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1b4c7a9d350'
+down_revision: Union[str, None] = 'd6a2f9b3e815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # У существующих заявок ключа нет: повторы ищутся только среди новых
+    op.add_column('requests', sa.Column('dedup_key', sa.String(), nullable=True))
+    op.create_index('ix_requests_dedup_key', 'requests', ['dedup_key'], unique=True)
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('request_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['request_id'], ['requests.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index('ix_idempotency_keys_created_at', 'idempotency_keys', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_idempotency_keys_created_at', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
+    op.drop_index('ix_requests_dedup_key', table_name='requests')
+    with op.batch_alter_table('requests') as batch_op:
+        batch_op.drop_column('dedup_key')
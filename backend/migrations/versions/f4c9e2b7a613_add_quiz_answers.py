@@ -0,0 +1,86 @@
+"""add quiz answers
+
+Revision ID: f4c9e2b7a613
+Revises: e1b4c7a9d350
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+import json
+from collections import Counter
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c9e2b7a613'
+down_revision: Union[str, None] = 'e1b4c7a9d350'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    quiz_answers = op.create_table(
+        'quiz_answers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('request_id', sa.Integer(), nullable=False),
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('option', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['request_id'], ['requests.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_quiz_answers_request_id', 'quiz_answers', ['request_id'], unique=False)
+    op.create_index('ix_quiz_answers_question_option', 'quiz_answers', ['question_id', 'option'], unique=False)
+    quiz_option_stats = op.create_table(
+        'quiz_option_stats',
+        sa.Column('question_id', sa.Integer(), nullable=False),
+        sa.Column('option', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('question_id', 'option')
+    )
+
+    # Ответы уже отправленных квизов: ключ - id вопроса, в старых заявках - текст вопроса
+    connection = op.get_bind()
+    question_ids = dict(connection.execute(sa.text("SELECT question, id FROM quiz_questions")).fetchall())
+    rows = []
+    counts = Counter()
+    for request_id, answers, created_at in connection.execute(sa.text(
+        "SELECT id, answers, created_at FROM requests WHERE type = 'QUIZ'"
+    ).columns(created_at=sa.DateTime())):
+        counts[(0, "")] += 1
+        try:
+            # Значение JSON-колонки; ответы, сохраненные строкой JSON, разбираются еще раз
+            while isinstance(answers, str):
+                answers = json.loads(answers)
+        except ValueError:
+            continue
+        if not isinstance(answers, dict):
+            continue
+        for key, option in answers.items():
+            if option is None or option == "":
+                continue
+            key = str(key)
+            question_id = int(key) if key.isdigit() else question_ids.get(key)
+            if question_id is None:
+                continue
+            option = str(option)[:200]
+            rows.append({"request_id": request_id, "question_id": question_id, "option": option,
+                         "created_at": created_at or datetime.utcnow()})
+            counts[(question_id, option)] += 1
+    if rows:
+        op.bulk_insert(quiz_answers, rows)
+    if counts:
+        op.bulk_insert(quiz_option_stats, [
+            {"question_id": question_id, "option": option, "count": count}
+            for (question_id, option), count in counts.items()
+        ])
+
+
+def downgrade() -> None:
+    op.drop_table('quiz_option_stats')
+    op.drop_index('ix_quiz_answers_question_option', table_name='quiz_answers')
+    op.drop_index('ix_quiz_answers_request_id', table_name='quiz_answers')
+    op.drop_table('quiz_answers')
@@ -1,7 +1,9 @@
 from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, JSON, Enum, Boolean, DateTime, ARRAY
-from sqlalchemy.orm import relationship
+from sqlalchemy import DDL, Index, LargeBinary, event, text
+from sqlalchemy.orm import relationship, Session
 from sqlalchemy.sql import func
 from database import Base
+from db_types import JSONText
 import enum
 from datetime import datetime
 
@@ -28,11 +30,41 @@ class AdminSession(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     admin_id = Column(Integer, ForeignKey("admins.id"))
-    session_token = Column(String, unique=True, index=True)
+    # В базе хранится только sha256 токена (32 байта), сам токен знает лишь клиент
+    token_hash = Column(LargeBinary(32), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime)
     is_active = Column(Boolean, default=True)
 
+    __table_args__ = (
+        # Покрывающий индекс для проверки токена: в него попадают только
+        # активные сессии, а все колонки запроса читаются прямо из индекса
+        # (is_active включен, иначе SQLite перечитывает строку таблицы).
+        # Отдельный уникальный индекс не нужен - токен из 32 случайных
+        # символов не повторяется
+        Index(
+            "ix_admin_sessions_active_token",
+            "token_hash", "expires_at", "admin_id", "is_active",
+            sqlite_where=text("is_active = 1"),
+            postgresql_where=text("is_active = true")
+        ),
+    )
+
+class AdminStreamTicket(Base):
+    """
+    Одноразовый билет на подключение к ленте событий (GET /admin/events).
+    EventSource в браузере не передает заголовки, а токен сессии в URL
+    попал бы в журналы nginx и uvicorn; билет живет несколько секунд
+    """
+    __tablename__ = "admin_stream_tickets"
+
+    id = Column(Integer, primary_key=True)
+    ticket_hash = Column(LargeBinary(32), nullable=False, unique=True)
+    admin_id = Column(Integer, ForeignKey("admins.id", ondelete="CASCADE"), nullable=False)
+    # Хэш токена сессии, выдавшей билет: лента проверяет, что сессия действует
+    session_hash = Column(LargeBinary(32), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
 class PlotStatus(str, enum.Enum):
     AVAILABLE = "available"
     RESERVED = "reserved"
@@ -48,8 +80,8 @@ class LandPlot(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
-    description = Column(JSON, nullable=False, default=lambda: {"text": "", "attachments": []})
-    cadastral_numbers = Column(JSON, nullable=False, default=list)  # Пустой список по умолчанию
+    description = Column(JSONText, nullable=False, default=lambda: {"text": "", "attachments": []})
+    cadastral_numbers = Column(JSONText, nullable=False, default=list)  # Пустой список по умолчанию
     area = Column(Float)  # площадь в м²
     specified_area = Column(Float, nullable=True)  # уточненная площадь в м²
     price = Column(Integer)
@@ -58,10 +90,12 @@ class LandPlot(Base):
     region = Column(String)
     land_category = Column(String)
     permitted_use = Column(String)
-    features = Column(JSON, nullable=False, default=list)  # Пустой список по умолчанию
-    communications = Column(JSON, nullable=False, default=list)  # Пустой список по умолчанию
+    features = Column(JSONText, nullable=False, default=list)  # Пустой список по умолчанию
+    communications = Column(JSONText, nullable=False, default=list)  # Пустой список по умолчанию
     status = Column(Enum(PlotStatus), default=PlotStatus.AVAILABLE)
     is_visible = Column(Boolean, default=True)
+    # Версия участка: увеличивается при любом изменении участка или его изображений
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     images = relationship("Image", secondary=plot_images, back_populates="plots")
 
@@ -89,9 +123,33 @@ class Image(Base):
     path = Column(String)
     is_main = Column(Boolean, default=False, nullable=False)
     order = Column(Integer, default=0, nullable=False)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    dominant_color = Column(String(7), nullable=True)  # #rrggbb
+    placeholder = Column(String, nullable=True)  # LQIP в виде data URI
+    size = Column(Integer, nullable=True)  # размер файла в байтах
+    mime_type = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True)  # sha256 содержимого
+    storage_key = Column(String, nullable=True, index=True)  # путь относительно static/
     
     plots = relationship("LandPlot", secondary=plot_images, back_populates="images")
 
+class Attachment(Base):
+    """Индекс загруженных документов (вложений из description.attachments)"""
+    __tablename__ = "attachments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    public_id = Column(String, index=True)  # id вложения в description.attachments
+    plot_id = Column(Integer, ForeignKey("land_plots.id", ondelete="SET NULL"), nullable=True, index=True)
+    name = Column(String)  # исходное имя файла
+    type = Column(String)
+    url = Column(String, unique=True, index=True)
+    storage_key = Column(String, unique=True, index=True)  # путь относительно static/
+    size = Column(Integer, nullable=False)
+    mime_type = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class ContactInfo(Base):
     __tablename__ = "contact_info"
 
@@ -126,15 +184,66 @@ class Request(Base):
     type = Column(Enum(RequestType), nullable=False)
     name = Column(String, nullable=False)
     phone = Column(String, nullable=False)
+    phone_normalized = Column(String, nullable=True)  # +7XXXXXXXXXX, см. utils.phone
     email = Column(String, nullable=False)
     message = Column(String, nullable=True)
     answers = Column(JSON, nullable=True)  # Ответы на вопросы квиза
     promo_code = Column(String, nullable=True)  # Сгенерированный промокод
+    promo_redeemed_at = Column(DateTime, nullable=True)  # Когда промокод погашен
+    dedup_key = Column(String, nullable=True)  # Тип, телефон и интервал времени, см. utils.dedup
     status = Column(String, default="new")  # new, processing, completed, rejected
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     notes = Column(String, nullable=True)  # Заметки администратора 
 
+    __table_args__ = (
+        # Поиск по промокоду из API и бота; заявки без промокода не мешают уникальности
+        Index("ix_requests_promo_code", "promo_code", unique=True),
+        # Одна заявка одного типа с одного телефона за интервал LEAD_DEDUP_WINDOW
+        Index("ix_requests_dedup_key", "dedup_key", unique=True),
+        Index("ix_requests_phone_normalized", "phone_normalized"),
+        # Список заявок от новых к старым и keyset-пагинация, см. utils.lead_search
+        Index("ix_requests_created_at_id", "created_at", "id"),
+    )
+
+# Триграммный индекс для поиска заявок (utils.lead_search). В SQLite -
+# внешняя таблица FTS5 над requests, которую обновляют триггеры; в
+# PostgreSQL - GIN-индекс pg_trgm по выражению REQUESTS_SEARCH_DOCUMENT.
+# Пересоздание requests (batch-миграция в SQLite) удаляет триггеры -
+# такая миграция должна создать их заново.
+REQUESTS_SEARCH_DOCUMENT = (
+    "lower(coalesce(name, '') || ' ' || coalesce(phone_normalized, '') || ' ' || coalesce(email, '')"
+    " || ' ' || coalesce(message, '') || ' ' || coalesce(notes, ''))"
+)
+_REQUESTS_FTS_COLUMNS = "name, phone_normalized, email, message, notes"
+_REQUESTS_FTS_NEW = "new.id, new.name, new.phone_normalized, new.email, new.message, new.notes"
+_REQUESTS_FTS_OLD = "old.id, old.name, old.phone_normalized, old.email, old.message, old.notes"
+REQUESTS_SEARCH_DDL = {
+    "sqlite": [
+        f"CREATE VIRTUAL TABLE requests_fts USING fts5({_REQUESTS_FTS_COLUMNS}, "
+        "content='requests', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER requests_fts_insert AFTER INSERT ON requests BEGIN "
+        f"INSERT INTO requests_fts(rowid, {_REQUESTS_FTS_COLUMNS}) VALUES ({_REQUESTS_FTS_NEW}); END",
+        f"CREATE TRIGGER requests_fts_delete AFTER DELETE ON requests BEGIN "
+        f"INSERT INTO requests_fts(requests_fts, rowid, {_REQUESTS_FTS_COLUMNS}) "
+        f"VALUES ('delete', {_REQUESTS_FTS_OLD}); END",
+        f"CREATE TRIGGER requests_fts_update AFTER UPDATE OF name, phone_normalized, email, message, notes "
+        f"ON requests BEGIN "
+        f"INSERT INTO requests_fts(requests_fts, rowid, {_REQUESTS_FTS_COLUMNS}) "
+        f"VALUES ('delete', {_REQUESTS_FTS_OLD}); "
+        f"INSERT INTO requests_fts(rowid, {_REQUESTS_FTS_COLUMNS}) VALUES ({_REQUESTS_FTS_NEW}); END",
+    ],
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"CREATE INDEX ix_requests_search ON requests USING gin (({REQUESTS_SEARCH_DOCUMENT}) gin_trgm_ops)",
+    ],
+}
+
+for _dialect, _statements in REQUESTS_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Request.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+event.listen(Request.__table__, "before_drop", DDL("DROP TABLE IF EXISTS requests_fts").execute_if(dialect="sqlite"))
+
 class Visitor(Base):
     __tablename__ = "visitors"
 
@@ -144,4 +253,87 @@ class Visitor(Base):
     path = Column(String, nullable=False)
     user_agent = Column(String, nullable=True)
     ip_address = Column(String, nullable=True)
-    referrer = Column(String, nullable=True) 
\ No newline at end of file
+    referrer = Column(String, nullable=True)
+
+class NotificationOutbox(Base):
+    """
+    Уведомления в Telegram, ожидающие отправки. Запись создается в той же
+    транзакции, что и заявка, и отправляется фоновым диспетчером (outbox.py)
+    """
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # request
+    payload = Column(JSONText, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending, sent, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Выборка очередной пачки: ожидающие уведомления, срок которых наступил
+        Index("ix_notification_outbox_pending", "status", "next_attempt_at"),
+    )
+
+class LeadEvent(Base):
+    """События заявок для ленты админки при EVENTS_BACKEND=database, см. events.py"""
+    __tablename__ = "lead_events"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # request.created, request.updated, requests.updated
+    payload = Column(JSONText, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    # Номер события не используется повторно после удаления старых событий
+    __table_args__ = {"sqlite_autoincrement": True}
+
+class QuizAnswer(Base):
+    """Ответ на вопрос квиза из заявки (разбор Request.answers при отправке)"""
+    __tablename__ = "quiz_answers"
+
+    id = Column(Integer, primary_key=True)
+    request_id = Column(Integer, ForeignKey("requests.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Без внешнего ключа: ответы удаленных вопросов остаются в статистике
+    question_id = Column(Integer, nullable=False)
+    option = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_quiz_answers_question_option", "question_id", "option"),
+    )
+
+class QuizOptionStat(Base):
+    """
+    Счетчик выбора варианта ответа, обновляется вместе с записью ответов.
+    Строка (0, "") - общее число отправленных квизов
+    """
+    __tablename__ = "quiz_option_stats"
+
+    question_id = Column(Integer, primary_key=True)
+    option = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class IdempotencyKey(Base):
+    """Ключ Idempotency-Key отправленной заявки; хранится IDEMPOTENCY_KEY_TTL секунд"""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    request_id = Column(Integer, ForeignKey("requests.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+@event.listens_for(Session, "before_flush")
+def bump_plot_versions(session, flush_context, instances):
+    """Увеличивает версию участков, затронутых изменениями (для кэша сериализованных участков)"""
+    plots = set()
+    with session.no_autoflush:
+        for obj in list(session.dirty) + list(session.new) + list(session.deleted):
+            if isinstance(obj, LandPlot) and session.is_modified(obj):
+                plots.add(obj)
+            elif isinstance(obj, Image):
+                plots.update(obj.plots)
+
+    for plot in plots:
+        if plot not in session.deleted and plot not in session.new:
+            plot.version = (plot.version or 0) + 1
@@ -0,0 +1,246 @@
+"""
+Отправка уведомлений из outbox (таблица notification_outbox).
+
+Заявка и уведомление о ней записываются одной транзакцией, поэтому
+ответ клиенту не зависит от Telegram, а уведомление не теряется при его
+недоступности. Диспетчер работает среди фоновых задач (jobs.py) и
+отправляет ожидающие уведомления:
+- не чаще одного сообщения в TELEGRAM_CHAT_INTERVAL секунд - лимит
+  Telegram для одного чата;
+- при ошибке повторяет попытку с экспоненциальной задержкой
+  (OUTBOX_BACKOFF_BASE * 2^попытка, но не больше OUTBOX_BACKOFF_MAX);
+- на ответ 429 ждет указанное Telegram время, не считая попытку;
+- после OUTBOX_MAX_ATTEMPTS попыток или при постоянной ошибке (неверный
+  запрос, бот заблокирован) переводит уведомление в dead.
+
+При обычном потоке заявок каждая отправляется сразу отдельным сообщением.
+Если за OUTBOX_DIGEST_WINDOW секунд пришло OUTBOX_DIGEST_RATE заявок или
+больше (рекламная кампания) либо столько же накопилось в очереди (Telegram
+был недоступен), диспетчер переходит в режим сводок: раз в
+OUTBOX_DIGEST_INTERVAL секунд ожидающие заявки объединяются в сообщения
+не длиннее лимита Telegram (4096 символов). Счетчики отправленных
+сообщений, объединенных заявок и ответов 429 - в utils.metrics.
+
+Диспетчер должен быть один (см. utils.leader). Запуск вручную:
+python outbox.py - отправить ожидающие, --requeue-dead - вернуть в очередь
+неотправленные.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Deque, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import crud
+from database import SessionLocal
+from models import NotificationOutbox
+from telegram_bot.service import send_admin_message
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 1))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 20))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", 5))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", 3600))
+# Отправленные уведомления хранятся столько дней, затем удаляются
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", 7))
+TELEGRAM_CHAT_INTERVAL = float(os.getenv("TELEGRAM_CHAT_INTERVAL", 1))
+# Режим сводок: порог числа заявок за окно (0 - отключен) и период сводок
+OUTBOX_DIGEST_RATE = int(os.getenv("OUTBOX_DIGEST_RATE", 10))
+OUTBOX_DIGEST_WINDOW = float(os.getenv("OUTBOX_DIGEST_WINDOW", 60))
+OUTBOX_DIGEST_INTERVAL = float(os.getenv("OUTBOX_DIGEST_INTERVAL", 60))
+# Сколько заявок диспетчер берет из очереди за раз в режиме сводок
+OUTBOX_DIGEST_BATCH_SIZE = int(os.getenv("OUTBOX_DIGEST_BATCH_SIZE", 500))
+
+CLEANUP_INTERVAL = 3600
+
+
+def format_notification(kind: str, payload: dict) -> str:
+    from telegram_bot.notifications import format_request_notification
+    if kind == "request":
+        return format_request_notification(payload)
+    raise ValueError(f"Неизвестный тип уведомления: {kind}")
+
+
+def backoff_delay(attempts: int) -> float:
+    """Задержка перед следующей попыткой после attempts неудачных, с разбросом"""
+    delay = min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _with_session(func, *args, **kwargs):
+    db = SessionLocal()
+    try:
+        return func(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+class OutboxDispatcher:
+    def __init__(self, send: Callable[[str], Awaitable[object]] = send_admin_message):
+        self.send = send
+        self._last_sent = 0.0
+        self._last_digest = 0.0
+        # Время поступления недавних заявок (по created_at) для оценки потока
+        self._arrivals: Deque[datetime] = deque()
+        self._last_seen_id = 0
+
+    async def _wait_chat_limit(self):
+        delay = self._last_sent + TELEGRAM_CHAT_INTERVAL - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _track_arrivals(self, notifications: List[NotificationOutbox]):
+        """Учитывает новые уведомления (повторные попытки не считаются)"""
+        for notification in notifications:
+            if notification.id > self._last_seen_id:
+                self._arrivals.append(notification.created_at)
+        if notifications:
+            self._last_seen_id = max(self._last_seen_id, max(n.id for n in notifications))
+        window_start = datetime.utcnow() - timedelta(seconds=OUTBOX_DIGEST_WINDOW)
+        while self._arrivals and self._arrivals[0] < window_start:
+            self._arrivals.popleft()
+
+    def digest_mode(self, pending: int) -> bool:
+        """Заявок слишком много для отдельных сообщений"""
+        if OUTBOX_DIGEST_RATE <= 0:
+            return False
+        return len(self._arrivals) >= OUTBOX_DIGEST_RATE or pending >= OUTBOX_DIGEST_RATE
+
+    async def _fail(self, notifications: List[NotificationOutbox], e: Exception):
+        """Откладывает уведомления с экспоненциальной задержкой или переводит в dead"""
+        from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+        permanent = isinstance(e, (TelegramBadRequest, TelegramForbiddenError, ValueError))
+        error = f"{type(e).__name__}: {e}"
+        retry, dead = [], []
+        for notification in notifications:
+            attempts = notification.attempts + 1
+            if permanent or attempts >= OUTBOX_MAX_ATTEMPTS:
+                logger.error("Уведомление %s не отправлено после %s попыток: %s", notification.id, attempts, e)
+                dead.append(notification)
+            else:
+                logger.warning("Ошибка отправки уведомления %s (попытка %s): %s", notification.id, attempts, e)
+                retry.append(notification)
+        if retry:
+            attempts = max(notification.attempts for notification in retry) + 1
+            await asyncio.to_thread(
+                _with_session, crud.reschedule_notifications, [n.id for n in retry], error,
+                datetime.utcnow() + timedelta(seconds=backoff_delay(attempts))
+            )
+        if dead:
+            await asyncio.to_thread(
+                _with_session, crud.reschedule_notifications, [n.id for n in dead], error,
+                datetime.utcnow(), dead=True
+            )
+
+    async def _deliver(self, text: str, notifications: List[NotificationOutbox]) -> str:
+        """Одно сообщение о notifications; результат: sent, failed или throttled"""
+        # Ответ 429 определяется по исключению aiogram
+        from aiogram.exceptions import TelegramRetryAfter
+
+        await self._wait_chat_limit()
+        try:
+            await self.send(text)
+        except TelegramRetryAfter as e:
+            # Лимит Telegram: ждем указанное время, попытка не считается
+            logger.warning("Telegram просит подождать %s с", e.retry_after)
+            registry.count_notifications("throttled")
+            await asyncio.to_thread(
+                _with_session, crud.reschedule_notifications, [n.id for n in notifications], str(e),
+                datetime.utcnow() + timedelta(seconds=e.retry_after), count_attempt=False
+            )
+            self._last_sent = time.monotonic() + e.retry_after
+            return "throttled"
+        except Exception as e:
+            self._last_sent = time.monotonic()
+            await self._fail(notifications, e)
+            return "failed"
+        self._last_sent = time.monotonic()
+        await asyncio.to_thread(_with_session, crud.mark_notifications_sent, [n.id for n in notifications])
+        registry.count_notifications("sent")
+        return "sent"
+
+    async def _dispatch_one_by_one(self, notifications: List[NotificationOutbox]) -> int:
+        sent = 0
+        for notification in notifications:
+            try:
+                text = format_notification(notification.kind, notification.payload)
+            except ValueError as e:
+                await self._fail([notification], e)
+                continue
+            result = await self._deliver(text, [notification])
+            if result == "throttled":
+                break
+            sent += result == "sent"
+        return sent
+
+    async def _dispatch_digest(self, notifications: List[NotificationOutbox]) -> int:
+        """Сводки по заявкам; уведомления других типов отправляются по одному"""
+        from telegram_bot.notifications import format_request_digests
+
+        requests = [n for n in notifications if n.kind == "request"]
+        others = [n for n in notifications if n.kind != "request"]
+        self._last_digest = time.monotonic()
+        sent = 0
+        offset = 0
+        for text, count in format_request_digests([n.payload for n in requests]):
+            chunk = requests[offset:offset + count]
+            offset += count
+            result = await self._deliver(text, chunk)
+            if result == "throttled":
+                return sent
+            if result == "sent":
+                sent += count
+                registry.count_notifications("coalesced", count)
+        if sent:
+            logger.info("Отправлена сводка о %s заявках", sent)
+        return sent + await self._dispatch_one_by_one(others)
+
+    async def dispatch_due(self) -> int:
+        """Отправляет уведомления, срок которых наступил; возвращает число отправленных"""
+        limit = OUTBOX_DIGEST_BATCH_SIZE if OUTBOX_DIGEST_RATE > 0 else OUTBOX_BATCH_SIZE
+        notifications = await asyncio.to_thread(_with_session, crud.get_due_notifications, limit)
+        self._track_arrivals(notifications)
+        if not self.digest_mode(len(notifications)):
+            return await self._dispatch_one_by_one(notifications[:OUTBOX_BATCH_SIZE])
+        # Заявки копятся в очереди до следующей сводки
+        if time.monotonic() - self._last_digest < OUTBOX_DIGEST_INTERVAL:
+            return 0
+        return await self._dispatch_digest(notifications)
+
+    async def run(self):
+        """Бесконечный цикл диспетчера"""
+        last_cleanup = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_cleanup >= CLEANUP_INTERVAL:
+                    before = datetime.utcnow() - timedelta(days=OUTBOX_RETENTION_DAYS)
+                    await asyncio.to_thread(_with_session, crud.delete_sent_notifications, before)
+                    last_cleanup = time.monotonic()
+                if await self.dispatch_due():
+                    continue
+            except Exception as e:
+                logger.error("Ошибка диспетчера уведомлений: %s", e)
+            await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Отправка уведомлений из outbox")
+    parser.add_argument("--requeue-dead", action="store_true", help="вернуть неотправленные уведомления в очередь")
+    args = parser.parse_args()
+
+    if args.requeue_dead:
+        print(f"Возвращено в очередь: {_with_session(crud.requeue_dead_notifications)}")
+    else:
+        print(f"Отправлено уведомлений: {asyncio.run(OutboxDispatcher().dispatch_due())}")
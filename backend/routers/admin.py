@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, Request, HTTPException, Header, UploadFile, File, Form
+from fastapi import APIRouter, Depends, Request, HTTPException, Header, UploadFile, File, Form, Response
 from sqlalchemy.sql import func
-from database import get_db
+from database import get_db, get_async_db
 from models import QuizQuestion, Request as RequestModel, LandPlot, Visitor, Admin, AdminSession
 from datetime import datetime, timedelta
-from sqlalchemy import and_
+from sqlalchemy import and_, select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
 from utils.time import get_msk_time, get_msk_now, to_utc
+from utils.auth import AdminPrincipal, PasswordHashBusy, hash_session_token
+from utils.rate_limit import create_rate_limiter
+from utils.client_ip import client_ip
 import crud
+import crud_async
 from schemas import (
     LandPlot as LandPlotSchema,
     AdminLogin,
@@ -16,21 +21,34 @@ from schemas import (
     PlotVisibility,
     LandPlotUpdate
 )
+import logging
+import math
 import os
+import time
 import uuid
+import mimetypes
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import events
 from utils.file import is_allowed_file_type, get_file_size_limit
+from utils.storage import UPLOADS_FOLDER, content_hash, fingerprint_filename, write_file
+from utils.log import SAMPLED
 from pydantic import BaseModel
 
 router = APIRouter(
     prefix="/admin",
     tags=["admin"]
 )
+logger = logging.getLogger(__name__)
+
+# Лимиты попыток входа: "N/секунд"
+login_username_limiter = create_rate_limiter(os.getenv("LOGIN_RATE_USERNAME", "5/300"), "login_username")
+login_ip_limiter = create_rate_limiter(os.getenv("LOGIN_RATE_IP", "20/60"), "login_ip")
 
 async def get_current_admin(
-    session_token: str = Header(..., alias="X-Admin-Token"),
-    db: Session = Depends(get_db)
+    session_token: str = Header(..., alias="X-Admin-Token")
 ):
-    admin = crud.get_admin_by_session(db, session_token)
+    admin = await crud_async.get_admin_principal(session_token)
     if not admin:
         raise HTTPException(
             status_code=401,
@@ -41,53 +59,76 @@ async def get_current_admin(
 @router.post("/login", response_model=AdminSessionResponse)
 async def login(
     login_data: AdminLogin,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: Session = Depends(get_db),
+    async_db: AsyncSession = Depends(get_async_db)
 ):
-    admin = crud.authenticate_admin(db, login_data.username, login_data.password)
+    # Ограничиваем частоту попыток входа для имени пользователя и для IP
+    # (общий лимит воркеров хранится в SQLite, поэтому вызов в пуле потоков)
+    retry_after = max(
+        await run_in_threadpool(login_username_limiter.acquire, login_data.username),
+        await run_in_threadpool(login_ip_limiter.acquire, client_ip(request))
+    )
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Слишком много попыток входа, попробуйте позже",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+    try:
+        admin = await crud_async.authenticate_admin(async_db, login_data.username, login_data.password)
+    except PasswordHashBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Сервер перегружен попытками входа, попробуйте позже",
+            headers={"Retry-After": "1"}
+        )
     if not admin:
         raise HTTPException(
             status_code=401,
             detail="Неверное имя пользователя или пароль"
         )
     
-    session = crud.create_admin_session(db, admin.id)
+    await run_in_threadpool(login_username_limiter.reset, login_data.username)
+    session_token, session = await run_in_threadpool(crud.login_admin, db, admin.id)
     return AdminSessionResponse(
-        session_token=session.session_token,
+        session_token=session_token,
         expires_at=session.expires_at
     )
 
 @router.get("/me", response_model=AdminResponse)
 async def get_current_admin_info(
-    current_admin: Admin = Depends(get_current_admin)
+    current_admin: AdminPrincipal = Depends(get_current_admin)
 ):
     return current_admin
 
 @router.get("/stats")
 async def get_admin_stats(
-    current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: AdminPrincipal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение общей статистики для административной панели
     """
     # Статистика заявок
-    total_requests = db.query(RequestModel).count()
-    new_requests = db.query(RequestModel).filter(RequestModel.status == "new").count()
-    completed_requests = db.query(RequestModel).filter(RequestModel.status == "completed").count()
+    total_requests = await crud_async.count(db, RequestModel)
+    new_requests = await crud_async.count(db, RequestModel, RequestModel.status == "new")
+    completed_requests = await crud_async.count(db, RequestModel, RequestModel.status == "completed")
     
     # Статистика участков
-    total_plots = db.query(LandPlot).count()
-    available_plots = db.query(LandPlot).filter(LandPlot.status == "available").count()
+    total_plots = await crud_async.count(db, LandPlot)
+    available_plots = await crud_async.count(db, LandPlot, LandPlot.status == "available")
     
     # Статистика квиза
-    quiz_questions = db.query(QuizQuestion).count()
-    quiz_completions = db.query(RequestModel).filter(RequestModel.type == "quiz").count()
+    quiz_questions = await crud_async.count(db, QuizQuestion)
+    quiz_completions = await crud_async.count(db, RequestModel, RequestModel.type == "quiz")
 
     # Текущие онлайн пользователи (за последние 5 минут)
     five_minutes_ago = to_utc(get_msk_now() - timedelta(minutes=5))
-    current_online = db.query(func.count(func.distinct(Visitor.session_id))).filter(
+    current_online = await db.scalar(select(func.count(func.distinct(Visitor.session_id))).filter(
         Visitor.timestamp >= five_minutes_ago
-    ).scalar()
+    ))
     
     return {
         "total_requests": total_requests,
@@ -100,8 +141,86 @@ async def get_admin_stats(
         "current_online": current_online
     }
 
+@router.post("/events/ticket")
+def create_events_ticket(
+    session_token: str = Header(..., alias="X-Admin-Token"),
+    current_admin: AdminPrincipal = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Одноразовый билет для GET /admin/events?ticket=...: EventSource не
+    позволяет задать заголовок X-Admin-Token. Билет действует
+    EVENTS_TICKET_TTL секунд; при переподключении нужен новый
+    """
+    ticket = crud.create_stream_ticket(db, current_admin.id, session_token)
+    return {"ticket": ticket, "expires_in": events.EVENTS_TICKET_TTL}
+
+@router.get("/events")
+async def get_lead_events(
+    request: Request,
+    ticket: Optional[str] = None,
+    session_token: Optional[str] = Header(None, alias="X-Admin-Token"),
+    last_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Лента событий заявок (Server-Sent Events), см. events.py. Браузер
+    подключается с билетом (POST /admin/events/ticket), другие клиенты -
+    с заголовком X-Admin-Token. При переподключении браузер передает
+    Last-Event-ID и получает пропущенные события; первое подключение
+    может продолжить ленту параметром last_event_id
+    """
+    if ticket:
+        session_hash = await run_in_threadpool(crud.redeem_stream_ticket, db, ticket)
+    elif session_token and await crud_async.get_admin_principal(session_token):
+        session_hash = hash_session_token(session_token)
+    else:
+        session_hash = None
+    if session_hash is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Недействительная или истекшая сессия администратора"
+        )
+
+    position = last_event_id or request.query_params.get("last_event_id")
+    position = int(position) if position and position.isdigit() else None
+
+    async def stream():
+        now = time.monotonic()
+        deadline = now + events.EVENTS_STREAM_TIMEOUT
+        next_check = now + events.EVENTS_AUTH_RECHECK
+        yield b"retry: 3000\n\n"
+        async for lead_event in events.hub.subscribe(position):
+            now = time.monotonic()
+            if now > deadline:
+                break
+            # Сессию проверяем по времени, а не только в паузах между событиями:
+            # иначе при потоке заявок отозванная сессия получала бы их до конца
+            if now >= next_check:
+                if not await crud_async.is_admin_session_active(session_hash):
+                    break
+                next_check = now + events.EVENTS_AUTH_RECHECK
+            yield events.format_sse(lead_event) if lead_event is not None else b": ping\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stats/quiz")
+async def get_quiz_stats(
+    current_admin: AdminPrincipal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Статистика квиза: число отправок, воронка по вопросам (сколько ответили
+    на каждый) и распределение ответов по вариантам
+    """
+    return await crud_async.get_quiz_stats(db)
+
 @router.get("/stats/visitors")
-async def get_visitors_stats(db: Session = Depends(get_db)):
+async def get_visitors_stats(db: AsyncSession = Depends(get_async_db)):
     """
     Получение статистики посещаемости сайта
     """
@@ -112,12 +231,12 @@ async def get_visitors_stats(db: Session = Depends(get_db)):
     for i in range(24):
         hour_start = now - timedelta(hours=23-i)
         hour_end = hour_start + timedelta(hours=1)
-        visitors_count = db.query(func.count(func.distinct(Visitor.session_id))).filter(
+        visitors_count = await db.scalar(select(func.count(func.distinct(Visitor.session_id))).filter(
             and_(
                 Visitor.timestamp >= to_utc(hour_start),
                 Visitor.timestamp < to_utc(hour_end)
             )
-        ).scalar()
+        ))
         hourly_data.append({
             "time": hour_start.strftime("%H:00"),
             "visitors": visitors_count
@@ -128,12 +247,12 @@ async def get_visitors_stats(db: Session = Depends(get_db)):
     for i in range(7):
         day_start = (now - timedelta(days=6-i)).replace(hour=0, minute=0, second=0, microsecond=0)
         day_end = day_start + timedelta(days=1)
-        visitors_count = db.query(func.count(func.distinct(Visitor.session_id))).filter(
+        visitors_count = await db.scalar(select(func.count(func.distinct(Visitor.session_id))).filter(
             and_(
                 Visitor.timestamp >= to_utc(day_start),
                 Visitor.timestamp < to_utc(day_end)
             )
-        ).scalar()
+        ))
         daily_data.append({
             "date": day_start.strftime("%d.%m"),
             "visitors": visitors_count
@@ -144,12 +263,12 @@ async def get_visitors_stats(db: Session = Depends(get_db)):
     for i in range(30):
         day_start = (now - timedelta(days=29-i)).replace(hour=0, minute=0, second=0, microsecond=0)
         day_end = day_start + timedelta(days=1)
-        visitors_count = db.query(func.count(func.distinct(Visitor.session_id))).filter(
+        visitors_count = await db.scalar(select(func.count(func.distinct(Visitor.session_id))).filter(
             and_(
                 Visitor.timestamp >= to_utc(day_start),
                 Visitor.timestamp < to_utc(day_end)
             )
-        ).scalar()
+        ))
         monthly_data.append({
             "date": day_start.strftime("%d.%m"),
             "visitors": visitors_count
@@ -165,7 +284,7 @@ class VisitData(BaseModel):
     session_id: Optional[str] = None
 
 @router.post("/track-visit")
-async def track_visit(visit_data: VisitData, request: Request, db: Session = Depends(get_db)):
+def track_visit(visit_data: VisitData, request: Request, db: Session = Depends(get_db)):
     """
     Записывает информацию о посещении
     """
@@ -182,16 +301,18 @@ async def track_visit(visit_data: VisitData, request: Request, db: Session = Dep
         session_id=session_id,
         path=path,
         user_agent=request.headers.get("user-agent"),
-        ip_address=request.client.host,
+        ip_address=client_ip(request),
         referrer=request.headers.get("referer"),
         timestamp=to_utc(get_msk_now())  # Сохраняем в UTC, но берем текущее московское время
     )
     db.add(visitor)
     db.commit()
+    # Посещения - самое частое событие, в лог попадает только выборка
+    logger.info("Посещение %s", path, extra=SAMPLED)
     return {"status": "success"}
 
 @router.get("/plots/count", response_model=dict)
-def get_admin_plots_count(
+async def get_admin_plots_count(
     search: str = None,
     status: str = None,
     category: str = None,
@@ -201,9 +322,9 @@ def get_admin_plots_count(
     area_max: float = None,
     region: str = None,
     location: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    total = crud.get_plots_count(
+    total = await crud_async.get_plots_count(
         db,
         search=search,
         status=status,
@@ -219,7 +340,7 @@ def get_admin_plots_count(
     return {"total": total}
 
 @router.get("/plots", response_model=List[LandPlotSchema])
-def get_admin_plots(
+async def get_admin_plots(
     skip: int = 0,
     limit: int = 9,
     search: str = None,
@@ -231,9 +352,9 @@ def get_admin_plots(
     area_max: float = None,
     region: str = None,
     location: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return crud.get_land_plots(
+    content = await crud_async.serialize_land_plots(
         db,
         skip=skip,
         limit=limit,
@@ -248,24 +369,25 @@ def get_admin_plots(
         location=location,
         show_hidden=True  # Для админки показываем все участки
     )
+    return Response(content=content, media_type="application/json")
 
 @router.get("/plots/{plot_id}", response_model=LandPlotSchema)
-def get_admin_plot(
+async def get_admin_plot(
     plot_id: int,
-    current_admin: Admin = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: AdminPrincipal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получить информацию об участке, включая скрытые (только для админов)"""
-    db_plot = crud.get_land_plot(db, plot_id=plot_id, show_hidden=True)
-    if db_plot is None:
+    content = await crud_async.serialize_land_plot(db, plot_id, show_hidden=True)
+    if content is None:
         raise HTTPException(status_code=404, detail="Участок не найден")
-    return db_plot
+    return Response(content=content, media_type="application/json")
 
 @router.patch("/plots/{plot_id}/visibility", response_model=LandPlotSchema)
 def toggle_admin_plot_visibility(
     plot_id: int,
     visibility: PlotVisibility,
-    current_admin: Admin = Depends(get_current_admin),
+    current_admin: AdminPrincipal = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
     """Изменить видимость участка (только для админов)"""
@@ -277,7 +399,7 @@ def toggle_admin_plot_visibility(
 @router.delete("/plots/{plot_id}")
 def delete_admin_plot(
     plot_id: int,
-    current_admin: Admin = Depends(get_current_admin),
+    current_admin: AdminPrincipal = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
     """Удалить участок (только для админов)"""
@@ -289,7 +411,7 @@ def delete_admin_plot(
 def update_admin_plot(
     plot_id: int,
     plot: LandPlotUpdate,
-    current_admin: Admin = Depends(get_current_admin),
+    current_admin: AdminPrincipal = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
     """Обновить информацию об участке (только для админов)"""
@@ -299,14 +421,53 @@ def update_admin_plot(
     return db_plot
 
 # Директория для загрузки файлов
-UPLOAD_FOLDER = os.path.join("static", "uploads")
+UPLOAD_FOLDER = UPLOADS_FOLDER
+
+def store_document(
+    db: Session,
+    original_filename: str,
+    content_type: Optional[str],
+    contents: bytes,
+    document_type: str
+) -> dict:
+    """Сохраняет документ под именем с отпечатком и индексирует его в БД"""
+    file_ext = os.path.splitext(original_filename)[1].lower()
+
+    # Генерируем уникальное имя файла с отпечатком содержимого
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    file_id = str(uuid.uuid4())[:8]
+    digest = content_hash(contents)
+    filename = fingerprint_filename(f"{timestamp}_{file_id}{file_ext}", contents, digest)
+
+    file_path = write_file(UPLOAD_FOLDER, filename, contents)
+    url = f"/uploads/{filename}"
+    crud.create_attachment(
+        db,
+        public_id=file_id,
+        name=original_filename,
+        type=document_type,
+        url=url,
+        file_path=file_path,
+        size=len(contents),
+        mime_type=mimetypes.guess_type(original_filename)[0] or content_type,
+        content_hash=digest
+    )
+
+    return {
+        "id": file_id,
+        "name": original_filename,
+        "url": url,
+        "type": document_type,
+        "size": len(contents)
+    }
 
 @router.post("/upload-document")
 async def upload_document(
     file: UploadFile = File(...),
-    document_type: str = Form(default="document")
+    document_type: str = Form(default="document"),
+    db: Session = Depends(get_db)
 ):
-    print(f"Загрузка документа: {file.filename}, тип: {document_type}")
+    logger.info("Загрузка документа: %s, тип: %s", file.filename, document_type)
     
     try:
         # Проверяем расширение файла
@@ -328,41 +489,24 @@ async def upload_document(
                 detail=f"Файл слишком большой. Максимальный размер: 10MB"
             )
         
-        # Создаем директорию, если её нет
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-        
-        # Генерируем уникальное имя файла
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_id = str(uuid.uuid4())[:8]
-        filename = f"{timestamp}_{file_id}{file_ext}"
-        
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        
-        # Сохраняем файл
-        with open(file_path, "wb") as f:
-            f.write(contents)
-        
-        # Возвращаем информацию о файле
-        return {
-            "id": file_id,
-            "name": file.filename,
-            "url": f"/uploads/{filename}",
-            "type": document_type,
-            "size": len(contents)
-        }
+        # Сохраняем файл и записываем его в индекс вложений
+        return await run_in_threadpool(
+            store_document, db, file.filename, file.content_type, contents, document_type
+        )
             
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Ошибка при загрузке файла: {str(e)}")
+        logger.error("Ошибка при загрузке файла: %s", e)
         raise HTTPException(status_code=500, detail=f"Ошибка при загрузке файла: {str(e)}")
 
 @router.post("/upload-documents")
 async def upload_documents(
     files: List[UploadFile] = File(...),
-    document_type: str = Form(default="document")
+    document_type: str = Form(default="document"),
+    db: Session = Depends(get_db)
 ):
-    print(f"Загрузка {len(files)} документов, тип: {document_type}")
+    logger.info("Загрузка %s документов, тип: %s", len(files), document_type)
     
     uploaded_files = []
     
@@ -381,31 +525,13 @@ async def upload_documents(
             if len(contents) > MAX_SIZE:
                 continue  # Пропускаем слишком большие файлы
             
-            # Создаем директорию, если её нет
-            os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-            
-            # Генерируем уникальное имя файла
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            file_id = str(uuid.uuid4())[:8]
-            filename = f"{timestamp}_{file_id}{file_ext}"
-            
-            file_path = os.path.join(UPLOAD_FOLDER, filename)
-            
-            # Сохраняем файл
-            with open(file_path, "wb") as f:
-                f.write(contents)
-            
-            # Добавляем информацию о файле в список
-            uploaded_files.append({
-                "id": file_id,
-                "name": file.filename,
-                "url": f"/uploads/{filename}",
-                "type": document_type,
-                "size": len(contents)
-            })
+            # Сохраняем файл и добавляем информацию о нем в список
+            uploaded_files.append(await run_in_threadpool(
+                store_document, db, file.filename, file.content_type, contents, document_type
+            ))
                 
         except Exception as e:
-            print(f"Ошибка при загрузке файла {file.filename}: {str(e)}")
+            logger.error("Ошибка при загрузке файла %s: %s", file.filename, e)
             # Продолжаем с другими файлами
     
     return uploaded_files 
\ No newline at end of file
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db
 import crud
+import crud_async
 from schemas import ContactInfo, ContactInfoBase
 
 router = APIRouter(
@@ -10,8 +12,8 @@ router = APIRouter(
 )
 
 @router.get("", response_model=ContactInfo)
-def get_contacts(db: Session = Depends(get_db)):
-    contact_info = crud.get_contact_info(db)
+async def get_contacts(db: AsyncSession = Depends(get_async_db)):
+    contact_info = await crud_async.get_contact_info(db)
     if not contact_info:
         raise HTTPException(status_code=404, detail="Contact info not found")
     return contact_info
@@ -1,20 +1,28 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
 import os
 from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
 
-from database import get_db
+from database import get_db, get_async_db
 import crud
+import crud_async
+from utils.images import store_images, remove_images
+from utils.storage import FileTooLarge, discard_spooled, spool_upload
 from schemas import LandPlotCreate, LandPlotUpdate, LandPlot, PlotVisibility, ImageOrder, ImageReorderRequest
 import models
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "static/images")
+MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB в байтах
 
 @router.get("/", response_model=List[LandPlot])
-def get_plots(
+async def get_plots(
     skip: int = 0,
     limit: int = 100,
     search: str = None,
@@ -26,9 +34,10 @@ def get_plots(
     area_max: float = None,
     region: str = None,
     location: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    plots = crud.get_land_plots(
+    # Отдаем готовый JSON, собранный из кэшированных фрагментов участков
+    content = await crud_async.serialize_land_plots(
         db,
         skip=skip,
         limit=limit,
@@ -43,50 +52,25 @@ def get_plots(
         location=location,
         show_hidden=False  # Для публичного API не показываем скрытые участки
     )
-    # Преобразуем данные для фронтенда
-    for plot in plots:
-        if not hasattr(plot, 'price_per_meter'):
-            setattr(plot, 'price_per_meter', plot.price_per_sotka)
-    return plots
+    return Response(content=content, media_type="application/json")
 
 @router.get("/regions", response_model=List[str])
-def get_unique_regions(db: Session = Depends(get_db)):
+async def get_unique_regions(db: AsyncSession = Depends(get_async_db)):
     """Получить список уникальных регионов из базы данных"""
-    regions = (
-        db.query(models.LandPlot.region)
-        .filter(models.LandPlot.is_visible == True)  # Только видимые участки
-        .group_by(models.LandPlot.region)
-        .all()
-    )
-    # Фильтруем None и пустые строки, сортируем результат
-    return sorted([region[0] for region in regions if region[0]])
+    return await crud_async.get_plot_values(db, models.LandPlot.region)
 
 @router.get("/locations", response_model=List[str])
-def get_unique_locations(db: Session = Depends(get_db)):
+async def get_unique_locations(db: AsyncSession = Depends(get_async_db)):
     """Получить список уникальных локаций из базы данных"""
-    locations = (
-        db.query(models.LandPlot.location)
-        .filter(models.LandPlot.is_visible == True)  # Только видимые участки
-        .group_by(models.LandPlot.location)
-        .all()
-    )
-    # Фильтруем None и пустые строки, сортируем результат
-    return sorted([location[0] for location in locations if location[0]])
+    return await crud_async.get_plot_values(db, models.LandPlot.location)
 
 @router.get("/categories", response_model=List[str])
-def get_unique_categories(db: Session = Depends(get_db)):
+async def get_unique_categories(db: AsyncSession = Depends(get_async_db)):
     """Получить список уникальных категорий земель из базы данных"""
-    categories = (
-        db.query(models.LandPlot.land_category)
-        .filter(models.LandPlot.is_visible == True)  # Только видимые участки
-        .group_by(models.LandPlot.land_category)
-        .all()
-    )
-    # Фильтруем None и пустые строки, сортируем результат
-    return sorted([category[0] for category in categories if category[0]])
+    return await crud_async.get_plot_values(db, models.LandPlot.land_category)
 
 @router.get("/count", response_model=dict)
-def get_plots_count(
+async def get_plots_count(
     search: str = None,
     status: str = None,
     category: str = None,
@@ -96,9 +80,9 @@ def get_plots_count(
     area_max: float = None,
     region: str = None,
     location: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    total = crud.get_plots_count(
+    total = await crud_async.get_plots_count(
         db,
         search=search,
         status=status,
@@ -114,16 +98,11 @@ def get_plots_count(
     return {"total": total}
 
 @router.get("/{plot_id}", response_model=LandPlot)
-def get_plot(plot_id: int, db: Session = Depends(get_db)):
-    plot = crud.get_land_plot(db, plot_id=plot_id)
-    if plot is None:
+async def get_plot(plot_id: int, db: AsyncSession = Depends(get_async_db)):
+    content = await crud_async.serialize_land_plot(db, plot_id)
+    if content is None:
         raise HTTPException(status_code=404, detail="Plot not found")
-    
-    # Добавляем price_per_meter
-    if not hasattr(plot, 'price_per_meter'):
-        setattr(plot, 'price_per_meter', plot.price_per_sotka)
-    
-    return plot
+    return Response(content=content, media_type="application/json")
 
 @router.post("/", response_model=LandPlot)
 def create_plot(plot: LandPlotCreate, db: Session = Depends(get_db)):
@@ -165,7 +144,7 @@ def create_plot(plot: LandPlotCreate, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Ошибка при создании участка: {str(e)}")
+        logger.error("Ошибка при создании участка: %s", e)
         if "UNIQUE constraint failed: land_plots.cadastral_number" in str(e):
             raise HTTPException(
                 status_code=400,
@@ -212,13 +191,11 @@ def reorder_images(
 ):
     """Обновляет порядок изображений для участка"""
     try:
-        print(f"Получен запрос на обновление порядка изображений для участка {plot_id}")
-        print(f"Данные запроса: {image_order}")
+        logger.debug("Новый порядок изображений участка %s: %s", plot_id, image_order)
         
         # Проверяем, что все id являются целыми числами
         for img in image_order.images:
             if not isinstance(img.id, int):
-                print(f"Ошибка: ID изображения должен быть целым числом, получено: {img.id} типа {type(img.id)}")
                 raise HTTPException(
                     status_code=422, 
                     detail=f"ID изображения должен быть целым числом, получено: {img.id} типа {type(img.id)}"
@@ -226,7 +203,6 @@ def reorder_images(
             
             # Проверяем, что order является целым числом
             if not isinstance(img.order, int):
-                print(f"Ошибка: order должен быть целым числом, получено: {img.order} типа {type(img.order)}")
                 raise HTTPException(
                     status_code=422, 
                     detail=f"order должен быть целым числом, получено: {img.order} типа {type(img.order)}"
@@ -234,7 +210,6 @@ def reorder_images(
             
             # Проверяем, что is_main является булевым значением
             if not isinstance(img.is_main, bool):
-                print(f"Ошибка: is_main должен быть булевым значением, получено: {img.is_main} типа {type(img.is_main)}")
                 raise HTTPException(
                     status_code=422, 
                     detail=f"is_main должен быть булевым значением, получено: {img.is_main} типа {type(img.is_main)}"
@@ -243,14 +218,12 @@ def reorder_images(
         # Проверяем, что участок существует
         plot = crud.get_land_plot(db, plot_id, show_hidden=True)
         if not plot:
-            print(f"Ошибка: Участок с ID {plot_id} не найден")
             raise HTTPException(status_code=404, detail=f"Участок с ID {plot_id} не найден")
         
         # Проверяем, что все изображения принадлежат участку
         plot_image_ids = [img.id for img in plot.images]
         for img in image_order.images:
             if img.id not in plot_image_ids:
-                print(f"Ошибка: Изображение с ID {img.id} не принадлежит участку {plot_id}")
                 raise HTTPException(
                     status_code=422, 
                     detail=f"Изображение с ID {img.id} не принадлежит участку {plot_id}"
@@ -262,13 +235,11 @@ def reorder_images(
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        print(f"Ошибка при обновлении порядка изображений: {str(e)}")
+        logger.exception("Ошибка при обновлении порядка изображений: %s", e)
         raise HTTPException(status_code=500, detail=f"Ошибка при обновлении порядка изображений: {str(e)}")
 
 @router.post("/{plot_id}/images/")
-async def upload_plot_image(
+def upload_plot_image(
     plot_id: int,
     file: UploadFile = File(...),
     is_main: bool = Form(False),
@@ -276,35 +247,34 @@ async def upload_plot_image(
     db: Session = Depends(get_db)
 ):
     try:
-        print(f"Начало загрузки изображения для участка {plot_id}")
-        print(f"Информация о файле: имя={file.filename}, тип={file.content_type}, порядок={order}, is_main={is_main}")
+        logger.info(
+            "Загрузка изображения для участка %s: имя=%s, тип=%s, порядок=%s, is_main=%s",
+            plot_id, file.filename, file.content_type, order, is_main
+        )
         
         # Проверяем существование участка
         plot = crud.get_land_plot(db, plot_id)
         if not plot:
-            print(f"Участок {plot_id} не найден")
             raise HTTPException(status_code=404, detail="Участок не найден")
         
         # Проверяем тип файла
         if not file.content_type.startswith('image/'):
-            print(f"Неверный тип файла: {file.content_type}")
             raise HTTPException(
                 status_code=422,
                 detail=f"Неверный формат файла: {file.content_type}. Разрешены только изображения"
             )
         
         # Проверяем размер файла (максимум 10MB)
-        MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB в байтах
         file_size = 0
         try:
             file.file.seek(0, 2)  # Перемещаемся в конец файла
             file_size = file.file.tell()  # Получаем размер
             file.file.seek(0)  # Возвращаемся в начало
         except Exception as e:
-            print(f"Ошибка при определении размера файла: {str(e)}")
+            logger.warning("Ошибка при определении размера файла: %s", e)
             # Продолжаем выполнение, так как это не критическая ошибка
         
-        if file_size > MAX_FILE_SIZE:
+        if file_size > MAX_IMAGE_SIZE:
             raise HTTPException(
                 status_code=422,
                 detail=f"Размер файла ({file_size} байт) превышает максимально допустимый размер (10MB)"
@@ -315,21 +285,22 @@ async def upload_plot_image(
         
         # Сохраняем файл
         try:
-            filename, file_path = crud.save_image(UPLOAD_FOLDER, file)
+            stored = crud.save_image(UPLOAD_FOLDER, file)
+            filename, file_path = stored.filename, stored.path
             if not filename:
                 raise HTTPException(status_code=500, detail="Ошибка при сохранении файла")
         except Exception as e:
-            print(f"Ошибка при сохранении файла: {str(e)}")
+            logger.error("Ошибка при сохранении файла: %s", e)
             raise HTTPException(status_code=500, detail=f"Ошибка при сохранении файла: {str(e)}")
             
         # Создаем запись в базе данных с указанным порядком
         try:
-            image = crud.create_image(db, filename=filename, path=file_path, order=order)
+            image = crud.create_image(db, filename=filename, path=file_path, order=order, **stored.metadata())
             if not image:
                 os.remove(os.path.join(UPLOAD_FOLDER, filename))
                 raise HTTPException(status_code=500, detail="Ошибка при создании записи изображения")
         except Exception as e:
-            print(f"Ошибка при создании записи изображения: {str(e)}")
+            logger.error("Ошибка при создании записи изображения: %s", e)
             try:
                 os.remove(os.path.join(UPLOAD_FOLDER, filename))
             except:
@@ -344,7 +315,7 @@ async def upload_plot_image(
                 db.commit()
                 raise HTTPException(status_code=500, detail="Ошибка при привязке изображения к участку")
         except Exception as e:
-            print(f"Ошибка при привязке изображения к участку: {str(e)}")
+            logger.error("Ошибка при привязке изображения к участку: %s", e)
             try:
                 os.remove(os.path.join(UPLOAD_FOLDER, filename))
                 db.delete(image)
@@ -358,7 +329,7 @@ async def upload_plot_image(
             if is_main or len(plot.images) == 1:
                 crud.set_image_as_main(db, plot_id, image.id)
         except Exception as e:
-            print(f"Ошибка при установке главного изображения: {str(e)}")
+            logger.warning("Ошибка при установке главного изображения: %s", e)
             # Продолжаем выполнение, так как это не критическая ошибка
         
         return {"filename": filename, "path": file_path, "id": image.id}
@@ -366,15 +337,63 @@ async def upload_plot_image(
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Необработанная ошибка при загрузке изображения: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Необработанная ошибка при загрузке изображения: {str(e)}"
         )
 
+@router.post("/{plot_id}/images/bulk")
+async def upload_plot_images_bulk(
+    plot_id: int,
+    files: List[UploadFile] = File(...),
+    main_index: int = Form(-1),
+    db: Session = Depends(get_db)
+):
+    """Загружает галерею одним запросом: файлы обрабатываются параллельно, записи создаются одной транзакцией"""
+    plot = await run_in_threadpool(crud.get_land_plot, db, plot_id, True)
+    if not plot:
+        raise HTTPException(status_code=404, detail="Участок не найден")
+
+    # Файлы копируются на диск частями: пачка не держится в памяти целиком
+    batch = []
+    try:
+        for file in files:
+            if not file.content_type or not file.content_type.startswith('image/'):
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Неверный формат файла {file.filename}: {file.content_type}. Разрешены только изображения"
+                )
+            try:
+                spooled = await spool_upload(file, UPLOAD_FOLDER, MAX_IMAGE_SIZE)
+            except FileTooLarge:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Размер файла {file.filename} превышает максимально допустимый размер (10MB)"
+                )
+            batch.append((file.filename, file.content_type, spooled))
+    except BaseException:
+        discard_spooled(spooled.path for _, _, spooled in batch)
+        raise
+
+    try:
+        stored_images = await store_images(UPLOAD_FOLDER, batch)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка при сохранении файлов: {str(e)}")
+
+    try:
+        created = await run_in_threadpool(crud.create_plot_images, db, plot_id, stored_images, main_index)
+    except Exception as e:
+        await run_in_threadpool(remove_images, UPLOAD_FOLDER, stored_images)
+        raise HTTPException(status_code=500, detail=f"Ошибка при создании записей изображений: {str(e)}")
+    if not created:
+        # Участок удалили, пока загружались файлы
+        await run_in_threadpool(remove_images, UPLOAD_FOLDER, stored_images)
+        raise HTTPException(status_code=404, detail="Участок не найден")
+    return created
+
 @router.delete("/{plot_id}/images/{image_id}")
-async def delete_plot_image(
+def delete_plot_image(
     plot_id: int,
     image_id: int,
     db: Session = Depends(get_db)
@@ -399,7 +418,7 @@ async def delete_plot_image(
         )
 
 @router.patch("/{plot_id}/images/{image_id}/main")
-async def set_main_image(
+def set_main_image(
     plot_id: int,
     image_id: int,
     db: Session = Depends(get_db)
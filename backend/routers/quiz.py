@@ -1,57 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from sqlalchemy.orm import Session
 from database import get_db
 import crud
-from typing import List
+import crud_async
+from typing import List, Optional
 from schemas import QuizQuestion, RequestCreate, RequestType, QuizQuestionCreate, QuizQuestionUpdate
-import random
-import string
-from telegram_bot.bot import bot
-from telegram_bot.notifications import send_request_notification
+from telegram_bot.service import TELEGRAM_BOT_ENABLED
+from utils.dedup import clean_idempotency_key
 
 router = APIRouter(
     prefix="/quiz",
     tags=["quiz"]
 )
 
-def generate_promo_code(length: int = 8) -> str:
-    """Генерирует случайный промокод"""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
-
 @router.get("/questions", response_model=List[QuizQuestion])
-def get_quiz_questions(
-    db: Session = Depends(get_db)
+async def get_quiz_questions(
+    if_none_match: Optional[str] = Header(None)
 ):
     """Получить список активных вопросов для квиза (публичный эндпоинт)"""
-    return crud.get_quiz_questions(db)
+    document = await crud_async.get_public_quiz()
+    # Браузер каждый раз сверяет ETag; квиз не изменился - ответ без тела
+    headers = {"ETag": document.etag, "Cache-Control": "no-cache"}
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or document.etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    ):
+        return Response(status_code=304, headers=headers)
+    return Response(content=document.content, media_type="application/json", headers=headers)
 
 @router.post("/request", response_model=dict)
-async def submit_quiz(
+def submit_quiz(
     request: RequestCreate,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Отправить ответы на квиз"""
-    # Генерируем промокод и устанавливаем тип
+    """Отправить ответы на квиз; повтор с тем же Idempotency-Key вернет тот же промокод"""
+    # Промокод выдает crud.create_request, тип всегда квиз
     request_data = request.model_dump()
-    request_data["promo_code"] = generate_promo_code()
+    request_data["promo_code"] = None
     request_data["type"] = RequestType.QUIZ
     
-    # Создаем заявку
-    new_request = crud.create_request(db, RequestCreate(**request_data))
-    
-    # Отправляем уведомление в Telegram
-    try:
-        notification_data = {
-            "type": "quiz",
-            "name": new_request.name,
-            "phone": new_request.phone,
-            "email": new_request.email,
-            "promo_code": new_request.promo_code,
-            "answers": new_request.answers
-        }
-        await send_request_notification(bot, notification_data)
-    except Exception as e:
-        print(f"Failed to send Telegram notification: {e}")
+    # Создаем заявку; уведомление в Telegram отправит диспетчер outbox
+    new_request = crud.create_request(
+        db, RequestCreate(**request_data), notify=TELEGRAM_BOT_ENABLED, with_promo_code=True,
+        idempotency_key=clean_idempotency_key(idempotency_key)
+    )
     
     # Возвращаем промокод
     return {
@@ -1,36 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import List, Optional
+from database import SessionLocal, get_db, get_async_db
 import crud
+import crud_async
 from schemas import (
     QuizQuestion, QuizQuestionCreate,
-    Request, RequestCreate, RequestUpdate,
+    Request, RequestCreate, RequestUpdate, RequestBulkUpdate,
     RequestType
 )
-import random
-import string
-from telegram_bot.bot import bot
-from telegram_bot.notifications import send_request_notification
-from telegram_bot.config import config
+from routers.admin import get_current_admin
+from telegram_bot.service import TELEGRAM_BOT_ENABLED
+from utils.auth import AdminPrincipal
+from utils.dedup import clean_idempotency_key
+from utils.export import CSV_MEDIA_TYPE, XLSX_MEDIA_TYPE, iter_csv, iter_xlsx
+from utils.lead_search import encode_cursor
+from utils.promo import PROMO_USED
+from utils.time import get_msk_now
 
 router = APIRouter(
     prefix="/requests",
     tags=["requests"]
 )
 
-def generate_promo_code(length: int = 8) -> str:
-    """Генерирует случайный промокод"""
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
-
 # Управление вопросами квиза
 @router.get("/quiz/questions", response_model=List[QuizQuestion])
-def get_quiz_questions(
+async def get_quiz_questions(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return crud.get_quiz_questions(db, skip=skip, limit=limit)
+    return await crud_async.get_quiz_questions(db, skip=skip, limit=limit)
 
 @router.post("/quiz/questions", response_model=QuizQuestion)
 def create_quiz_question(
@@ -61,44 +64,53 @@ def delete_quiz_question(
 
 # Управление заявками
 @router.get("/", response_model=List[Request])
-def get_requests(
+async def get_requests(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     type: str = None,
     status: str = None,
-    db: Session = Depends(get_db)
+    search: str = None,
+    date_from: date = None,
+    date_to: date = None,
+    cursor: str = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return crud.get_requests(db, skip=skip, limit=limit, type=type, status=status)
+    """
+    Заявки от новых к старым. search - поиск по имени, телефону, email,
+    сообщению и заметкам; date_from/date_to - даты создания включительно.
+    Если страница полная, курсор следующей передается в заголовке
+    X-Next-Cursor (параметр cursor, skip при этом не нужен)
+    """
+    try:
+        requests = await crud_async.get_requests(
+            db, skip=skip, limit=limit, type=type, status=status,
+            search=search, date_from=date_from, date_to=date_to, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if requests and len(requests) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(requests[-1].created_at, requests[-1].id)
+    return requests
 
 @router.post("/", response_model=dict)
-async def create_request(
+def create_request(
     request: RequestCreate,
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Создать новую заявку (публичный эндпоинт)"""
+    """Создать новую заявку (публичный эндпоинт); повторы не создают новых заявок"""
     request_data = request.model_dump()
     
-    # Генерируем промокод для квиза
-    if request_data["type"] == RequestType.QUIZ:
-        request_data["promo_code"] = generate_promo_code()
+    # Промокод выдается только за квиз и только сервером
+    request_data["promo_code"] = None
     
-    # Создаем заявку
-    new_request = crud.create_request(db, RequestCreate(**request_data))
-    
-    # Отправляем уведомление в Telegram
-    try:
-        notification_data = {
-            "type": new_request.type,
-            "name": new_request.name,
-            "phone": new_request.phone,
-            "email": new_request.email,
-            "message": getattr(new_request, 'message', None),
-            "promo_code": getattr(new_request, 'promo_code', None),
-            "answers": getattr(new_request, 'answers', None)
-        }
-        await send_request_notification(bot, notification_data)
-    except Exception as e:
-        print(f"Failed to send Telegram notification: {e}")
+    # Создаем заявку; уведомление в Telegram отправит диспетчер outbox
+    new_request = crud.create_request(
+        db, RequestCreate(**request_data), notify=TELEGRAM_BOT_ENABLED,
+        with_promo_code=request_data["type"] == RequestType.QUIZ,
+        idempotency_key=clean_idempotency_key(idempotency_key)
+    )
     
     # Возвращаем промокод, если это квиз
     return {
@@ -106,6 +118,88 @@ async def create_request(
         "promo_code": new_request.promo_code if new_request.type == RequestType.QUIZ else None
     }
 
+@router.get("/promo/{promo_code}", response_model=Request)
+def get_request_by_promo(
+    promo_code: str,
+    current_admin: AdminPrincipal = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    db_request = crud.get_request_by_promo(db, promo_code)
+    if not db_request:
+        raise HTTPException(status_code=404, detail="Promo code not found")
+    return db_request
+
+@router.post("/promo/{promo_code}/redeem", response_model=dict)
+def redeem_promo_code(
+    promo_code: str,
+    current_admin: AdminPrincipal = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Погасить промокод; повторное погашение - 409"""
+    result = crud.redeem_promo_code(db, promo_code)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Promo code not found")
+    if result == PROMO_USED:
+        raise HTTPException(status_code=409, detail="Promo code already redeemed")
+    return {"status": result}
+
+@router.post("/bulk", response_model=dict)
+def bulk_update_requests(
+    update: RequestBulkUpdate,
+    current_admin: AdminPrincipal = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Изменить статус и/или заметки заявок из списка ids или по фильтру - одним запросом"""
+    changes = update.model_dump(include={"status", "notes"}, exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    if "status" in changes and not changes["status"]:
+        raise HTTPException(status_code=400, detail="Status cannot be empty")
+    if (update.ids is None) == (update.filter is None):
+        raise HTTPException(status_code=400, detail="Specify either ids or filter")
+    filters = update.filter.model_dump(exclude_none=True) if update.filter else None
+    if filters == {}:
+        # Пустой фильтр изменил бы все заявки
+        raise HTTPException(status_code=400, detail="Filter is empty")
+    return {"updated": crud.bulk_update_requests(db, changes, ids=update.ids, filters=filters)}
+
+@router.get("/export")
+def export_requests(
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    type: str = None,
+    status: str = None,
+    search: str = None,
+    date_from: date = None,
+    date_to: date = None,
+    current_admin: AdminPrincipal = Depends(get_current_admin)
+):
+    """
+    Выгрузка заявок с фильтрами списка в CSV или XLSX. Файл формируется по
+    мере отправки, заявки читаются из базы пачками
+    """
+    # Сессия нужна до конца отправки, поэтому не через Depends
+    db = SessionLocal()
+    try:
+        header, rows = crud.export_requests(
+            db, type=type, status=status, search=search, date_from=date_from, date_to=date_to
+        )
+    except Exception:
+        db.close()
+        raise
+
+    def content():
+        try:
+            yield from (iter_xlsx if format == "xlsx" else iter_csv)(header, rows)
+        finally:
+            db.close()
+
+    filename = f"requests-{get_msk_now():%Y%m%d-%H%M}.{format}"
+    return StreamingResponse(
+        content(),
+        media_type=XLSX_MEDIA_TYPE if format == "xlsx" else CSV_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.put("/{request_id}", response_model=Request)
 def update_request(
     request_id: int,
@@ -118,11 +212,11 @@ def update_request(
     return db_request
 
 @router.get("/{request_id}", response_model=Request)
-def get_request(
+async def get_request(
     request_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_request = crud.get_request(db, request_id)
+    db_request = await crud_async.get_request(db, request_id)
     if not db_request:
         raise HTTPException(status_code=404, detail="Request not found")
     return db_request 
\ No newline at end of file
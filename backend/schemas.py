@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Dict, Optional, Union, Any
 from models import PlotStatus, PlotCategory, RequestType
-from datetime import datetime
+from datetime import date, datetime
 
 class TerrainBase(BaseModel):
     isNearRiver: bool
@@ -28,6 +28,12 @@ class ImageCreate(ImageBase):
 
 class Image(ImageBase):
     id: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None
+    placeholder: Optional[str] = None
+    size: Optional[int] = None
+    mime_type: Optional[str] = None
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -181,10 +187,29 @@ class RequestUpdate(BaseModel):
     status: str
     notes: Optional[str] = None
 
+class RequestFilter(BaseModel):
+    """Фильтры списка заявок, см. crud.filter_requests"""
+    type: Optional[RequestType] = None
+    status: Optional[str] = None
+    search: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+class RequestBulkUpdate(BaseModel):
+    """
+    Изменение заявок из списка ids или подходящих под filter. Меняются только
+    переданные поля: notes=null очищает заметки, отсутствующее поле - не трогается
+    """
+    ids: Optional[List[int]] = Field(None, max_length=10000)
+    filter: Optional[RequestFilter] = None
+    status: Optional[str] = None
+    notes: Optional[str] = None
+
 class Request(RequestBase):
     id: int
     status: str
     notes: Optional[str]
+    promo_redeemed_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
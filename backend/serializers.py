@@ -0,0 +1,233 @@
+"""
+Быстрая сериализация каталога участков.
+
+Ответ собирается из готовых JSON-фрагментов отдельных участков, минуя
+ORM-объекты и повторную валидацию Pydantic. Фрагменты кэшируются по
+ключу (id, version): версия участка увеличивается при любом изменении
+участка или его изображений (см. models.bump_plot_versions), поэтому
+устаревший фрагмент просто перестает запрашиваться и вытесняется из кэша.
+Структура JSON совпадает со схемой schemas.LandPlot.
+
+Публичный квиз сериализуется целиком в документ с ETag (serialize_quiz),
+документ кэширует utils.quiz_cache.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from sqlalchemy.orm import Session
+
+import schemas
+from crud import filter_land_plots
+from models import LandPlot, Image, plot_images, QuizQuestion
+from utils.quiz_cache import QuizDocument
+
+# Число фрагментов участков, хранимых в памяти процесса
+PLOT_CACHE_SIZE = int(os.getenv("PLOT_CACHE_SIZE", 1024))
+
+_PLOT_COLUMNS = (
+    LandPlot.id,
+    LandPlot.version,
+    LandPlot.title,
+    LandPlot.description,
+    LandPlot.cadastral_numbers,
+    LandPlot.area,
+    LandPlot.specified_area,
+    LandPlot.price,
+    LandPlot.price_per_sotka,
+    LandPlot.location,
+    LandPlot.region,
+    LandPlot.land_category,
+    LandPlot.permitted_use,
+    LandPlot.features,
+    LandPlot.communications,
+    LandPlot.status,
+    LandPlot.is_visible,
+)
+
+_IMAGE_COLUMNS = (
+    Image.filename,
+    Image.path,
+    Image.id,
+    Image.width,
+    Image.height,
+    Image.dominant_color,
+    Image.placeholder,
+    Image.size,
+    Image.mime_type,
+)
+
+
+class FragmentCache:
+    """Потокобезопасный LRU-кэш сериализованных участков"""
+
+    def __init__(self, maxsize: int = PLOT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Tuple[int, int], bytes]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Tuple[int, int]) -> Optional[bytes]:
+        with self._lock:
+            fragment = self._items.get(key)
+            if fragment is not None:
+                self._items.move_to_end(key)
+            return fragment
+
+    def set(self, key: Tuple[int, int], fragment: bytes):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = fragment
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+fragment_cache = FragmentCache()
+
+
+def _description(value) -> dict:
+    """Оставляет в описании только поля схемы schemas.Description"""
+    value = value or {}
+    return {
+        "text": value.get("text", ""),
+        "attachments": [
+            {
+                "id": attachment.get("id"),
+                "name": attachment.get("name"),
+                "url": attachment.get("url"),
+                "type": attachment.get("type"),
+            }
+            for attachment in value.get("attachments") or []
+        ],
+    }
+
+
+def _plot_dict(row, images: List[dict]) -> dict:
+    status = row.status
+    return {
+        "title": row.title,
+        "description": _description(row.description),
+        "cadastral_numbers": row.cadastral_numbers or [],
+        "area": row.area,
+        "specified_area": row.specified_area,
+        "price": row.price,
+        "price_per_sotka": row.price_per_sotka,
+        # Виртуальное поле для совместимости с фронтендом
+        "price_per_meter": row.price_per_sotka,
+        "location": row.location,
+        "region": row.region,
+        "land_category": row.land_category,
+        "permitted_use": row.permitted_use,
+        "features": row.features or [],
+        "communications": row.communications or [],
+        "status": status.value if status is not None else None,
+        "is_visible": row.is_visible,
+        "id": row.id,
+        "images": images,
+    }
+
+
+def _load_images(db: Session, plot_ids: Iterable[int]) -> Dict[int, List[dict]]:
+    """Изображения участков в порядке показа: главное первым, затем по order"""
+    images: Dict[int, List[tuple]] = {}
+    rows = (
+        db.query(plot_images.c.plot_id, Image.is_main, Image.order, *_IMAGE_COLUMNS)
+        .join(plot_images, plot_images.c.image_id == Image.id)
+        .filter(plot_images.c.plot_id.in_(plot_ids))
+    )
+    for row in rows:
+        images.setdefault(row.plot_id, []).append(row)
+
+    result = {}
+    for plot_id, plot_rows in images.items():
+        plot_rows.sort(key=lambda x: (not x.is_main, x.order))
+        result[plot_id] = [
+            {column.key: getattr(row, column.key) for column in _IMAGE_COLUMNS}
+            for row in plot_rows
+        ]
+    return result
+
+
+def _load_fragments(db: Session, plot_ids: List[int]) -> Dict[int, bytes]:
+    """Сериализует участки, которых нет в кэше, и кладет их в кэш"""
+    rows = db.query(*_PLOT_COLUMNS).filter(LandPlot.id.in_(plot_ids)).all()
+    images = _load_images(db, plot_ids)
+    fragments = {}
+    for row in rows:
+        fragment = orjson.dumps(_plot_dict(row, images.get(row.id, [])))
+        fragment_cache.set((row.id, row.version), fragment)
+        fragments[row.id] = fragment
+    return fragments
+
+
+def _fragments(db: Session, keys: List[Tuple[int, int]]) -> List[bytes]:
+    fragments = {}
+    misses = []
+    for key in keys:
+        fragment = fragment_cache.get(key)
+        if fragment is None:
+            misses.append(key[0])
+        else:
+            fragments[key[0]] = fragment
+    if misses:
+        fragments.update(_load_fragments(db, misses))
+    return [fragments[plot_id] for plot_id, _ in keys if plot_id in fragments]
+
+
+def serialize_land_plots(
+    db: Session,
+    skip: int = 0,
+    limit: int = 9,
+    show_hidden: bool = False,
+    **filters
+) -> bytes:
+    """JSON-массив участков каталога (тот же набор, что и crud.get_land_plots)"""
+    query = filter_land_plots(
+        db.query(LandPlot.id, LandPlot.version), show_hidden=show_hidden, **filters
+    )
+    keys = [tuple(row) for row in query.offset(skip).limit(limit)]
+    return b"[" + b",".join(_fragments(db, keys)) + b"]"
+
+
+def serialize_land_plot(db: Session, plot_id: int, show_hidden: bool = False) -> Optional[bytes]:
+    """JSON одного участка или None, если участок не найден"""
+    query = db.query(LandPlot.id, LandPlot.version).filter(LandPlot.id == plot_id)
+    if not show_hidden:
+        query = query.filter(LandPlot.is_visible == True)
+    key = query.first()
+    if key is None:
+        return None
+    fragments = _fragments(db, [tuple(key)])
+    return fragments[0] if fragments else None
+
+
+def serialize_quiz(db: Session) -> QuizDocument:
+    """Активные вопросы квиза по порядку (схема schemas.QuizQuestion) и ETag документа"""
+    questions = []
+    for question in db.query(QuizQuestion).filter(QuizQuestion.is_active == True).order_by(
+        QuizQuestion.order, QuizQuestion.id
+    ):
+        options = question.options
+        # Старые записи хранят options строкой JSON
+        if isinstance(options, str):
+            options = json.loads(options)
+        questions.append(schemas.QuizQuestion(
+            id=question.id,
+            question=question.question,
+            options=options,
+            order=question.order,
+            is_active=question.is_active,
+            created_at=question.created_at,
+            updated_at=question.updated_at,
+        ).model_dump(mode="json"))
+    content = orjson.dumps(questions)
+    return QuizDocument(content, '"' + hashlib.sha256(content).hexdigest()[:32] + '"')
@@ -0,0 +1,34 @@
+import argparse
+import logging
+import os
+
+import crud
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("ADMIN_SESSION_SWEEP_BATCH_SIZE", 500))
+
+
+def sweep_admin_sessions(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Удаляет истекшие и деактивированные сессии администраторов и
+    неиспользованные билеты ленты событий
+    """
+    db = SessionLocal()
+    try:
+        deleted = crud.delete_stale_admin_sessions(db, batch_size=batch_size)
+        crud.delete_expired_stream_tickets(db)
+    finally:
+        db.close()
+    logger.info("Удалено сессий администраторов: %s", deleted)
+    return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Удаление истекших и неактивных сессий администраторов")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="размер пачки удаляемых сессий")
+    args = parser.parse_args()
+
+    deleted = sweep_admin_sessions(batch_size=args.batch_size)
+    print(f"Удалено сессий администраторов: {deleted}")
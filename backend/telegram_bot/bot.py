@@ -1,12 +1,18 @@
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.memory import MemoryStorage
 import asyncio
+import logging
 from .config import config
 from .handlers import router as handlers_router
 from .notifications import send_request_notification
 
+logger = logging.getLogger(__name__)
+
 # Инициализация бота и диспетчера
-bot = Bot(token=config.telegram_bot_token)
+session = AiohttpSession(api=TelegramAPIServer.from_base(config.telegram_api_url)) if config.telegram_api_url else None
+bot = Bot(token=config.telegram_bot_token, session=session)
 storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
 
@@ -30,7 +36,7 @@ async def start_bot():
     try:
         await dp.start_polling(bot)
     except Exception as e:
-        print(f"Error starting bot: {e}")
+        logger.error("Error starting bot: %s", e)
         await bot.session.close()
 
 if __name__ == "__main__":
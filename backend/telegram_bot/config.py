@@ -1,9 +1,12 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
+from typing import Optional
 
 class BotConfig(BaseSettings):
     telegram_bot_token: str
     admin_chat_id: int = Field(alias="TELEGRAM_ADMIN_CHAT_ID")
+    # Другой сервер Bot API (локальный telegram-bot-api или тестовый сервер)
+    telegram_api_url: Optional[str] = None
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -1,9 +1,9 @@
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.filters import Command
-import crud
-from database import get_db
-from sqlalchemy.orm import Session
+import crud_async
+from utils.promo import PROMO_REDEEMED, PROMO_USED
+from .config import config
 
 router = Router()
 
@@ -12,7 +12,8 @@ async def cmd_start(message: Message):
     await message.answer(
         "👋 Привет! Я бот для уведомлений о новых заявках на AltaiLand.\n\n"
         "Доступные команды:\n"
-        "/check_promo [код] - проверить валидность промокода"
+        "/check_promo [код] - проверить валидность промокода\n"
+        "/redeem_promo [код] - погасить промокод (в чате администраторов)"
     )
 
 @router.message(Command("check_promo"))
@@ -20,20 +21,41 @@ async def cmd_check_promo(message: Message):
     try:
         # Получаем промокод из сообщения
         promo_code = message.text.split()[1]
-        
-        # Проверяем промокод в базе
-        db: Session = next(get_db())
-        request = crud.get_request_by_promo(db, promo_code)
-        
-        if not request:
-            await message.answer("❌ Промокод не найден!")
-            return
-            
-        if request.status == "used":
-            await message.answer("❌ Этот промокод уже был использован!")
-            return
-            
-        await message.answer("✅ Промокод действителен и может быть использован!")
-        
     except IndexError:
-        await message.answer("❌ Пожалуйста, укажите промокод после команды. Пример: /check_promo ABC123") 
\ No newline at end of file
+        await message.answer("❌ Пожалуйста, укажите промокод после команды. Пример: /check_promo ABC123")
+        return
+
+    # Обработчик выполняется в event loop бота (и приложения), поэтому
+    # база - через асинхронный слой, с кэшем и закрытием сессии
+    state = await crud_async.check_promo_code(promo_code)
+
+    if state is None:
+        await message.answer("❌ Промокод не найден!")
+        return
+
+    if state == PROMO_USED:
+        await message.answer("❌ Этот промокод уже был использован!")
+        return
+
+    await message.answer("✅ Промокод действителен и может быть использован!")
+
+@router.message(Command("redeem_promo"))
+async def cmd_redeem_promo(message: Message):
+    # Гасить промокоды могут только администраторы
+    if message.chat.id != config.admin_chat_id:
+        await message.answer("❌ Команда доступна только в чате администраторов")
+        return
+    try:
+        promo_code = message.text.split()[1]
+    except IndexError:
+        await message.answer("❌ Пожалуйста, укажите промокод после команды. Пример: /redeem_promo ABC123")
+        return
+
+    result = await crud_async.redeem_promo_code(promo_code)
+
+    if result is None:
+        await message.answer("❌ Промокод не найден!")
+    elif result == PROMO_REDEEMED:
+        await message.answer("✅ Промокод погашен")
+    else:
+        await message.answer("❌ Этот промокод уже был использован!")
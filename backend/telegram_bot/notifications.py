@@ -1,23 +1,26 @@
 from aiogram import Bot
 from .config import config
+from typing import List, Tuple
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
-async def send_quiz_request_notification(bot: Bot, request_data: dict):
-    try:
-        answers_text = "Нет ответов"
-        if request_data.get('answers'):
-            try:
-                answers = request_data['answers']
-                if isinstance(answers, str):
-                    answers = json.loads(answers)
-                answers_text = "\n".join([f"- {q}: {a}" for q, a in answers.items()])
-            except:
-                answers_text = "Ошибка при обработке ответов"
+# Максимальная длина текста сообщения в Telegram
+MESSAGE_LIMIT = 4096
+
+def format_quiz_request_notification(request_data: dict) -> str:
+    answers_text = "Нет ответов"
+    if request_data.get('answers'):
+        try:
+            answers = request_data['answers']
+            if isinstance(answers, str):
+                answers = json.loads(answers)
+            answers_text = "\n".join([f"- {q}: {a}" for q, a in answers.items()])
+        except:
+            answers_text = "Ошибка при обработке ответов"
 
-        text = f"""🎯 Новая заявка из квиза!
+    return f"""🎯 Новая заявка из квиза!
 
 📝 Имя: {request_data.get('name')}
 📱 Телефон: {request_data.get('phone')}
@@ -28,16 +31,9 @@ async def send_quiz_request_notification(bot: Bot, request_data: dict):
 {answers_text}
 
 Проверьте админ-панель для подробной информации."""
-        
-        await bot.send_message(chat_id=config.admin_chat_id, text=text)
-        logger.info(f"Отправлено уведомление о новой заявке из квиза от {request_data.get('name')}")
-    except Exception as e:
-        logger.error(f"Ошибка при отправке уведомления о квизе: {e}")
-        raise
 
-async def send_plot_request_notification(bot: Bot, request_data: dict):
-    try:
-        text = f"""🏠 Новая заявка!
+def format_plot_request_notification(request_data: dict) -> str:
+    return f"""🏠 Новая заявка!
 
 📝 Имя: {request_data.get('name')}
 📱 Телефон: {request_data.get('phone')}
@@ -45,20 +41,50 @@ async def send_plot_request_notification(bot: Bot, request_data: dict):
 💬 Сообщение: {request_data.get('message', 'Не указано')}
 
 Проверьте админ-панель для подробной информации."""
-        
-        await bot.send_message(chat_id=config.admin_chat_id, text=text)
-        logger.info(f"Отправлено уведомление о новой заявке от {request_data.get('name')}")
-    except Exception as e:
-        logger.error(f"Ошибка при отправке уведомления о заявке: {e}")
-        raise
 
-async def send_request_notification(bot: Bot, request_data: dict):
+def format_request_notification(request_data: dict) -> str:
     """Выбирает подходящий формат уведомления в зависимости от типа заявки"""
+    if request_data.get('type') == 'quiz':
+        return format_quiz_request_notification(request_data)
+    return format_plot_request_notification(request_data)
+
+def format_request_digest_line(request_data: dict) -> str:
+    """Короткая строка о заявке для сводки"""
+    source = "квиз" if request_data.get('type') == 'quiz' else "заявка"
+    line = f"• #{request_data.get('id')} {request_data.get('name')}, {request_data.get('phone')} ({source})"
+    if request_data.get('promo_code'):
+        line += f", промокод {request_data.get('promo_code')}"
+    return line[:200]
+
+def format_request_digests(requests_data: List[dict], limit: int = MESSAGE_LIMIT) -> List[Tuple[str, int]]:
+    """
+    Сводки о нескольких заявках: список (текст, число заявок в нем).
+    Заявки идут по порядку, каждая сводка не длиннее limit символов.
+    """
+    footer = "\n\nПроверьте админ-панель для подробной информации."
+    # Запас под заголовок с числом заявок
+    budget = limit - len(footer) - 64
+    digests = []
+    lines: List[str] = []
+    size = 0
+    for request_data in requests_data:
+        line = format_request_digest_line(request_data)
+        if lines and size + len(line) + 1 > budget:
+            digests.append(lines)
+            lines, size = [], 0
+        lines.append(line)
+        size += len(line) + 1
+    if lines:
+        digests.append(lines)
+    return [
+        (f"📦 Новые заявки: {len(chunk)}\n\n" + "\n".join(chunk) + footer, len(chunk))
+        for chunk in digests
+    ]
+
+async def send_request_notification(bot: Bot, request_data: dict):
     try:
-        if request_data.get('type') == 'quiz':
-            await send_quiz_request_notification(bot, request_data)
-        else:
-            await send_plot_request_notification(bot, request_data)
+        await bot.send_message(chat_id=config.admin_chat_id, text=format_request_notification(request_data))
+        logger.info("Отправлено уведомление о новой заявке от %s", request_data.get('name'))
     except Exception as e:
-        logger.error(f"Ошибка при отправке уведомления: {e}")
-        raise 
\ No newline at end of file
+        logger.error("Ошибка при отправке уведомления: %s", e)
+        raise
@@ -0,0 +1,50 @@
+"""
+Доступ к Telegram-боту без импорта aiogram при запуске приложения.
+
+Модуль бота (aiogram, конфигурация, обработчики) загружается при первом
+обращении и только если бот включен: TELEGRAM_BOT_ENABLED=1. По умолчанию
+бот включен, если задан TELEGRAM_BOT_TOKEN; без него приложение работает
+без уведомлений и не падает из-за отсутствующих настроек.
+"""
+import asyncio
+import importlib
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_BOT_ENABLED = os.getenv(
+    "TELEGRAM_BOT_ENABLED", "1" if os.getenv("TELEGRAM_BOT_TOKEN") else "0"
+) == "1"
+
+
+async def load_bot_module():
+    """Импортирует telegram_bot.bot в пуле потоков, чтобы не блокировать event loop"""
+    return await asyncio.to_thread(importlib.import_module, "telegram_bot.bot")
+
+
+async def send_admin_message(text: str):
+    """Сообщение в чат администраторов (TELEGRAM_ADMIN_CHAT_ID)"""
+    bot_module = await load_bot_module()
+    await bot_module.bot.send_message(chat_id=bot_module.config.admin_chat_id, text=text)
+
+
+async def start_bot():
+    if not TELEGRAM_BOT_ENABLED:
+        logger.info("Telegram-бот отключен (TELEGRAM_BOT_ENABLED)")
+        return
+    try:
+        bot_module = await load_bot_module()
+    except Exception as e:
+        logger.error("Не удалось загрузить Telegram-бота: %s", e)
+        return
+    await bot_module.start_bot()
+
+
+async def close_bot():
+    """Закрывает HTTP-сессию бота, если он был загружен"""
+    # Модуль может быть еще не загружен до конца, если остановка пришла во время импорта
+    bot = getattr(sys.modules.get("telegram_bot.bot"), "bot", None)
+    if bot is not None:
+        await bot.session.close()
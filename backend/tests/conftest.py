@@ -0,0 +1,35 @@
+"""
+Тесты backend. Запуск из каталога backend: python -m pytest tests
+
+Приложение читает настройки при импорте модулей, поэтому база и файлы
+эпох временные и задаются до импорта.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TMP = tempfile.mkdtemp()
+os.environ.update(
+    DATABASE_URL="sqlite:///" + os.path.join(TMP, "test.db"),
+    QUIZ_EPOCH_FILE=os.path.join(TMP, "quiz.epoch"),
+    ADMIN_SESSION_EPOCH_FILE=os.path.join(TMP, "admin_sessions.epoch"),
+    PROMO_EPOCH_FILE=os.path.join(TMP, "promo.epoch"),
+    EVENTS_BACKEND="local",
+)
+
+import pytest
+
+from database import Base, SessionLocal, engine
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,41 @@
+from starlette.requests import Request
+
+from utils.client_ip import client_ip, parse_networks
+from utils.rate_limit import RateLimiter
+
+NGINX = "172.18.0.5"
+TRUSTED = parse_networks("172.16.0.0/12")
+
+
+def make_request(peer: str, **headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/admin/login",
+        "client": (peer, 40000),
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_forwarded_clients_get_separate_buckets():
+    limiter = RateLimiter(2, 60)
+    first = make_request(NGINX, x_real_ip="203.0.113.7", x_forwarded_for="203.0.113.7")
+    second = make_request(NGINX, x_real_ip="198.51.100.20", x_forwarded_for="198.51.100.20")
+
+    # Первый клиент исчерпал попытки, второй за тем же nginx - нет
+    for _ in range(2):
+        assert limiter.acquire(client_ip(first, TRUSTED)) == 0
+    assert limiter.acquire(client_ip(first, TRUSTED)) > 0
+    assert limiter.acquire(client_ip(second, TRUSTED)) == 0
+
+
+def test_headers_from_untrusted_peer_are_ignored():
+    request = make_request("203.0.113.7", x_real_ip="198.51.100.20")
+    assert client_ip(request, TRUSTED) == "203.0.113.7"
+    # Без TRUSTED_PROXIES заголовкам не доверяем вовсе
+    assert client_ip(make_request(NGINX, x_real_ip="198.51.100.20"), []) == NGINX
+
+
+def test_forwarded_for_skips_trusted_hops():
+    request = make_request(NGINX, x_forwarded_for="198.51.100.1, 203.0.113.7, 172.18.0.9")
+    assert client_ip(request, TRUSTED) == "203.0.113.7"
@@ -0,0 +1,171 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import crud
+import events
+from events import Event, EventHub, LocalBackend, format_sse
+from models import AdminStreamTicket
+
+
+class FakeSession:
+    """Достаточно для publish: события транзакции хранятся в Session.info"""
+
+    def __init__(self):
+        self.info = {}
+
+
+def commit(hub: EventHub, *kinds: str):
+    session = FakeSession()
+    for kind in kinds:
+        hub.publish(session, kind, {"kind": kind})
+    hub.committed(session)
+
+
+@asynccontextmanager
+async def running(hub: EventHub):
+    task = asyncio.create_task(hub.run())
+    await asyncio.sleep(0.05)
+    try:
+        yield
+    finally:
+        task.cancel()
+
+
+async def collect(subscription, count: int, timeout: float = 1):
+    received = []
+
+    async def take():
+        async for lead_event in subscription:
+            if lead_event is not None:
+                received.append(lead_event)
+            if len(received) == count:
+                return
+
+    await asyncio.wait_for(take(), timeout)
+    return received
+
+
+def test_format_sse():
+    assert format_sse(Event(7, "request.created", {"id": 1, "name": "Иван"})) == (
+        b'id: 7\nevent: request.created\ndata: {"id":1,"name":"\xd0\x98\xd0\xb2\xd0\xb0\xd0\xbd"}\n\n'
+    )
+
+
+def test_local_backend_numbers_events_on_commit():
+    backend = LocalBackend(size=3)
+    assert backend.first_id() is None and backend.last_id() == 0
+    backend.committed([("a", {}), ("b", {})])
+    backend.committed([("c", {}), ("d", {})])
+    # Старые события вытесняются, номера продолжаются
+    assert [lead_event.id for lead_event in backend.read(0, 10)] == [2, 3, 4]
+    assert [lead_event.kind for lead_event in backend.read(2, 1)] == ["c"]
+    assert backend.first_id() == 2 and backend.last_id() == 4
+
+
+def test_rolled_back_events_are_dropped():
+    hub = EventHub(LocalBackend())
+    session = FakeSession()
+    hub.publish(session, "request.created", {})
+    events._drop_rolled_back(session)
+    hub.committed(session)
+    assert hub.backend.last_id() == 0
+
+
+def test_subscribe_requires_running_hub():
+    async def check():
+        try:
+            await EventHub(LocalBackend()).subscribe().__anext__()
+        except RuntimeError:
+            return True
+        return False
+
+    assert asyncio.run(check())
+
+
+def test_subscriber_gets_only_new_events():
+    async def check():
+        hub = EventHub(LocalBackend())
+        async with running(hub):
+            commit(hub, "old")
+            await asyncio.sleep(0.05)
+            subscriber = asyncio.create_task(collect(hub.subscribe(), 2))
+            await asyncio.sleep(0.05)
+            commit(hub, "first", "second")
+            return await subscriber
+
+    assert [(e.id, e.kind) for e in asyncio.run(check())] == [(2, "first"), (3, "second")]
+
+
+def test_resume_from_last_event_id():
+    async def check():
+        hub = EventHub(LocalBackend())
+        async with running(hub):
+            commit(hub, "a", "b", "c", "d")
+            await asyncio.sleep(0.05)
+            return await collect(hub.subscribe(last_event_id=2), 2)
+
+    assert [e.kind for e in asyncio.run(check())] == ["c", "d"]
+
+
+def test_resume_beyond_hub_buffer_reads_backend():
+    async def check():
+        hub = EventHub(LocalBackend(size=10), buffer_size=2)
+        async with running(hub):
+            commit(hub, "a", "b", "c", "d", "e")
+            await asyncio.sleep(0.05)
+            return await collect(hub.subscribe(last_event_id=1), 4)
+
+    assert [e.kind for e in asyncio.run(check())] == ["b", "c", "d", "e"]
+
+
+def test_reset_when_missed_events_are_gone():
+    async def check():
+        hub = EventHub(LocalBackend(size=2), buffer_size=2)
+        async with running(hub):
+            commit(hub, "a", "b", "c", "d")
+            await asyncio.sleep(0.05)
+            subscription = hub.subscribe(last_event_id=1)
+            received = await collect(subscription, 1)
+            subscriber = asyncio.create_task(collect(subscription, 1))
+            await asyncio.sleep(0.05)
+            commit(hub, "e")
+            return received + await subscriber
+
+    reset, after = asyncio.run(check())
+    # Клиент перезагружает список и продолжает с последнего события
+    assert (reset.id, reset.kind) == (4, "reset")
+    assert (after.id, after.kind) == (5, "e")
+
+
+def test_heartbeat_without_events(monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_HEARTBEAT", 0.05)
+
+    async def check():
+        hub = EventHub(LocalBackend())
+        async with running(hub):
+            return await asyncio.wait_for(hub.subscribe().__anext__(), 1)
+
+    assert asyncio.run(check()) is None
+
+
+def test_stream_ticket_is_single_use(db):
+    admin = crud.create_admin(db, "admin", "secret")
+    session_token, _ = crud.login_admin(db, admin.id)
+    ticket = crud.create_stream_ticket(db, admin.id, session_token)
+
+    assert ticket != session_token
+    assert crud.redeem_stream_ticket(db, ticket) == crud.hash_session_token(session_token)
+    assert crud.redeem_stream_ticket(db, ticket) is None
+    assert crud.redeem_stream_ticket(db, "unknown") is None
+
+
+def test_expired_stream_ticket_is_rejected(db):
+    admin = crud.create_admin(db, "admin", "secret")
+    session_token, _ = crud.login_admin(db, admin.id)
+    ticket = crud.create_stream_ticket(db, admin.id, session_token)
+    db.query(AdminStreamTicket).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+    assert crud.redeem_stream_ticket(db, ticket) is None
+    assert crud.delete_expired_stream_tickets(db) == 1
@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+from utils.promo import PROMO_REDEEMED, PROMO_VALID, PromoCache
+from utils.ttl_cache import MISSING
+
+
+def test_redeem_in_other_process_clears_cache():
+    epoch_path = os.path.join(tempfile.mkdtemp(), "promo.epoch")
+    # Два экземпляра с общим файлом эпохи - как бот в лидере и воркер API
+    bot, api = PromoCache(epoch_path=epoch_path), PromoCache(epoch_path=epoch_path)
+    bot.set("ABC123", PROMO_VALID)
+    assert bot.get("ABC123") == PROMO_VALID
+
+    api.invalidate("ABC123")
+    assert bot.get("ABC123") is MISSING
+
+
+def test_stale_result_is_not_cached():
+    epoch_path = os.path.join(tempfile.mkdtemp(), "promo.epoch")
+    bot, api = PromoCache(epoch_path=epoch_path), PromoCache(epoch_path=epoch_path)
+    epoch = bot.epoch()
+    # Код погасили, пока бот читал его состояние из базы
+    api.invalidate("ABC123")
+    bot.set("ABC123", PROMO_VALID, epoch)
+    assert bot.get("ABC123") is MISSING
+
+    bot.set("ABC123", PROMO_REDEEMED, bot.epoch())
+    assert bot.get("ABC123") == PROMO_REDEEMED
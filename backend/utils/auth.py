@@ -1,19 +1,119 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from dataclasses import dataclass
+from threading import BoundedSemaphore
+from typing import Optional
+from jose import JWTError, jwt
+import asyncio
+import hashlib
+import os
 import secrets
 import string
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt намеренно медленный, поэтому хэширование выполняется в отдельном
+# небольшом пуле потоков с ограниченной очередью: поток попыток входа
+# не занимает ни event loop, ни общий пул потоков обработчиков
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 16))
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_slots = BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+# Тип токена администратора:
+# session - случайный токен, проверяется по таблице admin_sessions (с кэшем);
+# jwt - подписанный токен, проверяется без обращения к базе, но отозвать
+# его до истечения срока нельзя (выход из других сессий на него не влияет)
+ADMIN_TOKEN_MODE = os.getenv("ADMIN_TOKEN_MODE", "session")
+JWT_SECRET = os.getenv("ADMIN_JWT_SECRET")
+JWT_ALGORITHM = "HS256"
+
+if ADMIN_TOKEN_MODE == "jwt" and not JWT_SECRET:
+    raise RuntimeError("Для ADMIN_TOKEN_MODE=jwt необходимо задать ADMIN_JWT_SECRET")
+
+
+@dataclass(frozen=True)
+class AdminPrincipal:
+    """Данные администратора, достаточные для авторизации запроса"""
+    id: int
+    username: str
+    is_active: bool
+    created_at: datetime
+    last_login: Optional[datetime] = None
+
+    @classmethod
+    def from_admin(cls, admin) -> "AdminPrincipal":
+        return cls(
+            id=admin.id,
+            username=admin.username,
+            is_active=admin.is_active,
+            created_at=admin.created_at,
+            last_login=admin.last_login
+        )
+
+
+class PasswordHashBusy(Exception):
+    """Очередь проверки паролей переполнена"""
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def _run_hash(func, *args):
+    if not _hash_slots.acquire(blocking=False):
+        raise PasswordHashBusy()
+    try:
+        future = _hash_executor.submit(func, *args)
+    except BaseException:
+        _hash_slots.release()
+        raise
+    # Место освобождается, когда bcrypt действительно закончил (или задача
+    # снята из очереди), а не когда отменили ожидающую корутину
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return await asyncio.wrap_future(future)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password в пуле хэширования; PasswordHashBusy, если очередь заполнена"""
+    return await _run_hash(verify_password, plain_password, hashed_password)
+
 def generate_session_token(length: int = 32) -> str:
     alphabet = string.ascii_letters + string.digits
     return ''.join(secrets.choice(alphabet) for _ in range(length))
 
+def hash_session_token(token: str) -> bytes:
+    """Хэш токена для хранения и поиска в admin_sessions"""
+    return hashlib.sha256(token.encode()).digest()
+
 def create_session_expiration() -> datetime:
-    return datetime.utcnow() + timedelta(days=7)  # Сессия действительна 7 дней 
\ No newline at end of file
+    return datetime.utcnow() + timedelta(days=7)  # Сессия действительна 7 дней
+
+def create_access_token(principal: AdminPrincipal, expires_at: datetime) -> str:
+    """Подписанный токен администратора (режим jwt)"""
+    payload = {
+        "sub": str(principal.id),
+        "username": principal.username,
+        "is_active": principal.is_active,
+        "created_at": principal.created_at.isoformat(),
+        "last_login": principal.last_login.isoformat() if principal.last_login else None,
+        "exp": expires_at,
+        "jti": generate_session_token(16),
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def decode_access_token(token: str) -> Optional[AdminPrincipal]:
+    """Проверяет подпись и срок действия токена, возвращает None для недействительного"""
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        return AdminPrincipal(
+            id=int(payload["sub"]),
+            username=payload["username"],
+            is_active=payload["is_active"],
+            created_at=datetime.fromisoformat(payload["created_at"]),
+            last_login=datetime.fromisoformat(payload["last_login"]) if payload.get("last_login") else None
+        )
+    except (JWTError, KeyError, ValueError):
+        return None
@@ -0,0 +1,48 @@
+"""
+IP-адрес клиента за обратным прокси.
+
+Приложение работает за nginx, поэтому request.client.host - адрес
+контейнера nginx, общий для всех посетителей. Адрес клиента берется из
+X-Real-IP (или X-Forwarded-For), но только если соединение пришло от
+доверенного прокси из TRUSTED_PROXIES (адреса и подсети через запятую);
+иначе заголовки может подделать кто угодно. По умолчанию прокси не доверяем.
+"""
+import ipaddress
+import os
+from typing import List, Optional, Union
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(value: str) -> List[IPNetwork]:
+    """Разбирает список адресов и подсетей: "172.16.0.0/12,10.0.0.1" """
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+
+TRUSTED_PROXIES = parse_networks(os.getenv("TRUSTED_PROXIES", ""))
+
+
+def _is_trusted(host: Optional[str], trusted: List[IPNetwork]) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except (TypeError, ValueError):
+        return False
+    return any(address in network for network in trusted)
+
+
+def client_ip(request, trusted: Optional[List[IPNetwork]] = None) -> str:
+    """Адрес клиента с учетом заголовков доверенного прокси"""
+    trusted = TRUSTED_PROXIES if trusted is None else trusted
+    peer = request.client.host if request.client else None
+    if not _is_trusted(peer, trusted):
+        return peer or "unknown"
+
+    real_ip = request.headers.get("x-real-ip", "").strip()
+    if real_ip:
+        return real_ip
+    # Последний адрес цепочки, добавленный не доверенным прокси
+    forwarded = [item.strip() for item in request.headers.get("x-forwarded-for", "").split(",") if item.strip()]
+    for host in reversed(forwarded):
+        if not _is_trusted(host, trusted):
+            return host
+    return peer
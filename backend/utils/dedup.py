@@ -0,0 +1,42 @@
+"""
+Защита от повторной отправки заявки (двойной клик, повтор запроса на
+медленном мобильном соединении).
+
+- Idempotency-Key: клиент передает заголовок с одним значением для всех
+  повторов одной отправки. Ключ хранится IDEMPOTENCY_KEY_TTL секунд
+  (таблица idempotency_keys), повтор возвращает исходную заявку.
+- Без ключа заявка того же типа с того же телефона в течение
+  LEAD_DEDUP_WINDOW секунд считается повтором. Ключ дубликата
+  (тип, нормализованный телефон, номер интервала) хранится в
+  requests.dedup_key с уникальным индексом, поэтому одновременные повторы
+  не создают две заявки. Повтор на границе интервалов находится запросом
+  по ключу предыдущего интервала. 0 - проверка отключена.
+"""
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from utils.phone import normalize_phone
+
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 3600))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+LEAD_DEDUP_WINDOW = int(os.getenv("LEAD_DEDUP_WINDOW", 600))
+
+
+def lead_dedup_keys(type: str, phone: str, now: datetime) -> List[str]:
+    """Ключ дубликата для текущего интервала и для предыдущего; пустой список - без проверки"""
+    phone = normalize_phone(phone)
+    if LEAD_DEDUP_WINDOW <= 0 or phone is None:
+        return []
+    bucket = int(now.timestamp()) // LEAD_DEDUP_WINDOW
+    return [f"{type}:{phone}:{bucket}", f"{type}:{phone}:{bucket - 1}"]
+
+
+def clean_idempotency_key(key: Optional[str]) -> Optional[str]:
+    """Ключ из заголовка; пустой или слишком длинный не используется"""
+    if not key:
+        return None
+    key = key.strip()
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return None
+    return key
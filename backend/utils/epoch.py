@@ -0,0 +1,27 @@
+"""
+"Эпоха" - общая для процессов метка изменения данных: время изменения
+файла в наносекундах. Процесс, изменивший данные, обновляет время файла
+(bump), остальные сверяют его при чтении своего кэша (один stat) и при
+смене эпохи считают кэш устаревшим.
+"""
+import os
+import time
+
+
+class Epoch:
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> int:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def bump(self) -> int:
+        # Эпоха только растет, даже если часы файловой системы грубые
+        epoch = max(time.time_ns(), self.read() + 1)
+        with open(self.path, "a"):
+            pass
+        os.utime(self.path, ns=(epoch, epoch))
+        return epoch
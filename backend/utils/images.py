@@ -0,0 +1,172 @@
+import asyncio
+import base64
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple, Union
+
+from PIL import Image as PILImage, ImageOps
+
+from utils.storage import (
+    SpooledFile, content_hash, discard_spooled, fingerprint_filename, place_spooled, remove_file, storage_key,
+    write_file,
+)
+
+# Пул потоков для обработки изображений, чтобы не блокировать event loop
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", min(4, os.cpu_count() or 1)))
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-worker")
+
+
+# Размер и качество миниатюры-заглушки (LQIP), встраиваемой в ответ API
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+
+
+@dataclass
+class StoredImage:
+    filename: str
+    path: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None
+    placeholder: Optional[str] = None
+    size: Optional[int] = None
+    mime_type: Optional[str] = None
+    content_hash: Optional[str] = None
+    storage_key: Optional[str] = None
+
+    def metadata(self) -> dict:
+        """Поля для записи в модель Image"""
+        return {
+            "size": self.size,
+            "mime_type": self.mime_type,
+            "content_hash": self.content_hash,
+            "storage_key": self.storage_key,
+            "width": self.width,
+            "height": self.height,
+            "dominant_color": self.dominant_color,
+            "placeholder": self.placeholder,
+        }
+
+
+def image_metadata(source: Union[bytes, str]) -> dict:
+    """
+    Вычисляет размеры, доминирующий цвет и LQIP-заглушку изображения
+    по содержимому или по пути к файлу.
+    Для файлов, которые Pillow не может открыть, возвращает пустой словарь.
+    """
+    try:
+        with PILImage.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+            mime_type = PILImage.MIME.get(img.format)
+            img = ImageOps.exif_transpose(img).convert("RGB")
+    except Exception:
+        return {}
+
+    width, height = img.size
+
+    # Доминирующий цвет - самый частый цвет палитры уменьшенной копии
+    sample = img.copy()
+    sample.thumbnail((64, 64))
+    quantized = sample.quantize(colors=5)
+    palette = quantized.getpalette()
+    _, index = max(quantized.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+
+    sample.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    sample.save(buffer, format="WEBP", quality=PLACEHOLDER_QUALITY)
+    placeholder = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    return {
+        "mime_type": mime_type,
+        "width": width,
+        "height": height,
+        "dominant_color": f"#{r:02x}{g:02x}{b:02x}",
+        "placeholder": placeholder,
+    }
+
+
+def safe_image_filename(original_filename: str, content_type: str) -> str:
+    """Очищает имя файла и добавляет расширение по MIME-типу, если его нет"""
+    safe_filename = "".join(c for c in (original_filename or "") if c.isalnum() or c in ('-', '_', '.'))
+    if not safe_filename:
+        safe_filename = "unnamed_file"
+
+    if '.' not in safe_filename:
+        content_type = content_type or "application/octet-stream"
+        if content_type.startswith("image/"):
+            ext = content_type.split("/")[1]
+            if ext == "jpeg":
+                ext = "jpg"
+            safe_filename = f"{safe_filename}.{ext}"
+    return safe_filename
+
+
+def store_image(upload_folder: str, original_filename: str, content_type: str, contents: bytes) -> StoredImage:
+    """Сохраняет изображение под именем с отпечатком содержимого"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    safe_filename = safe_image_filename(original_filename, content_type)
+    digest = content_hash(contents)
+    filename = fingerprint_filename(f"{timestamp}_{safe_filename}", contents, digest)
+    file_path = write_file(upload_folder, filename, contents)
+
+    metadata = image_metadata(contents)
+    if not metadata.get("mime_type"):
+        metadata["mime_type"] = content_type
+    return StoredImage(
+        filename=filename,
+        path=f"/images/{filename}",
+        size=len(contents),
+        content_hash=digest,
+        storage_key=storage_key(file_path),
+        **metadata
+    )
+
+
+def store_spooled_image(upload_folder: str, original_filename: str, content_type: str,
+                        spooled: SpooledFile) -> StoredImage:
+    """Как store_image, но для файла, уже скопированного на диск через spool_upload"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    safe_filename = safe_image_filename(original_filename, content_type)
+    filename = fingerprint_filename(f"{timestamp}_{safe_filename}", b"", spooled.digest)
+    file_path = place_spooled(spooled, upload_folder, filename)
+
+    metadata = image_metadata(file_path)
+    if not metadata.get("mime_type"):
+        metadata["mime_type"] = content_type
+    return StoredImage(
+        filename=filename,
+        path=f"/images/{filename}",
+        size=spooled.size,
+        content_hash=spooled.digest,
+        storage_key=storage_key(file_path),
+        **metadata
+    )
+
+
+async def store_images(upload_folder: str, files: List[Tuple[str, str, SpooledFile]]) -> List[StoredImage]:
+    """
+    Параллельно сохраняет скопированные на диск изображения в пуле потоков,
+    сохраняя порядок файлов
+    """
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(_executor, store_spooled_image, upload_folder, name, content_type, spooled)
+        for name, content_type, spooled in files
+    ), return_exceptions=True)
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        # Не оставляем на диске файлы частично загруженной пачки
+        remove_images(upload_folder, [result for result in results if isinstance(result, StoredImage)])
+        discard_spooled(spooled.path for _, _, spooled in files)
+        raise errors[0]
+    return results
+
+
+def remove_images(upload_folder: str, images: List[StoredImage]):
+    """Удаляет сохраненные файлы (откат при ошибке записи в БД)"""
+    for image in images:
+        remove_file(os.path.join(upload_folder, image.filename))
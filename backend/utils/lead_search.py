@@ -0,0 +1,85 @@
+"""
+Поиск заявок в админке: разбор строки поиска и курсор keyset-пагинации.
+
+Поиск идет по подстроке в имени, нормализованном телефоне
+(requests.phone_normalized), email, сообщении и заметках через
+триграммный индекс: FTS5 (tokenize='trigram') в SQLite, pg_trgm в
+PostgreSQL - см. models.REQUESTS_SEARCH_DDL. Все слова строки должны
+найтись (в любом из полей). Строка из цифр и знаков номера
+("8 (999) 123") ищется только по телефону, ведущая 8 считается кодом +7.
+Слова короче SEARCH_MIN_TERM символов индекс не ускоряет, они проверяются
+обычным LIKE среди найденных по остальным словам.
+
+Список заявок упорядочен по (created_at, id) от новых к старым; курсор -
+позиция последней заявки страницы, следующая страница начинается после
+нее (без OFFSET, время не растет с номером страницы).
+"""
+import base64
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Длина триграммы: более короткие слова индекс не находит
+SEARCH_MIN_TERM = 3
+
+_PHONE_QUERY = re.compile(r"^\+?[\d\s()\-.]+$")
+_NON_DIGITS = re.compile(r"\D")
+
+
+@dataclass
+class SearchQuery:
+    # Варианты цифр телефона, найтись должен любой
+    phone: List[str] = field(default_factory=list)
+    # Слова, которые ищутся по индексу
+    terms: List[str] = field(default_factory=list)
+    # Короткие слова: проверяются LIKE
+    short_terms: List[str] = field(default_factory=list)
+
+
+def parse_search(search: Optional[str]) -> Optional[SearchQuery]:
+    """Разбирает строку поиска; None - поиск не задан"""
+    search = (search or "").strip()
+    if not search:
+        return None
+    digits = _NON_DIGITS.sub("", search)
+    if _PHONE_QUERY.match(search) and len(digits) >= SEARCH_MIN_TERM:
+        phone = [digits]
+        if digits[0] == "8":
+            phone.append("7" + digits[1:])
+        return SearchQuery(phone=phone)
+    query = SearchQuery()
+    for term in search.lower().split():
+        (query.terms if len(term) >= SEARCH_MIN_TERM else query.short_terms).append(term)
+    return query
+
+
+def fts_match_expression(query: SearchQuery) -> Optional[str]:
+    """Выражение MATCH для FTS5: каждое слово - фраза (подстрока) в любом поле"""
+    def phrase(term: str) -> str:
+        return '"' + term.replace('"', '""') + '"'
+
+    if query.phone:
+        return "phone_normalized : (" + " OR ".join(phrase(digits) for digits in query.phone) + ")"
+    if query.terms:
+        return " AND ".join(phrase(term) for term in query.terms)
+    return None
+
+
+def like_pattern(term: str) -> str:
+    """Шаблон LIKE для подстроки (с экранированием через \\)"""
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def encode_cursor(created_at: datetime, request_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{request_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Позиция из курсора; ValueError - курсор поврежден"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, request_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(request_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Некорректный курсор") from e
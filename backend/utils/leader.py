@@ -0,0 +1,66 @@
+"""
+Выбор ведущего процесса при запуске нескольких воркеров (WEB_CONCURRENCY).
+
+Фоновые задачи (Telegram-бот, периодическая очистка) должны выполняться
+ровно в одном процессе: иначе несколько ботов конкурируют за getUpdates.
+Ведущим становится воркер, захвативший блокировку файла LEADER_LOCK_FILE.
+Остальные периодически повторяют попытку и забирают задачи себе, если
+ведущий процесс завершился (блокировка снимается вместе с процессом).
+"""
+import asyncio
+import fcntl
+import logging
+import os
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK_FILE = os.getenv("LEADER_LOCK_FILE", "db/leader.lock")
+LEADER_RETRY_INTERVAL = float(os.getenv("LEADER_RETRY_INTERVAL", 30))
+
+
+class LeaderLock:
+    def __init__(self, path: str = LEADER_LOCK_FILE):
+        self.path = path
+        self._file = None
+
+    def try_acquire(self) -> bool:
+        """Захватывает блокировку без ожидания; True, если процесс ведущий"""
+        if self._file is not None:
+            return True
+        lock_file = open(self.path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+# Блокировка держится, пока открыт файл, поэтому объект живет весь процесс
+leader_lock = LeaderLock()
+
+
+def run_as_leader(start: Callable[[], object], lock: LeaderLock = leader_lock):
+    """
+    Запускает фоновые задачи сразу, если процесс стал ведущим, иначе
+    ждет освобождения блокировки в отдельном таске
+    """
+    async def wait_for_lock():
+        while not lock.try_acquire():
+            await asyncio.sleep(LEADER_RETRY_INTERVAL)
+        logger.info("Процесс %s выполняет фоновые задачи", os.getpid())
+        start()
+
+    if lock.try_acquire():
+        logger.info("Процесс %s выполняет фоновые задачи", os.getpid())
+        start()
+    else:
+        asyncio.create_task(wait_for_lock())
@@ -0,0 +1,131 @@
+"""
+Настройка логирования приложения.
+
+Записи из обработчиков попадают в очередь (QueueHandler), а вывод в
+stdout выполняет отдельный поток QueueListener - запрос не ждет записи
+в консоль. К каждой записи добавляется идентификатор запроса (заголовок
+X-Request-ID или новый), чтобы связать строки одного запроса.
+
+Настройки:
+- LOG_LEVEL - уровень (INFO по умолчанию, DEBUG - подробные данные);
+- LOG_FORMAT - text или json (одна JSON-строка на запись);
+- LOG_SAMPLE_RATE - доля записей частых событий, которые выводятся.
+  Такие записи помечаются extra=SAMPLED.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.01))
+
+REQUEST_ID_HEADER = "x-request-id"
+
+# Пометка для записей частых событий, из которых выводится LOG_SAMPLE_RATE
+SAMPLED = {"sampled": True}
+
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
+_listener: Optional[QueueListener] = None
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет идентификатор запроса и отбрасывает лишние частые записи"""
+
+    def __init__(self, sample_rate: float = LOG_SAMPLE_RATE):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and random.random() >= self.sample_rate:
+            return False
+        # Выполняется в потоке запроса, пока контекст еще доступен
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+def setup_logging():
+    """Подключает очередь к корневому логгеру; повторный вызов ничего не делает"""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+
+    handler = QueueHandler(queue.SimpleQueue())
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(handler)
+
+    _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Дописывает оставшиеся записи и останавливает поток вывода"""
+    global _listener
+    if _listener is None:
+        return
+    for handler in list(logging.getLogger().handlers):
+        if isinstance(handler, QueueHandler) and handler.queue is _listener.queue:
+            logging.getLogger().removeHandler(handler)
+    _listener.stop()
+    _listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI middleware: идентификатор запроса для логов и заголовка ответа"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        value = None
+        for name, header in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode():
+                value = header.decode("latin-1")[:64]
+                break
+        value = value or uuid.uuid4().hex[:16]
+        token = request_id.set(value)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER.encode(), value.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id.reset(token)
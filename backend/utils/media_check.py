@@ -0,0 +1,126 @@
+"""
+Проверка согласованности индекса файлов (images, attachments) с диском.
+
+Находит записи, файл которых отсутствует или отличается по размеру/хэшу,
+и файлы на диске, которых нет в индексе. В режиме reindex дозаполняет
+метаданные старых изображений и создает записи для вложений участков,
+загруженных до появления индекса.
+"""
+import json
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+import models
+from utils.images import image_metadata
+from utils.media_gc import MEDIA_FOLDERS, media_files
+from utils.storage import content_hash, image_file_path, key_to_path, storage_key, url_to_path
+
+
+@dataclass
+class CheckReport:
+    checked: int = 0
+    missing: List[str] = field(default_factory=list)
+    size_mismatch: List[str] = field(default_factory=list)
+    hash_mismatch: List[str] = field(default_factory=list)
+    unindexed: List[str] = field(default_factory=list)
+    reindexed: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.size_mismatch or self.hash_mismatch or self.unindexed)
+
+
+def _read(file_path: str) -> Optional[bytes]:
+    try:
+        with open(file_path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _check_entry(report: CheckReport, file_path: str, size: Optional[int], digest: Optional[str], verify_hash: bool):
+    report.checked += 1
+    try:
+        actual_size = os.path.getsize(file_path)
+    except FileNotFoundError:
+        report.missing.append(file_path)
+        return
+    if size is not None and actual_size != size:
+        report.size_mismatch.append(file_path)
+    elif verify_hash and digest and content_hash(_read(file_path)) != digest:
+        report.hash_mismatch.append(file_path)
+
+
+def _reindex_image(image: models.Image, file_path: str) -> bool:
+    contents = _read(file_path)
+    if contents is None:
+        return False
+    image.size = len(contents)
+    image.content_hash = content_hash(contents)
+    image.storage_key = storage_key(file_path)
+    for key, value in image_metadata(contents).items():
+        setattr(image, key, value)
+    if not image.mime_type:
+        image.mime_type = mimetypes.guess_type(file_path)[0]
+    return True
+
+
+def _reindex_attachments(db: Session, report: CheckReport):
+    """Создает записи индекса для вложений участков, у которых их нет"""
+    indexed_urls = {url for (url,) in db.query(models.Attachment.url)}
+    for plot_id, description in db.query(models.LandPlot.id, models.LandPlot.description):
+        while isinstance(description, str):
+            description = json.loads(description)
+        for attachment in (description or {}).get("attachments", []):
+            url = attachment.get("url", "")
+            file_path = url_to_path(url)
+            if not file_path or url in indexed_urls:
+                continue
+            contents = _read(file_path)
+            if contents is None:
+                continue
+            db.add(models.Attachment(
+                public_id=attachment.get("id"),
+                plot_id=plot_id,
+                name=attachment.get("name"),
+                type=attachment.get("type"),
+                url=url,
+                storage_key=storage_key(file_path),
+                size=len(contents),
+                mime_type=mimetypes.guess_type(file_path)[0],
+                content_hash=content_hash(contents)
+            ))
+            indexed_urls.add(url)
+            report.reindexed += 1
+
+
+def check_media(db: Session, verify_hash: bool = False, reindex: bool = False) -> CheckReport:
+    report = CheckReport()
+    if reindex:
+        for image in db.query(models.Image).filter(models.Image.storage_key.is_(None)):
+            if _reindex_image(image, image_file_path(image)):
+                report.reindexed += 1
+        _reindex_attachments(db, report)
+        db.commit()
+
+    indexed = set()
+    for image in db.query(models.Image):
+        file_path = os.path.normpath(image_file_path(image))
+        indexed.add(file_path)
+        _check_entry(report, file_path, image.size, image.content_hash, verify_hash)
+
+    for attachment in db.query(models.Attachment):
+        file_path = os.path.normpath(key_to_path(attachment.storage_key))
+        indexed.add(file_path)
+        _check_entry(report, file_path, attachment.size, attachment.content_hash, verify_hash)
+
+    for folder in MEDIA_FOLDERS:
+        for file_path in media_files(folder):
+            if file_path not in indexed:
+                report.unindexed.append(file_path)
+
+    return report
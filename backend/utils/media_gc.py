@@ -0,0 +1,165 @@
+"""
+Сборщик мусора для загруженных файлов (mark-and-sweep).
+
+Mark: собираем все файлы, на которые ссылается база (images и вложения
+в land_plots.description). Sweep: файлы static/images и static/uploads
+без ссылок сначала переносятся в карантин, а удаляются только после
+истечения срока карантина. Файл, на который снова появилась ссылка,
+возвращается из карантина на место.
+"""
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, List, Set
+
+from sqlalchemy.orm import Session
+
+import models
+from utils.storage import IMAGES_FOLDER, UPLOADS_FOLDER, remove_file, storage_key, url_to_path
+
+QUARANTINE_FOLDER = os.path.join("static", ".quarantine")
+MEDIA_FOLDERS = (IMAGES_FOLDER, UPLOADS_FOLDER)
+
+# Не трогаем свежие файлы: документ загружается раньше, чем сохраняется участок
+MIN_ORPHAN_AGE = int(os.getenv("MEDIA_GC_MIN_AGE", 24 * 3600))
+QUARANTINE_PERIOD = int(os.getenv("MEDIA_GC_QUARANTINE_PERIOD", 7 * 24 * 3600))
+BATCH_SIZE = int(os.getenv("MEDIA_GC_BATCH_SIZE", 100))
+BATCH_PAUSE = float(os.getenv("MEDIA_GC_BATCH_PAUSE", 0.5))
+
+
+@dataclass
+class GcReport:
+    scanned: int = 0
+    orphaned: int = 0
+    quarantined: int = 0
+    restored: int = 0
+    deleted: int = 0
+    reclaimed_bytes: int = 0
+    orphans: List[str] = field(default_factory=list)
+
+
+def _load_json(value):
+    while isinstance(value, str):
+        value = json.loads(value)
+    return value
+
+
+def collect_references(db: Session) -> Set[str]:
+    """Mark: возвращает пути (относительно backend) всех файлов, на которые есть ссылки"""
+    referenced = set()
+
+    for filename, path in db.query(models.Image.filename, models.Image.path):
+        if filename:
+            referenced.add(os.path.join(IMAGES_FOLDER, filename))
+        file_path = url_to_path(path)
+        if file_path:
+            referenced.add(file_path)
+
+    for (description,) in db.query(models.LandPlot.description):
+        try:
+            description = _load_json(description) or {}
+        except ValueError:
+            continue
+        for attachment in description.get("attachments", []):
+            file_path = url_to_path(attachment.get("url", ""))
+            if file_path:
+                referenced.add(file_path)
+
+    return {os.path.normpath(path) for path in referenced}
+
+
+def media_files(folder: str) -> Iterable[str]:
+    """Основные файлы каталога (без .gz-вариантов и недописанных .tmp)"""
+    if not os.path.isdir(folder):
+        return
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and not entry.name.endswith((".gz", ".tmp")):
+                yield os.path.normpath(entry.path)
+
+
+def _move(file_path: str, destination: str):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    for suffix in ("", ".gz"):
+        if os.path.exists(file_path + suffix):
+            shutil.move(file_path + suffix, destination + suffix)
+
+
+def _batches(items: List[str], size: int):
+    for start in range(0, len(items), size):
+        if start:
+            # Даем диску и остальным потокам передохнуть между пачками
+            time.sleep(BATCH_PAUSE)
+        yield items[start:start + size]
+
+
+def find_orphans(referenced: Set[str], report: GcReport, min_age: int = MIN_ORPHAN_AGE) -> List[str]:
+    now = time.time()
+    orphans = []
+    for folder in MEDIA_FOLDERS:
+        for file_path in media_files(folder):
+            report.scanned += 1
+            if file_path in referenced:
+                continue
+            try:
+                if now - os.path.getmtime(file_path) < min_age:
+                    continue
+            except FileNotFoundError:
+                continue
+            orphans.append(file_path)
+    report.orphaned = len(orphans)
+    report.orphans = orphans
+    return orphans
+
+
+def run_gc(
+    db: Session,
+    dry_run: bool = False,
+    min_age: int = MIN_ORPHAN_AGE,
+    quarantine_period: int = QUARANTINE_PERIOD,
+    batch_size: int = BATCH_SIZE
+) -> GcReport:
+    report = GcReport()
+    referenced = collect_references(db)
+    orphans = find_orphans(referenced, report, min_age)
+    if dry_run:
+        return report
+
+    # Помещаем новые сироты в карантин
+    for batch in _batches(orphans, batch_size):
+        for file_path in batch:
+            destination = os.path.join(QUARANTINE_FOLDER, file_path)
+            _move(file_path, destination)
+            # Время помещения в карантин храним в mtime
+            os.utime(destination, None)
+            report.quarantined += 1
+
+    # Обрабатываем карантин: восстанавливаем файлы со ссылками, удаляем просроченные
+    now = time.time()
+    quarantined = []
+    for folder in MEDIA_FOLDERS:
+        quarantined.extend(media_files(os.path.join(QUARANTINE_FOLDER, folder)))
+
+    deleted_keys = []
+    for batch in _batches(quarantined, batch_size):
+        for quarantine_path in batch:
+            original_path = os.path.relpath(quarantine_path, QUARANTINE_FOLDER)
+            if original_path in referenced:
+                _move(quarantine_path, original_path)
+                report.restored += 1
+                continue
+            if now - os.path.getmtime(quarantine_path) >= quarantine_period:
+                report.reclaimed_bytes += remove_file(quarantine_path)
+                report.deleted += 1
+                deleted_keys.append(storage_key(original_path))
+
+    # Удаляем из индекса записи о документах, файлы которых удалены
+    if deleted_keys:
+        db.query(models.Attachment).filter(
+            models.Attachment.storage_key.in_(deleted_keys)
+        ).delete(synchronize_session=False)
+        db.commit()
+
+    return report
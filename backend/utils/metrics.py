@@ -0,0 +1,317 @@
+"""
+Метрики запросов и обращений к базе в текстовом формате Prometheus.
+
+Включаются переменной METRICS_ENABLED=1. Выключенные метрики ничего не
+стоят: middleware и обработчики событий SQLAlchemy не подключаются,
+эндпоинт /metrics не регистрируется. Эндпоинт отдает метрики только с
+заголовком Authorization: Bearer <METRICS_TOKEN> (bearer_token в
+настройках scrape Prometheus); без METRICS_TOKEN приложение не запустится.
+
+Собираются:
+- http_requests_total - число ответов по маршруту, методу и статусу;
+- http_request_duration_seconds - гистограмма времени ответа по маршруту;
+- http_requests_in_flight - запросы, которые обрабатываются сейчас;
+- db_queries_per_request, db_query_duration_seconds_total - число
+  запросов к базе на один HTTP-запрос и суммарное время в базе;
+- db_n_plus_one_total - запросы, в которых один и тот же SQL выполнялся
+  не меньше N_PLUS_ONE_THRESHOLD раз (типичный признак N+1);
+- telegram_notifications_total - работа диспетчера уведомлений (outbox.py):
+  sent - отправленные сообщения, coalesced - заявки, объединенные в
+  сводки, throttled - ответы 429 от Telegram.
+
+Маршрут берется из шаблона пути (/plots/{plot_id}), а не из URL, чтобы
+число рядов не росло. При нескольких воркерах каждый процесс сохраняет
+свои значения в METRICS_DIR, и /metrics отдает их сумму; так же
+учитывается отдельный процесс фоновых задач (BACKGROUND_JOBS=off).
+"""
+import hmac
+import json
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_DIR = os.getenv("METRICS_DIR", "db/metrics")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 10))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+# Значения собираются из нескольких процессов через METRICS_DIR
+MULTIPROCESS = WEB_CONCURRENCY > 1 or os.getenv("BACKGROUND_JOBS", "leader") == "off"
+
+if METRICS_ENABLED and not METRICS_TOKEN:
+    raise RuntimeError("Для METRICS_ENABLED=1 необходимо задать METRICS_TOKEN")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RequestStats:
+    """Обращения к базе в рамках одного HTTP-запроса"""
+    __slots__ = ("queries", "duration", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, buckets: Tuple[float, ...], value: float):
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = Lock()
+        self.requests: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.queries: Dict[Tuple[str, str], Histogram] = {}
+        self.db_time: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.n_plus_one: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.notifications: Dict[Tuple[str], int] = defaultdict(int)
+        self.in_flight = 0
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def record(self, method: str, route: str, status: int, duration: float, stats: RequestStats):
+        """Завершение запроса: ответ, время и обращения к базе"""
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            self.requests[(method, route, str(status))] += 1
+            self.latency.setdefault(key, Histogram(len(LATENCY_BUCKETS))).observe(LATENCY_BUCKETS, duration)
+            self.queries.setdefault(key, Histogram(len(QUERY_COUNT_BUCKETS))).observe(QUERY_COUNT_BUCKETS, stats.queries)
+            self.db_time[key] += stats.duration
+            if stats.statements and max(stats.statements.values()) >= N_PLUS_ONE_THRESHOLD:
+                self.n_plus_one[key] += 1
+                statement, repeats = stats.statements.most_common(1)[0]
+                logger.warning("Возможный N+1 в %s %s: %s раз %s", method, route, repeats, statement[:200])
+
+    def count_notifications(self, result: str, value: int = 1):
+        with self._lock:
+            self.notifications[(result,)] += value
+
+    def snapshot(self) -> dict:
+        """Значения в виде, пригодном для JSON и сложения между процессами"""
+        with self._lock:
+            return {
+                "requests": [[*key, value] for key, value in self.requests.items()],
+                "latency": [[*key, h.counts, h.sum, h.count] for key, h in self.latency.items()],
+                "queries": [[*key, h.counts, h.sum, h.count] for key, h in self.queries.items()],
+                "db_time": [[*key, value] for key, value in self.db_time.items()],
+                "n_plus_one": [[*key, value] for key, value in self.n_plus_one.items()],
+                "notifications": [[*key, value] for key, value in self.notifications.items()],
+                "in_flight": self.in_flight,
+            }
+
+
+registry = Registry()
+
+
+def _merge(snapshots: List[dict]) -> dict:
+    merged = {"requests": Counter(), "db_time": Counter(), "n_plus_one": Counter(), "notifications": Counter(),
+              "latency": {}, "queries": {}, "in_flight": 0}
+    for snapshot in snapshots:
+        for name in ("requests", "db_time", "n_plus_one", "notifications"):
+            for *key, value in snapshot.get(name, []):
+                merged[name][tuple(key)] += value
+        for name in ("latency", "queries"):
+            for method, route, counts, total, count in snapshot[name]:
+                current = merged[name].setdefault((method, route), [[0] * len(counts), 0.0, 0])
+                current[0] = [a + b for a, b in zip(current[0], counts)]
+                current[1] += total
+                current[2] += count
+        merged["in_flight"] += snapshot["in_flight"]
+    return merged
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def flush():
+    """Сохраняет значения процесса в METRICS_DIR (при нескольких процессах)"""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(path + ".tmp", path)
+
+
+def _collect() -> dict:
+    if not MULTIPROCESS:
+        return _merge([registry.snapshot()])
+    flush()
+    snapshots = []
+    for name in os.listdir(METRICS_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        # Счетчики завершившихся воркеров сохраняются, текущие запросы - нет
+        if not _pid_alive(int(name[:-len(".json")])):
+            snapshot["in_flight"] = 0
+        snapshots.append(snapshot)
+    return _merge(snapshots)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, buckets: Tuple[float, ...], values: dict) -> List[str]:
+    lines = []
+    for (method, route), (counts, total, count) in sorted(values.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {count}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {total}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {count}")
+    return lines
+
+
+def is_authorized(authorization: Optional[str]) -> bool:
+    """Проверяет заголовок Authorization запроса к /metrics"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    return hmac.compare_digest(token.strip().encode(), METRICS_TOKEN.encode())
+
+
+def render() -> str:
+    """Текущие значения в текстовом формате Prometheus"""
+    values = _collect()
+    lines = [
+        "# HELP http_requests_total Число ответов",
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, route, status), value in sorted(values["requests"].items()):
+        lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {value}")
+    lines += [
+        "# HELP http_request_duration_seconds Время ответа",
+        "# TYPE http_request_duration_seconds histogram",
+        *_histogram_lines("http_request_duration_seconds", LATENCY_BUCKETS, values["latency"]),
+        "# HELP http_requests_in_flight Запросы в обработке",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {values['in_flight']}",
+        "# HELP db_queries_per_request Число запросов к базе на один HTTP-запрос",
+        "# TYPE db_queries_per_request histogram",
+        *_histogram_lines("db_queries_per_request", QUERY_COUNT_BUCKETS, values["queries"]),
+        "# HELP db_query_duration_seconds_total Суммарное время запросов к базе",
+        "# TYPE db_query_duration_seconds_total counter",
+    ]
+    for (method, route), value in sorted(values["db_time"].items()):
+        lines.append(f"db_query_duration_seconds_total{_labels(method=method, route=route)} {value}")
+    lines += [
+        "# HELP db_n_plus_one_total HTTP-запросы с многократно повторенным SQL",
+        "# TYPE db_n_plus_one_total counter",
+    ]
+    for (method, route), value in sorted(values["n_plus_one"].items()):
+        lines.append(f"db_n_plus_one_total{_labels(method=method, route=route)} {value}")
+    lines += [
+        "# HELP telegram_notifications_total Уведомления о заявках в Telegram",
+        "# TYPE telegram_notifications_total counter",
+    ]
+    for (result,), value in sorted(values["notifications"].items()):
+        lines.append(f"telegram_notifications_total{_labels(result=result)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request_stats.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    if stats is None:
+        return
+    started = conn.info.get("query_start")
+    if started:
+        stats.duration += time.perf_counter() - started.pop()
+    stats.queries += 1
+    stats.statements[statement] += 1
+
+
+def install_query_hooks():
+    """Подсчет запросов для всех движков (синхронного и асинхронного)"""
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: время ответа, статус и запросы к базе по маршрутам"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry.begin()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            _request_stats.reset(token)
+            # Шаблон пути маршрута; статика и неизвестные пути - одной группой
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "other"
+            registry.record(scope["method"], route_path, status, duration, stats)
@@ -0,0 +1,23 @@
+"""
+Нормализация телефонов: один номер, введенный по-разному
+("8 (999) 123-45-67", "+7 999 1234567"), приводится к одной строке.
+"""
+import re
+from typing import Optional
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """
+    Номер в виде +<цифры>. Российские номера приводятся к +7XXXXXXXXXX
+    (8XXXXXXXXXX и 10 цифр без кода страны). None - в строке нет цифр.
+    """
+    digits = _NON_DIGITS.sub("", phone or "")
+    if not digits:
+        return None
+    if len(digits) == 11 and digits[0] == "8":
+        digits = "7" + digits[1:]
+    elif len(digits) == 10 and digits[0] == "9":
+        digits = "7" + digits
+    return "+" + digits
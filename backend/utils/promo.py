@@ -0,0 +1,91 @@
+"""
+Промокоды за прохождение квиза.
+
+Код - PROMO_CODE_LENGTH символов из латинских букв и цифр, выбранных
+криптографическим генератором (secrets): код нельзя предсказать по
+соседним. Уникальность обеспечивает уникальный индекс requests.promo_code;
+при совпадении с уже выданным кодом заявка сохраняется с новым кодом
+(crud.create_request, до PROMO_CODE_ATTEMPTS попыток).
+
+Погашение - один условный UPDATE (... WHERE promo_redeemed_at IS NULL),
+поэтому один код нельзя погасить дважды даже при одновременных запросах
+из API и бота. Проверка кода ботом кэшируется на PROMO_CACHE_TTL секунд
+(promo_cache). Бот работает в процессе-лидере, а погасить код может любой
+воркер API, поэтому погашение сбрасывает кэш во всех процессах через
+эпоху PROMO_EPOCH_FILE (см. utils.epoch).
+"""
+import os
+import secrets
+import string
+from typing import Any, Hashable, Optional
+
+from utils.epoch import Epoch
+from utils.ttl_cache import MISSING, TTLCache
+
+PROMO_CODE_LENGTH = int(os.getenv("PROMO_CODE_LENGTH", 8))
+PROMO_CODE_ATTEMPTS = 5
+PROMO_CODE_ALPHABET = string.ascii_uppercase + string.digits
+
+# Состояния промокода
+PROMO_VALID = "valid"
+PROMO_USED = "used"
+PROMO_REDEEMED = "redeemed"
+
+# Результат проверки промокода кэшируется: ботом могут проверять один код
+# много раз, а погашается он один раз
+PROMO_CACHE_TTL = float(os.getenv("PROMO_CACHE_TTL", 30))
+PROMO_EPOCH_FILE = os.getenv("PROMO_EPOCH_FILE", "db/promo.epoch")
+
+
+class PromoCache(TTLCache):
+    """TTLCache, который очищается целиком при смене общей эпохи погашений"""
+
+    def __init__(self, ttl: float = PROMO_CACHE_TTL, epoch_path: str = PROMO_EPOCH_FILE):
+        super().__init__(ttl)
+        self._epoch_file = Epoch(epoch_path)
+        self._epoch = self.epoch()
+
+    def epoch(self) -> int:
+        return self._epoch_file.read()
+
+    def _check_epoch(self) -> int:
+        epoch = self.epoch()
+        if epoch != self._epoch:
+            # Код погашен в другом процессе
+            self.clear()
+            self._epoch = epoch
+        return epoch
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        self._check_epoch()
+        return super().get(key, default)
+
+    def set(self, key: Hashable, value: Any, epoch: Optional[int] = None):
+        """
+        epoch - эпоха, прочитанная до запроса к базе: если с тех пор код
+        погасили, результат мог устареть и не кэшируется
+        """
+        if epoch is not None and self._check_epoch() != epoch:
+            return
+        super().set(key, value)
+
+    def invalidate(self, key: Hashable):
+        """Сбрасывает запись в этом и остальных процессах"""
+        super().invalidate(key)
+        self._epoch_file.bump()
+
+
+promo_cache = PromoCache()
+
+
+def generate_promo_code(length: int = PROMO_CODE_LENGTH) -> str:
+    """Генерирует случайный промокод"""
+    return "".join(secrets.choice(PROMO_CODE_ALPHABET) for _ in range(length))
+
+
+def normalize_promo_code(promo_code: str) -> Optional[str]:
+    """Код в том виде, в котором он хранится; None - заведомо не промокод"""
+    promo_code = promo_code.strip().upper()
+    if not promo_code or len(promo_code) > 64:
+        return None
+    return promo_code
@@ -0,0 +1,62 @@
+"""
+Кэш публичного квиза (GET /quiz/questions).
+
+Активные вопросы собираются в готовый JSON-документ с ETag - хэшем
+содержимого (serializers.serialize_quiz), поэтому у всех воркеров ETag
+одного и того же квиза совпадает, и повторный посетитель получает 304.
+
+Документ хранится в памяти процесса. Создание, изменение и удаление
+вопроса сбрасывают его во всех процессах через эпоху QUIZ_EPOCH_FILE
+(см. utils.epoch). QUIZ_CACHE_TTL ограничивает срок жизни документа на
+случай правки таблицы в обход приложения.
+"""
+import os
+import time
+from typing import NamedTuple, Optional
+
+from utils.epoch import Epoch
+
+QUIZ_CACHE_TTL = float(os.getenv("QUIZ_CACHE_TTL", 300))
+QUIZ_EPOCH_FILE = os.getenv("QUIZ_EPOCH_FILE", "db/quiz.epoch")
+
+
+class QuizDocument(NamedTuple):
+    content: bytes
+    etag: str
+
+
+class QuizCache:
+    def __init__(self, ttl: float = QUIZ_CACHE_TTL, epoch_path: str = QUIZ_EPOCH_FILE):
+        self.ttl = ttl
+        self._epoch_file = Epoch(epoch_path)
+        # (документ, эпоха, срок) - заменяется целиком, без блокировки
+        self._item = None
+
+    def epoch(self) -> int:
+        return self._epoch_file.read()
+
+    def get(self) -> Optional[QuizDocument]:
+        item = self._item
+        if item is None:
+            return None
+        document, epoch, deadline = item
+        if time.monotonic() >= deadline or self.epoch() != epoch:
+            return None
+        return document
+
+    def set(self, document: QuizDocument, epoch: int):
+        """
+        epoch - эпоха, прочитанная до запроса вопросов из базы: если с тех пор
+        квиз изменился, документ мог устареть и не кэшируется
+        """
+        if self.ttl <= 0 or self.epoch() != epoch:
+            return
+        self._item = (document, epoch, time.monotonic() + self.ttl)
+
+    def invalidate(self):
+        """Сбрасывает документ в этом и остальных процессах"""
+        self._item = None
+        self._epoch_file.bump()
+
+
+quiz_cache = QuizCache()
@@ -0,0 +1,123 @@
+"""
+Ограничение частоты запросов алгоритмом token bucket.
+
+Каждый ключ (имя пользователя, IP) получает корзину на capacity попыток,
+которая пополняется равномерно: capacity попыток за period секунд.
+RateLimiter хранит корзины в памяти процесса, SharedRateLimiter - в общем
+файле SQLite, чтобы лимит действовал на все воркеры вместе.
+"""
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Dict, Tuple
+
+# Общий файл корзин при запуске нескольких воркеров (WEB_CONCURRENCY > 1)
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "db/rate_limits.db")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+
+
+def parse_rate(value: str) -> Tuple[int, float]:
+    """Разбирает настройку вида "5/300" - 5 попыток за 300 секунд"""
+    capacity, period = value.split("/")
+    return int(capacity), float(period)
+
+
+class RateLimiter:
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period  # попыток в секунду
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = Lock()
+
+    def _take(self, tokens: float, updated: float, now: float) -> Tuple[float, float]:
+        """Пополняет корзину и забирает попытку: (остаток, секунд до следующей попытки)"""
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            return tokens, (1 - tokens) / self.rate
+        return tokens - 1, 0
+
+    def acquire(self, key: str) -> float:
+        """
+        Забирает попытку из корзины ключа. Возвращает 0, если попытка
+        разрешена, иначе - число секунд до появления следующей попытки.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens, retry_after = self._take(tokens, updated, now)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > 10000:
+                self._cleanup(now)
+            return retry_after
+
+    def _cleanup(self, now: float):
+        """Удаляет корзины, которые уже успели наполниться полностью"""
+        full_after = self.capacity / self.rate
+        for key in [key for key, (_, updated) in self._buckets.items() if now - updated >= full_after]:
+            del self._buckets[key]
+
+    def reset(self, key: str):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class SharedRateLimiter(RateLimiter):
+    """Корзины в общем файле SQLite; name отделяет корзины разных лимитов"""
+
+    CLEANUP_EVERY = 1000
+
+    def __init__(self, capacity: int, period: float, name: str, path: str = RATE_LIMIT_DB):
+        super().__init__(capacity, period)
+        self.name = name
+        self.path = path
+        self._calls = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "name TEXT NOT NULL, key TEXT NOT NULL, tokens REAL NOT NULL, updated REAL NOT NULL, "
+                "PRIMARY KEY (name, key))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def acquire(self, key: str) -> float:
+        # Часы реального времени общие для всех процессов, в отличие от monotonic
+        now = time.time()
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE сразу берет блокировку записи: чтение и
+            # обновление корзины не пересекаются с другими воркерами
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE name = ? AND key = ?", (self.name, key)
+            ).fetchone()
+            tokens, updated = row or (self.capacity, now)
+            tokens, retry_after = self._take(tokens, updated, now)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, key, tokens, updated) VALUES (?, ?, ?, ?)",
+                (self.name, key, tokens, now)
+            )
+            self._calls += 1
+            if self._calls % self.CLEANUP_EVERY == 0:
+                conn.execute(
+                    "DELETE FROM buckets WHERE name = ? AND updated <= ?",
+                    (self.name, now - self.capacity / self.rate)
+                )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return retry_after
+
+    def reset(self, key: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM buckets WHERE name = ? AND key = ?", (self.name, key))
+
+
+def create_rate_limiter(rate: str, name: str) -> RateLimiter:
+    """Лимит вида "N/секунд": общий для воркеров, если их несколько"""
+    capacity, period = parse_rate(rate)
+    if WEB_CONCURRENCY > 1:
+        return SharedRateLimiter(capacity, period, name)
+    return RateLimiter(capacity, period)
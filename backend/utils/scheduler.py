@@ -0,0 +1,18 @@
+import asyncio
+import logging
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodic(func: Callable[[], object], interval: float, name: str):
+    """
+    Периодически выполняет синхронную задачу в отдельном потоке,
+    чтобы фоновые работы не блокировали обработку запросов.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(func)
+        except Exception as e:
+            logger.error("Ошибка в фоновой задаче %s: %s", name, e)
@@ -0,0 +1,91 @@
+"""
+Кэш проверенных сессий администраторов: токен -> AdminPrincipal.
+
+Запись живет не дольше ADMIN_SESSION_CACHE_TTL и не дольше срока действия
+самой сессии. При входе администратора его прежние сессии деактивируются,
+и их записи удаляются из кэша явно (invalidate_admin).
+
+Кэш локален для процесса, поэтому при нескольких воркерах invalidate_admin
+еще и обновляет время изменения общего файла ADMIN_SESSION_EPOCH_FILE
+("эпоху"). Каждый воркер сверяет эпоху при чтении (один stat) и при ее
+смене очищает свой кэш целиком - входы администраторов редки.
+"""
+import os
+import time
+from datetime import datetime
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from utils.auth import AdminPrincipal
+from utils.epoch import Epoch
+
+ADMIN_SESSION_CACHE_TTL = float(os.getenv("ADMIN_SESSION_CACHE_TTL", 60))
+ADMIN_SESSION_EPOCH_FILE = os.getenv("ADMIN_SESSION_EPOCH_FILE", "db/admin_sessions.epoch")
+
+
+class SessionCache:
+    def __init__(self, ttl: float = ADMIN_SESSION_CACHE_TTL, epoch_path: str = ADMIN_SESSION_EPOCH_FILE):
+        self.ttl = ttl
+        self._epoch_file = Epoch(epoch_path)
+        self._items: Dict[str, Tuple[AdminPrincipal, float]] = {}
+        self._lock = Lock()
+        self._epoch = self.epoch()
+
+    def epoch(self) -> int:
+        """Текущая общая эпоха: время изменения файла эпохи в наносекундах"""
+        return self._epoch_file.read()
+
+    def _check_epoch(self) -> int:
+        epoch = self.epoch()
+        if epoch != self._epoch:
+            # Сессии деактивированы в другом процессе
+            with self._lock:
+                self._items.clear()
+                self._epoch = epoch
+        return epoch
+
+    def get(self, token: str) -> Optional[AdminPrincipal]:
+        self._check_epoch()
+        item = self._items.get(token)
+        if item is None:
+            return None
+        principal, deadline = item
+        if time.monotonic() >= deadline:
+            self.invalidate(token)
+            return None
+        return principal
+
+    def set(self, token: str, principal: AdminPrincipal, expires_at: datetime, epoch: Optional[int] = None):
+        """
+        epoch - эпоха, прочитанная до запроса сессии из базы: если с тех пор
+        сессии деактивировались, результат запроса мог устареть и не кэшируется
+        """
+        lifetime = min(self.ttl, (expires_at - datetime.utcnow()).total_seconds())
+        if lifetime <= 0:
+            return
+        if epoch is not None and self._check_epoch() != epoch:
+            return
+        now = time.monotonic()
+        with self._lock:
+            # Заодно удаляем истекшие записи, которые больше не запрашивались
+            for expired in [key for key, (_, deadline) in self._items.items() if deadline <= now]:
+                del self._items[expired]
+            self._items[token] = (principal, now + lifetime)
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._items.pop(token, None)
+
+    def invalidate_admin(self, admin_id: int):
+        """Удаляет из кэша все сессии администратора, в том числе в других процессах"""
+        with self._lock:
+            for token in [token for token, (principal, _) in self._items.items() if principal.id == admin_id]:
+                del self._items[token]
+            self._epoch = self._epoch_file.bump()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+session_cache = SessionCache()
@@ -0,0 +1,64 @@
+import mimetypes
+import os
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Scope
+
+from utils.storage import COMPRESSIBLE_EXTENSIONS, is_fingerprinted
+
+# Файлы с отпечатком содержимого в имени никогда не меняются по своему URL
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Старые файлы без отпечатка кэшируем коротко и с ревалидацией
+DEFAULT_CACHE_CONTROL = "public, max-age=3600, must-revalidate"
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles с долгосрочным кэшированием файлов с отпечатком
+    и отдачей предварительно сжатых .gz-вариантов.
+    """
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        filename = os.path.basename(str(full_path))
+        ext = os.path.splitext(filename)[1].lower()
+
+        headers = {
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if is_fingerprinted(filename) else DEFAULT_CACHE_CONTROL
+        }
+
+        response = None
+        if ext in COMPRESSIBLE_EXTENSIONS:
+            headers["Vary"] = "Accept-Encoding"
+            if "gzip" in request_headers.get("accept-encoding", ""):
+                gz_path = f"{full_path}.gz"
+                try:
+                    gz_stat = os.stat(gz_path)
+                except OSError:
+                    gz_stat = None
+                if gz_stat is not None:
+                    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                    response = FileResponse(
+                        gz_path,
+                        status_code=status_code,
+                        stat_result=gz_stat,
+                        media_type=media_type,
+                        headers={**headers, "Content-Encoding": "gzip"},
+                    )
+
+        if response is None:
+            response = FileResponse(
+                full_path, status_code=status_code, stat_result=stat_result, headers=headers
+            )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
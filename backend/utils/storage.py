@@ -0,0 +1,180 @@
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+STATIC_ROOT = "static"
+IMAGES_FOLDER = os.path.join(STATIC_ROOT, "images")
+UPLOADS_FOLDER = os.path.join(STATIC_ROOT, "uploads")
+
+# Длина отпечатка содержимого в имени файла (hex-символы sha256)
+FINGERPRINT_LENGTH = 12
+
+# Расширения может не быть: fingerprint_filename дает name.<hash> для имени без него
+_FINGERPRINT_RE = re.compile(r"\.[0-9a-f]{%d}(\.[^./]+)?$" % FINGERPRINT_LENGTH)
+
+# Форматы, которые имеет смысл хранить в предварительно сжатом виде.
+# JPEG/PNG/WebP, PDF и офисные форматы на основе zip уже сжаты.
+COMPRESSIBLE_EXTENSIONS = {".txt", ".rtf", ".doc", ".xls", ".csv", ".svg", ".bmp"}
+MIN_COMPRESS_SIZE = 1024
+
+# Размер части, которыми загружаемый файл копируется на диск
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class FileTooLarge(Exception):
+    """Загружаемый файл больше допустимого размера"""
+
+
+@dataclass
+class SpooledFile:
+    """Загруженный файл, скопированный во временный файл рядом с местом хранения"""
+    path: str
+    size: int
+    digest: str
+
+
+def content_hash(data: bytes) -> str:
+    """Возвращает sha256 содержимого файла"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_fingerprint(data: bytes) -> str:
+    """Возвращает короткий отпечаток содержимого файла"""
+    return content_hash(data)[:FINGERPRINT_LENGTH]
+
+
+def fingerprint_filename(filename: str, data: bytes, digest: Optional[str] = None) -> str:
+    """Добавляет отпечаток содержимого в имя файла: name.<hash>.ext"""
+    stem, ext = os.path.splitext(filename)
+    fingerprint = digest[:FINGERPRINT_LENGTH] if digest else content_fingerprint(data)
+    return f"{stem}.{fingerprint}{ext}"
+
+
+def is_fingerprinted(filename: str) -> bool:
+    """Проверяет, содержит ли имя файла отпечаток содержимого"""
+    return bool(_FINGERPRINT_RE.search(filename))
+
+
+def write_file(folder: str, filename: str, data: bytes) -> str:
+    """
+    Атомарно записывает файл и, если это выгодно, его gzip-вариант рядом.
+    Возвращает полный путь к файлу.
+    """
+    os.makedirs(folder, exist_ok=True)
+    file_path = os.path.join(folder, filename)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, file_path)
+    _write_gzip_variant(file_path, data)
+    return file_path
+
+
+def _is_compressible(filename: str, size: int) -> bool:
+    ext = os.path.splitext(filename)[1].lower()
+    return ext in COMPRESSIBLE_EXTENSIONS and size >= MIN_COMPRESS_SIZE
+
+
+def _write_gzip_variant(file_path: str, data: bytes):
+    if not _is_compressible(file_path, len(data)):
+        return
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    # Сохраняем сжатую версию, только если она экономит хотя бы 10%
+    if len(compressed) < len(data) * 0.9:
+        tmp_path = f"{file_path}.gz.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, f"{file_path}.gz")
+
+
+async def spool_upload(upload, folder: str, max_size: int) -> SpooledFile:
+    """
+    Копирует загружаемый файл (UploadFile) частями во временный .tmp-файл
+    в folder, считая sha256 по ходу копирования. Если файл больше max_size,
+    копирование прерывается сразу, временный файл удаляется и выбрасывается
+    FileTooLarge.
+    """
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLarge(upload.filename)
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        discard_spooled([tmp_path])
+        raise
+    return SpooledFile(path=tmp_path, size=size, digest=digest.hexdigest())
+
+
+def place_spooled(spooled: SpooledFile, folder: str, filename: str) -> str:
+    """
+    Переносит временный файл под окончательное имя (без копирования: он
+    лежит в том же каталоге) и, если это выгодно, пишет gzip-вариант.
+    Возвращает полный путь к файлу.
+    """
+    file_path = os.path.join(folder, filename)
+    os.replace(spooled.path, file_path)
+    if _is_compressible(filename, spooled.size):
+        with open(file_path, "rb") as f:
+            _write_gzip_variant(file_path, f.read())
+    return file_path
+
+
+def discard_spooled(paths: Iterable[str]):
+    """Удаляет временные файлы загрузки, которые не были перенесены"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def storage_key(file_path: str) -> str:
+    """Ключ хранилища - путь относительно static/ с прямыми слэшами, например images/<файл>"""
+    return os.path.relpath(file_path, STATIC_ROOT).replace(os.sep, "/")
+
+
+def key_to_path(key: str) -> str:
+    """Путь на диске по ключу хранилища"""
+    return os.path.join(STATIC_ROOT, *key.split("/"))
+
+
+def url_to_path(url: str) -> Optional[str]:
+    """Преобразует URL вида /images/<файл> или /uploads/<файл> в путь на диске"""
+    if not url:
+        return None
+    for prefix, folder in (("/images/", IMAGES_FOLDER), ("/uploads/", UPLOADS_FOLDER)):
+        if url.startswith(prefix):
+            filename = os.path.basename(url[len(prefix):])
+            return os.path.join(folder, filename) if filename else None
+    return None
+
+
+def remove_file(file_path: str) -> int:
+    """Удаляет файл вместе с его .gz-вариантом, возвращает число освобожденных байт"""
+    reclaimed = 0
+    for path in (file_path, f"{file_path}.gz"):
+        try:
+            reclaimed += os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return reclaimed
+
+
+def image_file_path(image) -> Optional[str]:
+    """Путь к файлу изображения по индексу в БД, без обращения к диску"""
+    if image.storage_key:
+        return key_to_path(image.storage_key)
+    # Изображения, загруженные до появления storage_key (image.path хранит URL)
+    return url_to_path(image.path) or os.path.join(IMAGES_FOLDER, image.filename)
@@ -0,0 +1,51 @@
+"""
+Небольшой кэш в памяти процесса: запись живет не дольше ttl секунд, при
+переполнении вытесняются давно не использованные (не больше maxsize записей).
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Tuple
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, ttl: float, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Значение или default; None - допустимое значение (например, "не найдено")"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+            value, deadline = item
+            if time.monotonic() >= deadline:
+                del self._items[key]
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)